@@ -0,0 +1,116 @@
+import math
+import os
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+from prometheus_client import Counter
+
+from app import metrics
+from app.database import engine
+from app.rendering import RENDER_WORKERS, render_pool
+
+# ================= CONFIG =================
+
+# Item creations admitted at once per worker (rendering or waiting for a
+# render slot); beyond this new ones are shed instead of queueing forever.
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", str(RENDER_WORKERS * 4)))
+SHED_LOOP_LAG_MS = float(os.getenv("SHED_LOOP_LAG_MS", "250"))
+# Share of the DB pool (size + overflow) checked out at which writes are shed
+SHED_DB_POOL_RATIO = float(os.getenv("SHED_DB_POOL_RATIO", "1.0"))
+MAX_RETRY_AFTER = 60
+
+REQUESTS_SHED = Counter(
+    "requests_shed",
+    "Requests rejected with 503 by admission control, by first reason",
+    ["reason"],
+)
+
+_admitted_renders = 0
+
+
+@dataclass(frozen=True)
+class Saturation:
+    renders_admitted: int
+    render_queue_limit: int
+    renders_pending: int
+    db_pool_in_use: int
+    db_pool_capacity: Optional[int]
+    loop_lag_ms: float
+    draining: bool = False
+
+    def reasons(self) -> list[str]:
+        reasons = ["draining"] if self.draining else []
+        if self.renders_admitted >= self.render_queue_limit:
+            reasons.append("render_queue")
+        if (
+            self.db_pool_capacity
+            and self.db_pool_in_use >= self.db_pool_capacity * SHED_DB_POOL_RATIO
+        ):
+            reasons.append("db_pool")
+        if self.loop_lag_ms >= SHED_LOOP_LAG_MS:
+            reasons.append("loop_lag")
+        return reasons
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _db_pool_usage() -> tuple[int, Optional[int]]:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        # NullPool / StaticPool: nothing to run out of
+        return 0, None
+    overflow = getattr(pool, "_max_overflow", 0)
+    capacity = pool.size() + overflow if overflow >= 0 else None
+    return pool.checkedout(), capacity
+
+
+def saturation() -> Saturation:
+    in_use, capacity = _db_pool_usage()
+    return Saturation(
+        renders_admitted=_admitted_renders,
+        render_queue_limit=RENDER_QUEUE_LIMIT,
+        renders_pending=render_pool.pending,
+        db_pool_in_use=in_use,
+        db_pool_capacity=capacity,
+        loop_lag_ms=round(metrics.current_loop_lag() * 1000, 1),
+        draining=render_pool.draining,
+    )
+
+
+def retry_after(current: Saturation) -> int:
+    if current.draining:
+        # this worker is going away; the retry should reach another one
+        return 1
+    # Roughly how long until the render backlog has drained
+    per_render = render_pool.avg_seconds or 1.0
+    backlog = current.renders_pending / max(render_pool.workers, 1)
+    return min(MAX_RETRY_AFTER, max(1, math.ceil(backlog * per_render)))
+
+
+@asynccontextmanager
+async def render_slot() -> AsyncIterator[None]:
+    """
+    Guards code that renders a PDF. Sheds the request with 503 +
+    Retry-After while the worker is saturated, otherwise holds a render
+    slot until the block is done.
+    """
+    global _admitted_renders
+
+    current = saturation()
+    reasons = current.reasons()
+    if reasons:
+        REQUESTS_SHED.labels(reasons[0]).inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Server is saturated ({', '.join(reasons)}), retry later",
+            headers={"Retry-After": str(retry_after(current))},
+        )
+
+    _admitted_renders += 1
+    try:
+        yield
+    finally:
+        _admitted_renders -= 1
@@ -0,0 +1,440 @@
+import asyncio
+import codecs
+import csv
+import io
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional
+
+import orjson
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.changes import OP_INSERT, OP_UPDATE, insert_changes, record_change
+from app.events import RENDER_DONE, RENDER_FAILED, RENDER_QUEUED, RENDER_RUNNING, publish_render_state
+from app.image_processor import crop_and_create_pdf
+from app.models import Item, Material, ProductType
+from app.rendering import RENDER_WORKERS, render_pool
+from app.schemas import ItemCreate
+from app.serialization import dumps
+from app.singleflight import item_writes
+from app.snapshot import catalog_snapshot
+
+# ================= CONFIG =================
+
+# Rows inserted per transaction
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Renders one import keeps in the render pool at once. Each render thread
+# takes them in turn with interactive item creation, so a large import
+# delays a POST /api/items/ by at most one render.
+IMPORT_RENDER_CONCURRENCY = int(os.getenv("IMPORT_RENDER_CONCURRENCY", str(RENDER_WORKERS)))
+# Row errors kept per job; the `failed` count keeps counting past this
+IMPORT_MAX_ERRORS = 1000
+# Finished jobs whose status can still be looked up, per worker
+IMPORT_JOBS_KEPT = 100
+# Jobs with renders left at shutdown are saved here and resumed on start
+RENDER_JOURNAL_DIR = os.getenv("RENDER_JOURNAL_DIR", "app/storage/render_journal")
+
+REQUIRED_COLUMNS = ("material_id", "product_type_id", "width", "height")
+
+JOB_IMPORTING = "importing"
+JOB_RENDERING = "rendering"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+logger = logging.getLogger("app.bulk_import")
+
+
+# ================= CSV =================
+
+def _split_records(text: str) -> tuple[str, str]:
+    """Split `text` after its last complete record; a newline inside quotes ends none."""
+    end = len(text)
+    while True:
+        end = text.rfind("\n", 0, end)
+        if end == -1:
+            return "", text
+        if text.count('"', 0, end) % 2 == 0:
+            return text[:end + 1], text[end + 1:]
+
+
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[list[str]]:
+    """Parse a CSV byte stream record by record, as the chunks arrive."""
+    # utf-8-sig drops the BOM spreadsheet exports start with; undecodable
+    # bytes become U+FFFD and fail validation of their row only
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        complete, pending = _split_records(pending + decoder.decode(chunk))
+        for record in csv.reader(io.StringIO(complete, newline="")):
+            yield record
+
+    pending += decoder.decode(b"", final=True)
+    for record in csv.reader(io.StringIO(pending, newline="")):
+        yield record
+
+
+# ================= JOBS =================
+
+@dataclass
+class ImportJob:
+    """Progress of one CSV import: rows parsed and inserted, then PDFs rendered."""
+
+    user_id: int
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    state: str = JOB_IMPORTING
+    rows: int = 0
+    created: int = 0
+    failed: int = 0
+    rendered: int = 0
+    render_failed: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+    detail: Optional[str] = None
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    _renders: Optional[asyncio.Queue] = field(default=None, repr=False)
+    _workers: list[asyncio.Task] = field(default_factory=list, repr=False)
+    _in_progress: set[tuple[int, float, float]] = field(default_factory=set, repr=False)
+    _stopping: bool = field(default=False, repr=False)
+    # journal file this job was resumed from
+    _journal: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (JOB_DONE, JOB_FAILED) and not self._workers
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "rendered": self.rendered,
+            "render_failed": self.render_failed,
+            "detail": self.detail,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "errors": self.errors,
+        }
+
+    def reject(self, row: int, errors: list[dict[str, str]]) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "errors": errors})
+
+    # ---- rendering ----
+
+    def start_rendering(self, sessions: async_sessionmaker) -> None:
+        self._renders = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._render_worker(sessions), name=f"import-{self.id}-render")
+            for _ in range(IMPORT_RENDER_CONCURRENCY)
+        ]
+
+    def render(self, items: list[Item]) -> None:
+        for item in items:
+            self._queue_render(item.id, item.width, item.height)
+
+    def _queue_render(self, item_id: int, width: float, height: float) -> None:
+        self._renders.put_nowait((item_id, width, height))
+        publish_render_state(item_id, RENDER_QUEUED)
+
+    def finish_importing(self, detail: Optional[str] = None) -> None:
+        self.state = JOB_FAILED if detail else JOB_RENDERING
+        self.detail = detail
+        for _ in self._workers:
+            self._renders.put_nowait(None)
+
+    def stop(self) -> None:
+        """Let the workers finish the render they are on, and take no more."""
+        self._stopping = True
+        for _ in self._workers:
+            self._renders.put_nowait(None)
+
+    async def wait(self) -> None:
+        await asyncio.gather(*self._workers)
+
+    async def _render_worker(self, sessions: async_sessionmaker) -> None:
+        try:
+            while not self._stopping and (render := await self._renders.get()) is not None:
+                await self._render_one(sessions, *render)
+        finally:
+            self._workers.remove(asyncio.current_task())
+            if not self._workers and not self._stopping:
+                if self.state == JOB_RENDERING:
+                    self.state = JOB_DONE
+                self.finished_at = datetime.utcnow()
+                self._release_journal()
+
+    async def _render_one(
+        self, sessions: async_sessionmaker, item_id: int, width: float, height: float
+    ) -> None:
+        # Stays listed if cancelled halfway, so it is journaled and redone
+        self._in_progress.add((item_id, width, height))
+        try:
+            pdf_path = await render_pool.run(
+                crop_and_create_pdf, width=width, height=height, item_id=item_id,
+                on_start=lambda: publish_render_state(item_id, RENDER_RUNNING),
+            )
+            async with sessions() as db:
+                await db.execute(update(Item).where(Item.id == item_id).values(pdf_path=pdf_path))
+                record_change(db, Item, item_id, OP_UPDATE)
+                await db.commit()
+            item_writes.bump()
+        except Exception as e:
+            # the item stays without a PDF, like a failed POST /api/items/ would
+            logger.exception("import %s: rendering item %s failed", self.id, item_id)
+            self.render_failed += 1
+            publish_render_state(item_id, RENDER_FAILED, detail=str(e))
+        else:
+            self.rendered += 1
+            publish_render_state(item_id, RENDER_DONE, pdf_path=pdf_path)
+        self._in_progress.discard((item_id, width, height))
+
+    # ---- journal ----
+
+    def unfinished_renders(self) -> list[tuple[int, float, float]]:
+        queued = []
+        while not self._renders.empty():
+            render = self._renders.get_nowait()
+            if render is not None:
+                queued.append(render)
+        return sorted(self._in_progress) + queued
+
+    def write_journal(self) -> Optional[str]:
+        """Persist the job with its unfinished renders; called once its workers stopped."""
+        renders = self.unfinished_renders()
+        self._release_journal()
+        if not renders:
+            return None
+
+        os.makedirs(RENDER_JOURNAL_DIR, exist_ok=True)
+        path = os.path.join(RENDER_JOURNAL_DIR, f"{self.id}.json")
+        partial = f"{path}.tmp"
+        with open(partial, "wb") as out:
+            out.write(dumps({**self.as_dict(), "user_id": self.user_id, "renders": renders}))
+        # readers never see a partial journal
+        os.replace(partial, path)
+        return path
+
+    def _release_journal(self) -> None:
+        # The journal this job was resumed from is superseded once the job
+        # finishes or writes its own
+        if self._journal is not None:
+            os.unlink(self._journal)
+            self._journal = None
+
+    @classmethod
+    def resume(cls, journal: str, sessions: async_sessionmaker) -> "ImportJob":
+        with open(journal, "rb") as f:
+            data = orjson.loads(f.read())
+
+        job = cls(
+            user_id=data["user_id"],
+            id=data["job_id"],
+            rows=data["rows"],
+            created=data["created"],
+            failed=data["failed"],
+            rendered=data["rendered"],
+            render_failed=data["render_failed"],
+            errors=data["errors"],
+            started_at=datetime.fromisoformat(data["started_at"]),
+        )
+        job._journal = journal
+        job.start_rendering(sessions)
+        for item_id, width, height in data["renders"]:
+            job._queue_render(item_id, width, height)
+        job.finish_importing(data["detail"])
+        return job
+
+
+# Job status lives in the worker process that runs the import: with several
+# workers, GET /api/items/import/{job_id} only finds a job when it reaches
+# that worker (sticky sessions, or a single worker)
+_jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+
+
+def register_job(job: ImportJob) -> None:
+    _jobs[job.id] = job
+    finished = [key for key, old in _jobs.items() if old.finished]
+    for key in finished[:max(0, len(_jobs) - IMPORT_JOBS_KEPT)]:
+        del _jobs[key]
+
+
+def get_job(job_id: str, user_id: int) -> Optional[ImportJob]:
+    job = _jobs.get(job_id)
+    return job if job is not None and job.user_id == user_id else None
+
+
+async def drain_import_jobs(timeout: float) -> list[str]:
+    """
+    Shutdown: let every job finish the renders it is running, waiting up to
+    `timeout`, then journal what is left for the next start to pick up.
+    """
+    jobs = [job for job in _jobs.values() if job._workers]
+    for job in jobs:
+        job.stop()
+
+    workers = [task for job in jobs for task in job._workers]
+    if workers:
+        _, late = await asyncio.wait(workers, timeout=timeout)
+        for task in late:
+            task.cancel()
+        await asyncio.gather(*late, return_exceptions=True)
+
+    journals = [path for path in (job.write_journal() for job in jobs) if path]
+    if journals:
+        logger.warning("journaled %d unfinished import job(s) for the next start", len(journals))
+    return journals
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+def _claimable(name: str) -> bool:
+    """A journal nobody resumes: unclaimed, or claimed by a dead worker."""
+    if name.endswith(".json"):
+        return True
+    stem, _, pid = name.rpartition(".")
+    if not stem.endswith(".json") or not pid.isdigit():
+        return False
+    # A worker that died while resuming; its pid may have been reused by
+    # this very process after a container restart
+    return int(pid) == os.getpid() or not _process_alive(int(pid))
+
+
+def resume_journaled_jobs(sessions: async_sessionmaker) -> list[ImportJob]:
+    """
+    Startup: continue the renders of jobs journaled by a previous shutdown,
+    and of jobs a previous worker was resuming when it died.
+    """
+    if not os.path.isdir(RENDER_JOURNAL_DIR):
+        return []
+
+    resumed = []
+    for name in sorted(os.listdir(RENDER_JOURNAL_DIR)):
+        if not _claimable(name):
+            continue
+        path = os.path.join(RENDER_JOURNAL_DIR, name)
+        journal = os.path.join(RENDER_JOURNAL_DIR, name[:name.index(".json") + len(".json")])
+        claimed = f"{journal}.{os.getpid()}"
+        if path != claimed:
+            try:
+                # Atomic: with several workers starting, exactly one gets each job
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+        job = ImportJob.resume(claimed, sessions)
+        register_job(job)
+        resumed.append(job)
+
+    if resumed:
+        logger.info("resumed %d journaled import job(s)", len(resumed))
+    return resumed
+
+
+# ================= IMPORT =================
+
+def _validate(
+    values: dict[str, str], materials: set[int], product_types: set[int]
+) -> tuple[Optional[ItemCreate], list[dict[str, str]]]:
+    try:
+        data = ItemCreate(**values)
+    except ValidationError as e:
+        return None, [
+            {"field": ".".join(str(part) for part in error["loc"]), "message": error["msg"]}
+            for error in e.errors()
+        ]
+
+    # Checked here instead of by the foreign keys, which would fail the whole batch
+    errors = []
+    if data.material_id not in materials:
+        errors.append({"field": "material_id", "message": "unknown material"})
+    if data.product_type_id not in product_types:
+        errors.append({"field": "product_type_id", "message": "unknown product type"})
+    return (None, errors) if errors else (data, [])
+
+
+async def _insert(db: AsyncSession, job: ImportJob, batch: list[ItemCreate]) -> None:
+    # One multi-row INSERT: session.add_all() sends one per row on MySQL, to
+    # read each generated id. The batch marker finds the new rows instead.
+    marker = uuid.uuid4().hex
+    await db.execute(
+        insert(Item).values([{**data.dict(), "import_batch": marker} for data in batch])
+    )
+    result = await db.execute(
+        select(Item.id, Item.material_id, Item.product_type_id, Item.width, Item.height)
+        .where(Item.import_batch == marker)
+        .order_by(Item.id)
+    )
+    items = result.all()
+    await insert_changes(db, Item, [item.id for item in items], OP_INSERT)
+    await db.commit()
+    item_writes.bump()
+    catalog_snapshot.items_added(items)
+    job.created += len(items)
+    job.render(items)
+
+
+async def run_import(
+    job: ImportJob,
+    chunks: AsyncIterator[bytes],
+    db: AsyncSession,
+    sessions: async_sessionmaker,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> None:
+    """
+    Insert the items of a CSV stream in batches while it is still being
+    received. Every committed batch goes straight to the render workers,
+    which keep running after the upload is done.
+    """
+    records = csv_records(chunks)
+    header = await anext(records, None)
+    columns = [name.strip() for name in header or ()]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"CSV header is missing column(s): {', '.join(missing)}",
+        )
+
+    materials = set((await db.execute(select(Material.id))).scalars())
+    product_types = set((await db.execute(select(ProductType.id))).scalars())
+
+    register_job(job)
+    job.start_rendering(sessions)
+    batch: list[ItemCreate] = []
+    try:
+        async for record in records:
+            if not any(value.strip() for value in record):
+                continue
+            job.rows += 1
+            data, errors = _validate(dict(zip(columns, record)), materials, product_types)
+            if errors:
+                job.reject(job.rows, errors)
+                continue
+            batch.append(data)
+            if len(batch) >= batch_size:
+                await _insert(db, job, batch)
+                batch = []
+        if batch:
+            await _insert(db, job, batch)
+    except BaseException as e:
+        # Committed batches stay, and are still rendered
+        job.finish_importing(detail=f"Import stopped after row {job.rows}: {e!r}")
+        raise
+    job.finish_importing()
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+
+from app.conditional import is_not_modified, not_modified, validator_headers
+from app.serialization import dumps
+from app.singleflight import singleflight
+
+# ================= CONFIG =================
+
+# Each worker holds its own copy, so writes made through another worker are
+# only picked up once the entry expires.
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+
+
+@dataclass(frozen=True)
+class Validated:
+    """Loader result carrying its own validators (e.g. updated_at based)."""
+    content: Any
+    etag: str
+    last_modified: Optional[datetime] = None
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime]
+    version: int
+    expires_at: float
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return validator_headers(self.etag, self.last_modified)
+
+
+class CatalogCache:
+    """
+    Read-through cache for the materials / product types catalog.
+
+    Entries are stored pre-serialized together with their ETag. Every write
+    to the catalog calls bump(), which advances the version and drops all
+    entries; a load that started before a bump is never stored.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL):
+        self.ttl = ttl
+        self._version = 0
+        self._entries: dict[str, CachedResponse] = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        self._version += 1
+        self._entries.clear()
+        return self._version
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.version != self._version or entry.expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return entry
+
+    def store(
+        self,
+        key: str,
+        body: bytes,
+        version: int,
+        etag: Optional[str] = None,
+        last_modified: Optional[datetime] = None,
+    ) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            etag=etag or f'"{hashlib.sha1(body).hexdigest()}"',
+            last_modified=last_modified,
+            version=version,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        if version == self._version:
+            self._entries[key] = entry
+        return entry
+
+    async def _load(
+        self,
+        key: str,
+        version: int,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> CachedResponse:
+        # loader may raise (e.g. 404); nothing is cached in that case
+        loaded = await loader()
+        if isinstance(loaded, Validated):
+            return self.store(
+                key, dumps(loaded.content), version, loaded.etag, loaded.last_modified
+            )
+        return self.store(key, dumps(loaded), version)
+
+    async def respond(
+        self,
+        request: Request,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Response:
+        entry = self.get(key)
+        if entry is None:
+            # Concurrent misses for the same key share one load
+            version = self._version
+            entry = await singleflight.do(
+                ("catalog", key, version), lambda: self._load(key, version, loader)
+            )
+
+        if is_not_modified(request, entry.etag, entry.last_modified):
+            return not_modified(entry.headers)
+
+        return Response(
+            content=entry.body,
+            media_type="application/json",
+            headers=entry.headers,
+        )
+
+
+catalog_cache = CatalogCache()
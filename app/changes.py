@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal
+from app.models import Change, Item, Material, ProductType
+
+# ================= CONFIG =================
+
+CHANGES_RETENTION = timedelta(days=float(os.getenv("CHANGES_RETENTION_DAYS", "30")))
+CHANGES_PURGE_INTERVAL = float(os.getenv("CHANGES_PURGE_INTERVAL", "3600"))
+# Changes younger than this are not served yet. Ids are assigned on insert
+# but become visible on commit, so a transaction that started earlier can
+# still commit a lower id; a consumer past it would never see that change.
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", "2"))
+CHANGES_PAGE_SIZE = 100
+CHANGES_PAGE_MAX = 1000
+
+OP_INSERT = "insert"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+
+# Tables with a change feed, and their name in it
+TRACKED = {
+    Item: "item",
+    Material: "material",
+    ProductType: "product_type",
+}
+
+logger = logging.getLogger("app.changes")
+
+
+def record_changes(db: AsyncSession, model: type, ids: Iterable[int], op: str) -> None:
+    """Add change rows for `ids` to the session; they commit with the change itself."""
+    entity = TRACKED.get(model)
+    if entity is None:
+        return
+    db.add_all([Change(entity=entity, entity_id=entity_id, op=op) for entity_id in ids])
+
+
+def record_change(db: AsyncSession, model: type, entity_id: int, op: str) -> None:
+    record_changes(db, model, [entity_id], op)
+
+
+async def insert_changes(db: AsyncSession, model: type, ids: list[int], op: str) -> None:
+    """
+    record_changes as one multi-row INSERT, for bulk writes: ORM objects go
+    out one INSERT per row on MySQL, which cannot return generated ids.
+    """
+    entity = TRACKED.get(model)
+    if entity is None or not ids:
+        return
+    await db.execute(
+        insert(Change).values([{"entity": entity, "entity_id": id_, "op": op} for id_ in ids])
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed(session: Session, flush_context: Any) -> None:
+    # ORM writes (session.add, attribute changes, session.delete) are picked
+    # up here; the change rows go out with the next flush of the same commit.
+    # Core UPDATE / DELETE statements call record_changes() themselves.
+    changes = []
+    for op, objs in (
+        (OP_INSERT, session.new),
+        (OP_UPDATE, [obj for obj in session.dirty if session.is_modified(obj)]),
+        (OP_DELETE, session.deleted),
+    ):
+        for obj in objs:
+            entity = TRACKED.get(type(obj))
+            if entity is not None:
+                changes.append(Change(entity=entity, entity_id=obj.id, op=op))
+    session.add_all(changes)
+
+
+def _as_dict(change: Change) -> dict[str, Any]:
+    return {
+        "cursor": change.id,
+        "entity": change.entity,
+        "id": change.entity_id,
+        "op": change.op,
+        "changed_at": change.changed_at,
+    }
+
+
+async def read_changes(
+    db: AsyncSession,
+    since: int,
+    limit: int,
+    entity: Optional[str] = None,
+) -> Optional[dict[str, Any]]:
+    """
+    The page of changes after cursor `since`, oldest first. None when
+    `since` is older than the retained history: changes the consumer has
+    not seen may have been purged.
+    """
+    oldest = await db.scalar(select(func.min(Change.id)))
+    if oldest is not None and since < oldest - 1:
+        return None
+
+    criteria = [Change.id > since]
+    if CHANGES_SETTLE_SECONDS:
+        criteria.append(
+            Change.changed_at <= datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+        )
+    if entity is not None:
+        criteria.append(Change.entity == entity)
+
+    result = await db.execute(
+        select(Change).where(*criteria).order_by(Change.id).limit(limit + 1)
+    )
+    changes = result.scalars().all()
+    page = changes[:limit]
+    return {
+        "changes": [_as_dict(change) for change in page],
+        # unchanged when there is nothing new: poll again with the same cursor
+        "next_cursor": page[-1].id if page else since,
+        "has_more": len(changes) > limit,
+    }
+
+
+async def latest_cursor(db: AsyncSession) -> int:
+    return await db.scalar(select(func.max(Change.id))) or 0
+
+
+async def purge_old_changes(db: AsyncSession) -> int:
+    result = await db.execute(
+        delete(Change).where(Change.changed_at < datetime.utcnow() - CHANGES_RETENTION)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def purge_old_changes_periodically(interval: float = CHANGES_PURGE_INTERVAL) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                purged = await purge_old_changes(db)
+            if purged:
+                logger.info("Purged %d changes older than %s", purged, CHANGES_RETENTION)
+        except Exception:
+            logger.exception("Purging old changes failed")
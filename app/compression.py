@@ -0,0 +1,231 @@
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # optional: pip install brotli
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+try:  # optional: pip install zstandard
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+# ================= CONFIG =================
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Levels as (gzip, brotli, zstd). Buffered JSON/CSV compress ~10x, so they
+# get a stronger level; streams favour latency.
+DEFAULT_LEVELS = (6, 5, 6)
+STREAMING_LEVELS = (1, 1, 1)
+CONTENT_TYPE_LEVELS = {
+    "application/json": (6, 5, 6),
+    "text/csv": (6, 6, 9),
+    "text/html": (6, 5, 6),
+    "text/plain": (6, 5, 6),
+    "text/event-stream": (1, 1, 1),
+}
+
+# Only text-like bodies are worth compressing; PDFs, images, archives and
+# parquet files are already compressed.
+COMPRESSIBLE_PREFIXES = ("text/",)
+COMPRESSIBLE_SUFFIXES = ("json", "xml", "javascript")
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type.startswith(COMPRESSIBLE_PREFIXES) or media_type.endswith(
+        COMPRESSIBLE_SUFFIXES
+    )
+
+
+def _levels_for(content_type: str, streaming: bool) -> tuple[int, int, int]:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in CONTENT_TYPE_LEVELS:
+        return CONTENT_TYPE_LEVELS[media_type]
+    return STREAMING_LEVELS if streaming else DEFAULT_LEVELS
+
+
+def available_encodings() -> list[str]:
+    # In order of preference
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def accepted_encodings(accept_encoding: str) -> dict[str, float]:
+    """Content codings of an Accept-Encoding header, with their q values."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    accepted = accepted_encodings(accept_encoding)
+    return accepted.get(encoding, accepted.get("*", 0.0)) > 0
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    for encoding in available_encodings():
+        if accepts_encoding(accept_encoding, encoding):
+            return encoding
+    return None
+
+
+class _Compressor:
+    """Incremental compressor with a flush that emits everything so far."""
+
+    def __init__(self, encoding: str, levels: tuple[int, int, int]):
+        gzip_level, brotli_level, zstd_level = levels
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=brotli_level)
+        else:
+            self._obj = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._obj.flush()
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compresses text-like responses of at least COMPRESSION_MIN_SIZE bytes
+    with the best encoding both sides support (zstd, br, gzip).
+
+    Buffered bodies are compressed in one go. Streaming bodies are
+    compressed chunk by chunk and flushed after every chunk, so a client
+    never waits on data the compressor is holding back.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self.app, encoding, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _eligible(self, headers: MutableHeaders) -> bool:
+        status = self.start_message["status"]
+        return (
+            status >= 200
+            and status not in (204, 304)
+            and "content-encoding" not in headers
+            and "no-transform" not in headers.get("cache-control", "")
+            and is_compressible(headers.get("content-type", ""))
+        )
+
+    def _start(self, headers: MutableHeaders, streaming: bool) -> None:
+        self.compressor = _Compressor(
+            self.encoding, _levels_for(headers.get("content-type", ""), streaming)
+        )
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # The compressed bytes differ from what the strong ETag describes
+            headers["ETag"] = f"W/{etag}"
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            # First body chunk: decide whether to compress at all
+            headers = MutableHeaders(scope=self.start_message)
+            declared = headers.get("content-length")
+            large_enough = (
+                len(body) >= self.minimum_size
+                if not more_body
+                else declared is None or int(declared) >= self.minimum_size
+            )
+            if not (large_enough and self._eligible(headers)):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self._start(headers, streaming=more_body)
+            if not more_body:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            del headers["Content-Length"]
+            await self.send(self.start_message)
+
+        if more_body:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+        await self.send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
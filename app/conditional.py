@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import false
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# ================= CONDITIONAL REQUESTS =================
+#
+# Single resources are versioned by updated_at. The ETag is
+#   "<id>-<updated_at in µs>"            for the resource itself, with
+#   ".<id>-<updated_at in µs>" appended  for every embedded relation,
+# so it changes whenever any part of the representation does.
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def resource_version(obj: Any) -> Optional[datetime]:
+    # rows written before updated_at existed fall back to created_at
+    return getattr(obj, "updated_at", None) or getattr(obj, "created_at", None)
+
+
+def _micros(version: Optional[datetime]) -> int:
+    if version is None:
+        return 0
+    delta = version.replace(tzinfo=None) - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def resource_etag(*objs: Any) -> str:
+    return '"' + ".".join(f"{obj.id}-{_micros(resource_version(obj))}" for obj in objs) + '"'
+
+
+def last_modified(*objs: Any) -> Optional[datetime]:
+    versions = [v for v in (resource_version(obj) for obj in objs) if v is not None]
+    return max(versions) if versions else None
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def validator_headers(etag: str, modified: Optional[datetime]) -> dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = http_date(modified)
+    return headers
+
+
+def _opaque(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of `etag` against an If-None-Match / If-Match value."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(_opaque(candidate) == _opaque(etag) for candidate in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, modified: Optional[datetime] = None) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return modified.replace(microsecond=0) <= since
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+# ================= OPTIMISTIC CONCURRENCY =================
+
+def if_match_criteria(request: Request, model: Any, obj_id: int) -> list:
+    """
+    WHERE criteria enforcing the request's If-Match header on an UPDATE.
+
+    Empty when there is no header (or "*"), so the update is unconditional.
+    """
+    header = request.headers.get("if-match")
+    if not header or header.strip() == "*":
+        return []
+
+    versions = []
+    for candidate in header.split(","):
+        tag = _opaque(candidate).strip('"')
+        head = tag.split(".", 1)[0]
+        tag_id, _, micros = head.partition("-")
+        if tag_id == str(obj_id) and micros.isdigit():
+            versions.append(EPOCH + timedelta(microseconds=int(micros)))
+
+    if not versions:
+        return [false()]
+    return [model.updated_at.in_(versions)]
+
+
+async def missing_or_precondition_failed(
+    db: AsyncSession,
+    model: Any,
+    obj_id: int,
+    criteria: list,
+    not_found_detail: str,
+) -> HTTPException:
+    """Explain why a conditional UPDATE matched no row: 404 or 412."""
+    if criteria and await db.get(model, obj_id) is not None:
+        return HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"{model.__name__} was modified by another request",
+        )
+    return HTTPException(404, not_found_detail)
@@ -0,0 +1,174 @@
+from datetime import datetime
+from typing import Any, Optional, Type, TypeVar
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.changes import OP_DELETE, OP_INSERT, OP_UPDATE, record_change
+from app.database import Base
+
+ModelT = TypeVar("ModelT", bound=Base)
+
+# Rows per INSERT statement; keeps each packet well below max_allowed_packet
+BULK_CHUNK_SIZE = 1000
+
+
+def _supports_update_returning(db: AsyncSession) -> bool:
+    # MySQL has no UPDATE ... RETURNING; MariaDB/SQLite/PostgreSQL do
+    return bool(db.get_bind().dialect.update_returning)
+
+
+async def update_by_id(
+    db: AsyncSession,
+    model: Type[ModelT],
+    obj_id: int,
+    values: dict[str, Any],
+    *criteria,
+) -> Optional[ModelT]:
+    """
+    Apply `values` to the row `obj_id` with a single UPDATE and commit.
+
+    The row is read back through RETURNING when the dialect supports it,
+    otherwise with one SELECT in the same transaction. Extra `criteria`
+    narrow the WHERE clause (e.g. ownership checks). Returns None when no
+    row matched.
+    """
+    where = (model.id == obj_id, *criteria)
+    reload = select(model).where(*where).execution_options(populate_existing=True)
+
+    if not values:
+        result = await db.execute(reload)
+        return result.scalar_one_or_none()
+
+    stmt = update(model).where(*where).values(**values)
+
+    if _supports_update_returning(db):
+        result = await db.execute(stmt.returning(model))
+        obj = result.scalar_one_or_none()
+    else:
+        result = await db.execute(stmt)
+        obj = None
+        if result.rowcount:
+            result = await db.execute(reload)
+            obj = result.scalar_one_or_none()
+
+    if obj is not None:
+        record_change(db, model, obj_id, OP_UPDATE)
+    await db.commit()
+    return obj
+
+
+async def delete_by_id(
+    db: AsyncSession,
+    model: Type[ModelT],
+    obj_id: int,
+    *criteria,
+) -> bool:
+    """Single DELETE for the row `obj_id`; False when nothing was deleted."""
+    result = await db.execute(
+        delete(model).where(model.id == obj_id, *criteria)
+    )
+    if result.rowcount:
+        record_change(db, model, obj_id, OP_DELETE)
+    await db.commit()
+    return result.rowcount > 0
+
+
+def _chunks(rows: list, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _name_key(name: str) -> str:
+    # Names as the unique index compares them: the _ci collations ignore
+    # case and (PAD SPACE) trailing spaces, so "Wood" and "wood " are one row
+    return name.rstrip(" ").casefold()
+
+
+def _upsert_statement(db: AsyncSession, model: Type[ModelT], chunk: list[dict[str, Any]]):
+    # Upserts do not apply Column.onupdate: without an explicit updated_at
+    # the row's ETag and Last-Modified would not change
+    touched = {"updated_at": datetime.utcnow()} if "updated_at" in model.__table__.c else {}
+    # SQLite (the test database) spells the same upsert ON CONFLICT
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = sqlite_insert(model).values(chunk)
+        return stmt.on_conflict_do_update(
+            index_elements=[model.name],
+            set_={
+                **{column: stmt.excluded[column] for column in chunk[0] if column != "name"},
+                **touched,
+            },
+        )
+    stmt = mysql_insert(model).values(chunk)
+    return stmt.on_duplicate_key_update({
+        **{column: stmt.inserted[column] for column in chunk[0] if column != "name"},
+        **touched,
+    })
+
+
+async def bulk_upsert_by_name(
+    db: AsyncSession,
+    model: Type[ModelT],
+    rows: list[dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """
+    Insert or update `rows` keyed on the unique `name` column.
+
+    Uses multi-row INSERT ... ON DUPLICATE KEY UPDATE (BULK_CHUNK_SIZE rows
+    per statement) inside one transaction. Returns one outcome per input
+    row, in input order: created, updated, duplicate (superseded by a later
+    row with the same name) or invalid (rejected before reaching MySQL).
+    """
+    outcomes: list[dict[str, Any]] = [
+        {"index": index, "name": row["name"], "status": None, "id": None, "detail": None}
+        for index, row in enumerate(rows)
+    ]
+
+    max_length = model.__table__.c.name.type.length
+    # keyed by _name_key: names the unique index treats as equal are one row
+    latest: dict[str, int] = {}
+    for index, row in enumerate(rows):
+        if not row["name"] or (max_length and len(row["name"]) > max_length):
+            outcomes[index]["status"] = "invalid"
+            outcomes[index]["detail"] = f"name must be 1-{max_length} characters"
+            continue
+        key = _name_key(row["name"])
+        if key in latest:
+            superseded = outcomes[latest[key]]
+            superseded["status"] = "duplicate"
+            superseded["detail"] = f"superseded by row {index}"
+        latest[key] = index
+
+    if not latest:
+        return outcomes
+
+    names = [rows[index]["name"] for index in latest.values()]
+    existing: set[str] = set()
+    for chunk in _chunks(names):
+        result = await db.execute(select(model.name).where(model.name.in_(chunk)))
+        existing.update(_name_key(name) for name in result.scalars().all())
+
+    for chunk in _chunks([rows[index] for index in latest.values()]):
+        await db.execute(_upsert_statement(db, model, chunk))
+
+    ids: dict[str, int] = {}
+    for chunk in _chunks(names):
+        result = await db.execute(
+            select(model.name, model.id).where(model.name.in_(chunk))
+        )
+        ids.update((_name_key(name), obj_id) for name, obj_id in result.tuples().all())
+
+    for key in latest:
+        # a collation rule _name_key does not know (e.g. accents) can leave
+        # a name unmatched: report it without an id rather than fail the batch
+        if key in ids:
+            record_change(db, model, ids[key], OP_UPDATE if key in existing else OP_INSERT)
+    await db.commit()
+
+    for key, index in latest.items():
+        outcomes[index]["status"] = "updated" if key in existing else "created"
+        outcomes[index]["id"] = ids.get(key)
+
+    return outcomes
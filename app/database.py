@@ -6,6 +6,8 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import declarative_base
 import os
 
+from app.instrumentation import instrument_engine
+
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
 )
@@ -15,6 +17,7 @@ engine = create_async_engine(
     echo=False,
     future=True,
 )
+instrument_engine(engine)
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -28,3 +31,9 @@ Base = declarative_base()
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def get_sessionmaker() -> async_sessionmaker:
+    # Streaming responses run after get_db's session is closed, so they open
+    # their own session from this factory
+    return AsyncSessionLocal
@@ -0,0 +1,146 @@
+import asyncio
+import itertools
+import os
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+
+from app.serialization import dumps
+
+# ================= CONFIG =================
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "1000"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_RETRY_MS = 3000
+
+# Event ids are "<boot id>-<sequence>". A Last-Event-ID from another process
+# (a restart, or another worker) cannot be resumed and gets a reset instead.
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+@dataclass(frozen=True)
+class Event:
+    seq: int
+    type: str
+    data: dict[str, Any]
+
+    @property
+    def id(self) -> str:
+        return f"{BOOT_ID}-{self.seq}"
+
+    def encode(self) -> bytes:
+        return (
+            f"id: {self.id}\nevent: {self.type}\ndata: ".encode()
+            + dumps(self.data)
+            + b"\n\n"
+        )
+
+
+HEARTBEAT = b": heartbeat\n\n"
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for Server-Sent Events.
+
+    Published events go into a ring buffer of the last EVENT_BUFFER_SIZE
+    events; subscribers keep a cursor into it and are woken on every
+    publish. A subscriber that falls behind the buffer (or resumes from an
+    id that is no longer there) gets a `reset` event telling the client to
+    re-fetch state, instead of silently missing events.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self._seq = 0
+        self._buffer: deque[Event] = deque(maxlen=buffer_size)
+        self._changed: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def publish(self, type: str, data: dict[str, Any]) -> Event:
+        """Publish from the event loop's thread (use call_soon_threadsafe elsewhere)."""
+        self._seq += 1
+        event = Event(self._seq, type, data)
+        self._buffer.append(event)
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+        return event
+
+    def _wake_event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._loop is not loop:
+            self._changed = asyncio.Event()
+            self._loop = loop
+        return self._changed
+
+    def _since(self, cursor: int) -> tuple[list[Event], bool]:
+        """Events after `cursor`, and whether some were already dropped."""
+        if not self._buffer or cursor >= self._seq:
+            return [], False
+        first = self._buffer[0].seq
+        if cursor < first - 1:
+            return list(self._buffer), True
+        return list(itertools.islice(self._buffer, cursor - first + 1, None)), False
+
+    def resume_cursor(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequence to continue after, or None when `last_event_id` cannot be resumed."""
+        if not last_event_id:
+            return self._seq
+        boot, _, seq = last_event_id.strip().rpartition("-")
+        if boot != BOOT_ID or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        return int(seq)
+
+    def _reset(self, reason: str) -> bytes:
+        # Carries the current position, so a reconnect resumes from here
+        return Event(self._seq, "reset", {"reason": reason}).encode()
+
+    async def stream(
+        self,
+        last_event_id: Optional[str] = None,
+        item_id: Optional[int] = None,
+        heartbeat: float = SSE_HEARTBEAT_SECONDS,
+    ) -> AsyncIterator[bytes]:
+        """SSE byte stream: backlog after `last_event_id`, then live events."""
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+
+        cursor = self.resume_cursor(last_event_id)
+        if cursor is None:
+            cursor = self._seq
+            yield self._reset("unknown Last-Event-ID")
+
+        while True:
+            changed = self._wake_event()
+            events, lost = self._since(cursor)
+            if lost:
+                yield self._reset("events were dropped")
+            for event in events:
+                cursor = event.seq
+                if item_id is None or event.data.get("item_id") == item_id:
+                    yield event.encode()
+
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                # keeps proxies from closing an idle connection
+                yield HEARTBEAT
+
+
+event_bus = EventBus()
+
+
+# ================= RENDER STATE =================
+
+RENDER_QUEUED = "queued"
+RENDER_RUNNING = "running"
+RENDER_DONE = "done"
+RENDER_FAILED = "failed"
+
+
+def publish_render_state(item_id: int, state: str, **data: Any) -> Event:
+    return event_bus.publish("render", {"item_id": item_id, "state": state, **data})
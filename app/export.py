@@ -0,0 +1,199 @@
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import time
+import zipfile
+from typing import Any, AsyncIterator, Sequence
+
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# ================= CONFIG =================
+
+# Rows fetched from the server-side cursor at a time; also the CSV chunk
+# and Parquet row group size, so memory stays bounded by one batch.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+# Bytes read from a PDF, and written to the archive stream, at a time
+ZIP_READ_SIZE = 64 * 1024
+# Items an archive reads per query. Each page is read in its own short
+# session: a cursor held open while the client downloads the PDFs would be
+# dropped by MySQL (net_write_timeout) under a slow client.
+ZIP_PAGE_SIZE = 500
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    try:  # in requirements.txt; checked for installs that leave it out
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def _batches(
+    sessions: async_sessionmaker,
+    statement: Select,
+    batch_size: int,
+) -> AsyncIterator[Sequence[Any]]:
+    async with sessions() as db:
+        # stream() uses a server-side cursor (SSCursor on MySQL), so rows
+        # arrive batch by batch instead of being buffered by the driver
+        result = await db.stream(statement.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+async def stream_csv(
+    sessions: async_sessionmaker,
+    statement: Select,
+    columns: list[str],
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+
+    async for rows in _batches(sessions, statement, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """
+    Write-only file object; the Parquet and ZIP writers only ever append.
+    Without seek(), zipfile writes sizes in data descriptors after each entry.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_parquet(
+    sessions: async_sessionmaker,
+    statement: Select,
+    schema: "pyarrow.Schema",
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """One row group per batch; the footer is written when the cursor is exhausted."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    async for rows in _batches(sessions, statement, batch_size):
+        columns = list(zip(*rows))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+async def _keyset_pages(
+    sessions: async_sessionmaker,
+    statement: Select,
+    page_size: int,
+) -> AsyncIterator[Sequence[Any]]:
+    """
+    Rows of `statement`, ordered by its first column (a unique id), read
+    page by page with `id > last` instead of one long-lived cursor. No
+    session is open while the caller works through a page.
+    """
+    id_column = statement.selected_columns[0]
+    last = None
+    while True:
+        page = statement if last is None else statement.where(id_column > last)
+        async with sessions() as db:
+            rows = (await db.execute(page.limit(page_size))).all()
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1][0]
+
+
+async def stream_pdf_zip(
+    sessions: async_sessionmaker,
+    statement: Select,
+) -> AsyncIterator[bytes]:
+    """
+    ZIP archive of the PDFs of `statement`'s (id, pdf_path) rows, ordered by
+    id, produced while the files are read, ZIP_READ_SIZE at a time. Entries
+    are STORED: PDFs are compressed already. zipfile switches to ZIP64
+    records by itself once the archive passes 4 GiB or 65535 entries.
+    """
+    sink = _ChunkSink()
+    # ids without a PDF, spilled to disk past ZIP_READ_SIZE
+    missing = tempfile.SpooledTemporaryFile(max_size=ZIP_READ_SIZE)
+    with missing, zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        async for rows in _keyset_pages(sessions, statement, ZIP_PAGE_SIZE):
+            for item_id, pdf_path in rows:
+                try:
+                    stat = await asyncio.to_thread(os.stat, pdf_path) if pdf_path else None
+                except OSError:
+                    stat = None
+                if stat is None:
+                    missing.write(b"%d\n" % item_id)
+                    continue
+
+                entry = zipfile.ZipInfo(
+                    f"item-{item_id}.pdf", date_time=time.localtime(stat.st_mtime)[:6]
+                )
+                # known up front, so zipfile picks ZIP64 for a > 4 GiB file
+                entry.file_size = stat.st_size
+                with open(pdf_path, "rb") as source, archive.open(entry, "w") as target:
+                    while chunk := await asyncio.to_thread(source.read, ZIP_READ_SIZE):
+                        target.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+
+        if missing.tell():
+            missing.seek(0)
+            with archive.open("missing.txt", "w") as target:
+                target.write(b"Items without a PDF:\n")
+                while chunk := missing.read(ZIP_READ_SIZE):
+                    target.write(chunk)
+                    yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+from fastapi import HTTPException, Response, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import IdempotencyKey
+from app.serialization import dumps
+
+# ================= CONFIG =================
+
+IDEMPOTENCY_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+# How long a duplicate waits for the first request before giving up with 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+# A request still running after this long is presumed dead (its worker was
+# killed) and a retry takes its key over. Must exceed the slowest request.
+IDEMPOTENCY_LEASE = timedelta(seconds=float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "120")))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+POLL_INTERVAL = 0.1
+MAX_KEY_LENGTH = 255
+
+logger = logging.getLogger("app.idempotency")
+
+# Requests running in this worker, so a local duplicate wakes up right away
+# instead of on its next poll
+_running: dict[tuple[int, str], asyncio.Event] = {}
+
+
+def request_fingerprint(route: str, payload: Any) -> str:
+    body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(route.encode() + b"\n" + body).hexdigest()
+
+
+def _key_filter(user_id: int, key: str):
+    return (IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+
+async def _claim(db: AsyncSession, user_id: int, key: str, request_hash: str) -> bool:
+    # The unique (user_id, key) constraint decides which request runs
+    now = datetime.utcnow()
+    db.add(IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        request_hash=request_hash,
+        expires_at=now + IDEMPOTENCY_TTL,
+        lease_expires_at=now + IDEMPOTENCY_LEASE,
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    return True
+
+
+def _lease_expired(row: IdempotencyKey) -> bool:
+    # rows claimed before leases existed have none: count from their creation
+    lease_expires_at = row.lease_expires_at or row.created_at + IDEMPOTENCY_LEASE
+    return lease_expires_at <= datetime.utcnow()
+
+
+async def _take_over(db: AsyncSession, row: IdempotencyKey) -> bool:
+    # Compare-and-set on the old lease: of several retries, one wins
+    result = await db.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.id == row.id,
+            IdempotencyKey.status_code.is_(None),
+            IdempotencyKey.lease_expires_at.is_(None)
+            if row.lease_expires_at is None
+            else IdempotencyKey.lease_expires_at == row.lease_expires_at,
+        )
+        .values(lease_expires_at=datetime.utcnow() + IDEMPOTENCY_LEASE)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def _load(db: AsyncSession, user_id: int, key: str) -> Optional[IdempotencyKey]:
+    # Start a new transaction for every look: under REPEATABLE READ an old
+    # snapshot would never see the first request finish
+    await db.rollback()
+    result = await db.execute(
+        select(IdempotencyKey)
+        .where(*_key_filter(user_id, key))
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _wait(user_id: int, key: str, timeout: float) -> None:
+    event = _running.get((user_id, key))
+    if event is None:
+        # running in another worker; poll
+        await asyncio.sleep(timeout)
+        return
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+def _replay(row: IdempotencyKey) -> Response:
+    return Response(
+        content=row.response_body,
+        status_code=row.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def _execute(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int,
+) -> Response:
+    done = _running[(user_id, key)] = asyncio.Event()
+    try:
+        try:
+            body = dumps(await handler())
+        except Exception:
+            # Failed requests are not recorded; release the key so a retry runs
+            await db.rollback()
+            await db.execute(delete(IdempotencyKey).where(*_key_filter(user_id, key)))
+            await db.commit()
+            raise
+
+        await db.execute(
+            update(IdempotencyKey)
+            .where(*_key_filter(user_id, key))
+            .values(status_code=status_code, response_body=body)
+        )
+        await db.commit()
+    finally:
+        done.set()
+        _running.pop((user_id, key), None)
+
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+async def run_idempotent(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    request_hash: str,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int = status.HTTP_200_OK,
+) -> Response:
+    """
+    Run `handler` at most once per (user, Idempotency-Key).
+
+    The first request claims the key and stores its JSON response. Later
+    requests with the same key get that response replayed; one arriving
+    while the first is still running waits for it (up to
+    IDEMPOTENCY_WAIT_TIMEOUT, then 409), unless the first has held the key
+    for longer than IDEMPOTENCY_LEASE: then it is presumed dead and this
+    request runs instead. Reusing a key for a different request is a 422.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters",
+        )
+
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        if await _claim(db, user_id, key, request_hash):
+            return await _execute(db, user_id, key, handler, status_code)
+
+        row = await _load(db, user_id, key)
+        if row is not None:
+            if row.expires_at <= datetime.utcnow():
+                await db.execute(
+                    delete(IdempotencyKey).where(IdempotencyKey.id == row.id)
+                )
+                await db.commit()
+                continue
+            if row.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used for a different request",
+                )
+            if row.status_code is not None:
+                return _replay(row)
+            if _lease_expired(row) and await _take_over(db, row):
+                logger.warning("Taking over idempotency key %r of a request presumed dead", key)
+                return await _execute(db, user_id, key, handler, status_code)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"},
+            )
+        # No row means the first request failed and released the key: the
+        # next iteration claims it
+        await _wait(user_id, key, min(POLL_INTERVAL, remaining))
+
+
+async def purge_expired_keys(db: AsyncSession) -> int:
+    result = await db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def purge_expired_keys_periodically(
+    interval: float = IDEMPOTENCY_PURGE_INTERVAL,
+) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                purged = await purge_expired_keys(db)
+            if purged:
+                logger.info("Purged %d expired idempotency keys", purged)
+        except Exception:
+            logger.exception("Purging expired idempotency keys failed")
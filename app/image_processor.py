@@ -1,50 +1,371 @@
-from PIL import Image
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 from datetime import datetime
+import fcntl
+import functools
+import hashlib
 from io import BytesIO
+import logging
 import os
+import tempfile
+import time
+from typing import BinaryIO, Iterator, Optional
+import zlib
 
-STATIC_IMAGE_PATH = "app/assets/source.jpg"
+# Pillow and reportlab are imported on the first render, not at import time:
+# together they are a large part of app startup and most processes (CLI
+# tools, workers that never render) do not need them.
+
+STATIC_IMAGE_PATH = os.getenv("SOURCE_IMAGE_PATH", "app/assets/source.jpg")
 OUTPUT_DIR = "app/storage/pdfs"
+# Uncompressed TIFF copies of sources that cannot be read in bands, written
+# by `python -m app.prepare_source`
+STREAMABLE_SOURCE_DIR = "app/storage/sources"
+# PDFs are written to a temp file first and renamed into place when complete
+PARTIAL_SUFFIX = ".pdf.tmp"
+
+
+def _file_mode() -> int:
+    # mkstemp creates 0600 files; give PDFs the mode open() would. The umask
+    # can only be read by setting it, so do it once, before render threads run
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+PDF_FILE_MODE = _file_mode()
+
+# Sources of at least this many pixels are only ever read band by band, so a
+# render holds the rows it crops instead of the whole decoded source
+RENDER_BANDED_SOURCE_PIXELS = int(os.getenv("RENDER_BANDED_SOURCE_PIXELS", "16000000"))
+# Crops of at least this many pixels from such a source are also written strip
+# by strip, in memory proportional to RENDER_STRIP_BYTES instead of the crop area
+RENDER_STRIPWISE_MIN_PIXELS = int(os.getenv("RENDER_STRIPWISE_MIN_PIXELS", "16000000"))
+RENDER_STRIP_BYTES = int(os.getenv("RENDER_STRIP_BYTES", str(4 * 1024 * 1024)))
+FLATE_LEVEL = 6
+# Pillow refuses images above twice its decompression bomb limit (~179 MP by
+# default); print-resolution sources are larger. Band sources are checked
+# against this instead, without changing Pillow's global limit.
+RENDER_SOURCE_MAX_PIXELS = int(os.getenv("RENDER_SOURCE_MAX_PIXELS", "500000000"))
+
+# TIFF tags
+BITS_PER_SAMPLE = 258
+PLANAR_CONFIGURATION = 284
+
+logger = logging.getLogger("app.image_processor")
 
 
 def ensure_directories():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def crop_and_create_pdf(width: float, height: float, item_id: int) -> str:
-    ensure_directories()
+def remove_partial_pdfs(older_than: float = 3600) -> int:
+    """Delete temp files left by renders that were killed mid-write."""
+    if not os.path.isdir(OUTPUT_DIR):
+        return 0
+    # renders of other running workers may still be writing theirs
+    cutoff = time.time() - older_than
+    removed = 0
+    for entry in os.scandir(OUTPUT_DIR):
+        if entry.name.endswith(PARTIAL_SUFFIX) and entry.stat().st_mtime < cutoff:
+            os.unlink(entry.path)
+            removed += 1
+    return removed
 
-    if not os.path.exists(STATIC_IMAGE_PATH):
-        raise FileNotFoundError(f"Static image not found at {STATIC_IMAGE_PATH}")
 
-    # 1️⃣ Load image safely
-    original_image = Image.open(STATIC_IMAGE_PATH)
-    original_image = original_image.convert("RGB")
+def _open_tiff(path: str):
+    """
+    Open a TIFF with RENDER_SOURCE_MAX_PIXELS as the bomb limit. Image.open
+    only reads Pillow's global limit, which other threads' opens share, so
+    the TIFF plugin is used directly. Raises SyntaxError for other formats.
+    """
+    from PIL import Image, TiffImagePlugin
 
-    crop_width = min(int(width), original_image.width)
-    crop_height = min(int(height), original_image.height)
+    image = TiffImagePlugin.TiffImageFile(path)
+    if image.width * image.height > RENDER_SOURCE_MAX_PIXELS:
+        image.close()
+        raise Image.DecompressionBombError(
+            f"{path} has {image.width * image.height} pixels, "
+            f"more than RENDER_SOURCE_MAX_PIXELS ({RENDER_SOURCE_MAX_PIXELS})"
+        )
+    return image
 
-    if crop_width <= 0 or crop_height <= 0:
-        raise ValueError("Width and height must be greater than 0")
 
-    # 2️⃣ Crop top-left
-    cropped_image = original_image.crop((0, 0, crop_width, crop_height))
+def _strip_rows(width: int) -> int:
+    return max(1, RENDER_STRIP_BYTES // (width * 3))
+
+
+def _streamable(source) -> bool:
+    # uncompressed, chunky TIFF: every row sits at a known offset
+    if source.format != "TIFF" or source.tag_v2.get(PLANAR_CONFIGURATION, 1) != 1:
+        return False
+    return all(name == "raw" and args[2] == 1 for name, _, _, args in source.tile)
+
+
+def _row_bands(source, rows: int) -> list:
+    """
+    The tiles of a _streamable source cut into bands of at most `rows`
+    rows, which can be loaded one at a time.
+    """
+    bits = sum(source.tag_v2[BITS_PER_SAMPLE])
+    bands = []
+    for name, (x0, y0, x1, y1), offset, args in source.tile:
+        row_bytes = args[1] or ((x1 - x0) * bits + 7) // 8
+        for top in range(y0, y1, rows):
+            bands.append(
+                (name, (x0, top, x1, min(top + rows, y1)), offset + (top - y0) * row_bytes, args)
+            )
+    return bands
+
+
+def _prepared_copy() -> str:
+    """Path of the uncompressed TIFF copy prepare_source writes for the current source."""
+    stat = os.stat(STATIC_IMAGE_PATH)
+    version = f"{os.path.abspath(STATIC_IMAGE_PATH)}:{stat.st_size}:{stat.st_mtime_ns}"
+    name = hashlib.sha1(version.encode()).hexdigest()[:16] + ".tif"
+    return os.path.join(STREAMABLE_SOURCE_DIR, name)
+
+
+def _band_source() -> Optional[str]:
+    """A TIFF _row_bands can cut holding the source: itself, or its prepared copy."""
+    try:
+        with _open_tiff(STATIC_IMAGE_PATH) as source:
+            if _streamable(source):
+                return STATIC_IMAGE_PATH
+    except SyntaxError:
+        pass  # not a TIFF
+    copy = _prepared_copy()
+    return copy if os.path.exists(copy) else None
+
+
+def prepare_source() -> Optional[str]:
+    """
+    Convert a source of RENDER_BANDED_SOURCE_PIXELS or more that cannot be
+    read in bands (JPEG, PNG, compressed or planar TIFF) to an uncompressed
+    TIFF copy, which renders then read instead. Returns the copy's path, or
+    None when the source needs none.
+
+    Decodes the whole source, and lifts Pillow's global bomb limit while it
+    does: run it as a one-shot command per deploy, never in a worker.
+    """
+    from PIL import Image
+
+    if _band_source() == STATIC_IMAGE_PATH:
+        return None
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = RENDER_SOURCE_MAX_PIXELS
+    try:
+        with Image.open(STATIC_IMAGE_PATH) as source:
+            if source.width * source.height < RENDER_BANDED_SOURCE_PIXELS:
+                return None
+        return _convert_source()
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+def _convert_source() -> str:
+    from PIL import Image
+
+    path = _prepared_copy()
+    name = os.path.basename(path)
+    os.makedirs(STREAMABLE_SOURCE_DIR, exist_ok=True)
+    # Replicas deployed together share the directory: one converts, the
+    # others wait for it and find the copy. Released when the file closes.
+    with open(os.path.join(STREAMABLE_SOURCE_DIR, ".lock"), "wb") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(path):
+            return path
+        logger.info("Converting %s to an uncompressed TIFF for band reading", STATIC_IMAGE_PATH)
+        fd, partial_path = tempfile.mkstemp(dir=STREAMABLE_SOURCE_DIR, suffix=".tif.tmp")
+        try:
+            with os.fdopen(fd, "wb") as out, Image.open(STATIC_IMAGE_PATH) as source:
+                # save() of an image not loaded yet loads it into a copy: twice the memory
+                source.load()
+                image = source if source.mode in ("RGB", "L") else source.convert("RGB")
+                image.save(out, format="TIFF", compression="raw")
+            os.replace(partial_path, path)
+        except BaseException:
+            os.unlink(partial_path)
+            raise
+        # copies of earlier versions of the source
+        for entry in os.scandir(STREAMABLE_SOURCE_DIR):
+            if entry.name.endswith(".tif") and entry.name != name:
+                os.unlink(entry.path)
+    return path
+
+
+def _read_rows(path: str, bands: list, width: int, top: int, bottom: int):
+    """Load only the bands covering rows top..bottom of the first `width` columns."""
+    needed = [
+        band for band in bands
+        if band[1][1] < bottom and band[1][3] > top and band[1][0] < width
+    ]
+    first = min(extents[1] for _, extents, _, _ in needed)
+    with _open_tiff(path) as source:
+        source._size = (
+            max(extents[2] for _, extents, _, _ in needed),
+            max(extents[3] for _, extents, _, _ in needed) - first,
+        )
+        source.tile = [
+            (name, (x0, y0 - first, x1, y1 - first), offset, args)
+            for name, (x0, y0, x1, y1), offset, args in needed
+        ]
+        return source.crop((0, top - first, width, bottom - first)).convert("RGB")
+
+
+def _source_strips(path: str, crop_width: int, crop_height: int) -> Iterator:
+    """The top-left crop of the band source at `path` as RGB strips, top to bottom."""
+    with _open_tiff(path) as source:
+        # bands are as wide as the tiles under the crop: the whole source
+        # width for striped files, however narrow the crop
+        loaded_width = max(x1 for _, (x0, _, x1, _), _, _ in source.tile if x0 < crop_width)
+        rows = _strip_rows(loaded_width)
+        bands = _row_bands(source, rows)
+
+    for top in range(0, crop_height, rows):
+        yield _read_rows(path, bands, crop_width, top, min(top + rows, crop_height))
+
+
+class _PdfWriter:
+    """Writes numbered objects in order, then the xref table locating them."""
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.position = 0
+        self.offsets: list[int] = []
+        self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def write(self, data: bytes) -> None:
+        self.out.write(data)
+        self.position += len(data)
+
+    def begin(self) -> None:
+        self.offsets.append(self.position)
+        self.write(b"%d 0 obj\n" % len(self.offsets))
+
+    def add(self, body: bytes) -> None:
+        self.begin()
+        self.write(body + b"\nendobj\n")
+
+    def finish(self) -> None:
+        xref = self.position
+        self.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.offsets) + 1))
+        for offset in self.offsets:
+            self.write(b"%010d 00000 n \n" % offset)
+        self.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(self.offsets) + 1, xref)
+        )
 
-    # 3️⃣ Convert cropped image → BYTES (this is the key)
+
+def _pdf_string(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return b"(" + escaped.encode("latin-1") + b")"
+
+
+def _write_stripwise_pdf(
+    out: BinaryIO, crop_width: int, crop_height: int, timestamp: str, band_source: str
+) -> None:
+    """
+    The same page as _write_pdf, written by hand: the image is one
+    FlateDecode stream, compressed strip by strip as the strips are read,
+    so no more than a strip of pixels is held at a time. Flate is lossless,
+    so the file is larger than the JPEG-encoded one.
+    """
+    pdf = _PdfWriter(out)
+    content = b"q %d 0 0 %d 0 0 cm /Im0 Do Q\nBT /F1 12 Tf 10 %d Td %s Tj ET\n" % (
+        crop_width, crop_height, crop_height - 20, _pdf_string(f"Generated: {timestamp} UTC"),
+    )
+    pdf.add(b"<< /Type /Catalog /Pages 2 0 R >>")
+    pdf.add(b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>")
+    pdf.add(
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+        b"/Resources << /XObject << /Im0 6 0 R >> /Font << /F1 4 0 R >> >> /Contents 5 0 R >>"
+        % (crop_width, crop_height)
+    )
+    pdf.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pdf.add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+
+    # The length is only known once the stream is written: it follows as object 7
+    pdf.begin()
+    pdf.write(
+        b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+        b"/BitsPerComponent 8 /Filter /FlateDecode /Length 7 0 R >>\nstream\n"
+        % (crop_width, crop_height)
+    )
+    start = pdf.position
+    compressor = zlib.compressobj(FLATE_LEVEL)
+    for strip in _source_strips(band_source, crop_width, crop_height):
+        pdf.write(compressor.compress(strip.tobytes()))
+    pdf.write(compressor.flush())
+    length = pdf.position - start
+    pdf.write(b"\nendstream\nendobj\n")
+    pdf.add(b"%d" % length)
+    pdf.finish()
+
+
+def _render_source() -> tuple[Optional[str], tuple[int, int]]:
+    """
+    The band source to read, or None to decode the source whole, and the
+    source's size. Pillow decodes the whole image to crop it, however small
+    the crop, so large sources must be read in bands.
+    """
+    from PIL import Image
+
+    band_source = _band_source()
+    if band_source is not None:
+        with _open_tiff(band_source) as source:
+            size = source.size
+        if size[0] * size[1] >= RENDER_BANDED_SOURCE_PIXELS:
+            return band_source, size
+    try:
+        with Image.open(STATIC_IMAGE_PATH) as source:
+            size = source.size
+    except Image.DecompressionBombError:
+        size = None
+    if size is None or size[0] * size[1] >= RENDER_BANDED_SOURCE_PIXELS:
+        raise RuntimeError(
+            f"{STATIC_IMAGE_PATH} is too large to decode per render; "
+            "convert it with `python -m app.prepare_source`"
+        )
+    return None, size
+
+
+def _source_crop(crop_width: int, crop_height: int, band_source: Optional[str]):
+    """The top-left crop of the source as one RGB image."""
+    from PIL import Image
+
+    if band_source is not None:
+        # assembled from strips: only the crop is held, never the source
+        cropped_image = Image.new("RGB", (crop_width, crop_height))
+        top = 0
+        for strip in _source_strips(band_source, crop_width, crop_height):
+            cropped_image.paste(strip, (0, top))
+            top += strip.height
+        return cropped_image
+
+    # Crop top-left, then convert only the crop
+    with Image.open(STATIC_IMAGE_PATH) as original_image:
+        return original_image.crop((0, 0, crop_width, crop_height)).convert("RGB")
+
+
+def _write_pdf(
+    out: BinaryIO, crop_width: int, crop_height: int, timestamp: str,
+    band_source: Optional[str] = None,
+) -> None:
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.utils import ImageReader
+
+    # 1️⃣ Crop top-left
+    cropped_image = _source_crop(crop_width, crop_height, band_source)
+
+    # 2️⃣ Convert cropped image → BYTES (this is the key)
     img_buffer = BytesIO()
     cropped_image.save(img_buffer, format="JPEG")
     img_buffer.seek(0)
 
     image_reader = ImageReader(img_buffer)
 
-    # 4️⃣ Create PDF
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
-    pdf_filename = f"item_{item_id}_{timestamp}.pdf"
-    pdf_path = os.path.join(OUTPUT_DIR, pdf_filename)
-
-    c = canvas.Canvas(pdf_path, pagesize=(crop_width, crop_height))
+    # 3️⃣ Create PDF
+    c = canvas.Canvas(out, pagesize=(crop_width, crop_height))
 
     # Draw image
     c.drawImage(
@@ -63,4 +384,45 @@ def crop_and_create_pdf(width: float, height: float, item_id: int) -> str:
     c.showPage()
     c.save()
 
+
+def crop_and_create_pdf(width: float, height: float, item_id: int) -> str:
+    ensure_directories()
+
+    if not os.path.exists(STATIC_IMAGE_PATH):
+        raise FileNotFoundError(f"Static image not found at {STATIC_IMAGE_PATH}")
+
+    # Reads the header only
+    band_source, (source_width, source_height) = _render_source()
+    crop_width = min(int(width), source_width)
+    crop_height = min(int(height), source_height)
+
+    if crop_width <= 0 or crop_height <= 0:
+        raise ValueError("Width and height must be greater than 0")
+
+    timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
+    pdf_filename = f"item_{item_id}_{timestamp}.pdf"
+    pdf_path = os.path.join(OUTPUT_DIR, pdf_filename)
+    write = functools.partial(
+        _write_stripwise_pdf
+        if band_source is not None and crop_width * crop_height >= RENDER_STRIPWISE_MIN_PIXELS
+        else _write_pdf,
+        band_source=band_source,
+    )
+
+    # Never leave a half-written PDF under the final name: a render killed
+    # mid-write (e.g. by a deploy) leaves only a temp file behind
+    fd, partial_path = tempfile.mkstemp(
+        dir=OUTPUT_DIR, prefix=f".{pdf_filename}.", suffix=PARTIAL_SUFFIX
+    )
+    try:
+        with os.fdopen(fd, "wb") as out:
+            write(out, crop_width, crop_height, timestamp)
+            os.fchmod(out.fileno(), PDF_FILE_MODE)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(partial_path, pdf_path)
+    except BaseException:
+        os.unlink(partial_path)
+        raise
+
     return pdf_path
@@ -0,0 +1,135 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# ================= CONFIG =================
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_REQUEST_QUERY_COUNT = int(os.getenv("SLOW_REQUEST_QUERY_COUNT", "20"))
+SLOW_REQUEST_DB_MS = float(os.getenv("SLOW_REQUEST_DB_MS", "500"))
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+logger = logging.getLogger("app.sql")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_ms:.1f};desc="{self.count} queries"'
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect every query executed in the current context into a QueryStats."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def record_query(statement: str, elapsed_ms: float) -> None:
+    if elapsed_ms >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed_ms, statement)
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Time every statement executed through `engine`."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        record_query(statement, (time.perf_counter() - started) * 1000)
+
+
+def route_path(scope: Scope) -> str:
+    # FastAPI stores the matched APIRoute in the scope; fall back to the raw path
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+
+class QueryStatsMiddleware:
+    """
+    Groups the queries of each HTTP request, logs requests above the
+    SLOW_REQUEST_* thresholds and, when SERVER_TIMING is on, reports the
+    numbers in a Server-Timing response header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start" and SERVER_TIMING:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", stats.server_timing()
+                    )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                self._report(scope, stats)
+
+    @staticmethod
+    def _report(scope: Scope, stats: QueryStats) -> None:
+        if (
+            stats.count <= SLOW_REQUEST_QUERY_COUNT
+            and stats.total_ms <= SLOW_REQUEST_DB_MS
+        ):
+            return
+
+        logger.warning(
+            "%s %s: %d queries, %.1f ms in DB (slowest %.1f ms: %s)",
+            scope.get("method"),
+            route_path(scope),
+            stats.count,
+            stats.total_ms,
+            stats.slowest_ms,
+            stats.slowest_statement,
+        )
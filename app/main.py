@@ -1,21 +1,57 @@
+import asyncio
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi import status
 from fastapi.security import HTTPBearer
 from contextlib import asynccontextmanager
 import uvicorn
 
-from app.database import engine, Base
-from app.routers import auth, users, materials, product_types, items, token_sessions
+from app.admission import saturation
+from app.bulk_import import drain_import_jobs, resume_journaled_jobs
+from app.changes import purge_old_changes_periodically
+from app.compression import CompressionMiddleware
+from app.database import AsyncSessionLocal, engine
+from app.image_processor import remove_partial_pdfs
+from app.idempotency import purge_expired_keys_periodically
+from app.instrumentation import QueryStatsMiddleware
+from app.metrics import MetricsMiddleware, mark_worker_dead, metrics_response, start_loop_lag_monitor
+from app.migrate import ensure_schema_current
+from app.profiling import ProfilingMiddleware
+from app.rendering import RENDER_DRAIN_TIMEOUT, render_pool
+from app.watchdog import start_watchdog
+from app.routers import auth, users, materials, product_types, items, token_sessions, profiles, catalog, changes
 import app.models
 
 security = HTTPBearer()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # startup
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # startup: schema changes are applied by `python -m app.migrate`
+    await ensure_schema_current(engine)
+    remove_partial_pdfs()
+    resume_journaled_jobs(AsyncSessionLocal)
+    background = [
+        start_loop_lag_monitor(),
+        asyncio.create_task(purge_expired_keys_periodically(), name="idempotency-purge"),
+        asyncio.create_task(purge_old_changes_periodically(), name="changes-purge"),
+    ]
+    watchdog = start_watchdog()
     yield
-    # shutdown
+    # shutdown: uvicorn has finished the open requests by now. Drain the
+    # background renders before the engine goes away, so none is cut off
+    # between writing its PDF and committing pdf_path.
+    render_pool.begin_drain()
+    deadline = asyncio.get_running_loop().time() + RENDER_DRAIN_TIMEOUT
+    await drain_import_jobs(RENDER_DRAIN_TIMEOUT)
+    await render_pool.drain(max(0.0, deadline - asyncio.get_running_loop().time()))
+    if watchdog is not None:
+        watchdog.stop()
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    render_pool.shutdown()
+    mark_worker_dead()
     await engine.dispose()
 
 app = FastAPI(
@@ -23,8 +59,15 @@ app = FastAPI(
     description="FastAPI + MySQL with JWT Authentication",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+# Outermost, so latency includes compression
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
@@ -33,6 +76,9 @@ app.include_router(product_types.router, prefix="/api/product-types", tags=["Pro
 app.include_router(items.router, prefix="/api/items", tags=["Items"])
 app.include_router(token_sessions.router,prefix="/api/token-sessions", tags=["TokenSessions"]
 )
+app.include_router(profiles.router, prefix="/api/profiles", tags=["Profiles"])
+app.include_router(catalog.router, prefix="/api/catalog", tags=["Catalog"])
+app.include_router(changes.router, prefix="/api/changes", tags=["Changes"])
 
 @app.get("/")
 async def root():
@@ -46,5 +92,20 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/ready")
+async def readiness_check():
+    # 503 while this worker sheds load, so the load balancer routes around it
+    current = saturation()
+    reasons = current.reasons()
+    return ORJSONResponse(
+        {"status": "saturated" if reasons else "ready", "reasons": reasons, **current.as_dict()},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE if reasons else status.HTTP_200_OK,
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text format, aggregated over all workers
+    return metrics_response()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from starlette.responses import Response
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# ================= CONFIG =================
+
+# With several uvicorn workers every process keeps its own samples. Point
+# PROMETHEUS_MULTIPROC_DIR at an empty directory (wiped before the server
+# starts) and the workers share them through memory-mapped files there.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Requests that match no route share one label, so scanners probing random
+# URLs cannot blow up the number of time series.
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request until its response is fully sent",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+RESPONSES = Counter(
+    "http_responses",
+    "Responses sent, by status code",
+    ["method", "route", "status"],
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke up a task that asked to sleep",
+    buckets=LOOP_LAG_BUCKETS,
+)
+
+_last_loop_lag = 0.0
+
+# asyncio task -> route it is serving, for attributing event-loop stalls
+_task_routes: dict[asyncio.Task, str] = {}
+
+
+def current_loop_lag() -> float:
+    """Most recent event-loop lag sample of this process, in seconds."""
+    return _last_loop_lag
+
+
+def task_route(task: Optional[asyncio.Task]) -> Optional[str]:
+    return _task_routes.get(task) if task is not None else None
+
+
+def match_route(scope: Scope) -> str:
+    """Path template of the route that will handle `scope`."""
+    app = scope.get("app")
+    partial = None
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            # right path, wrong method (405)
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Records latency, in-flight count and status of every HTTP request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = match_route(scope)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        task = asyncio.current_task()
+        _task_routes[task] = route
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            RESPONSES.labels(method, route, str(status_code)).inc()
+            in_progress.dec()
+            _task_routes.pop(task, None)
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL) -> None:
+    """
+    Sleep for `interval` in a loop and record how much later than asked the
+    loop woke us up. Anything blocking the loop shows up as lag.
+    """
+    global _last_loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        _last_loop_lag = max(0.0, loop.time() - started - interval)
+        EVENT_LOOP_LAG.observe(_last_loop_lag)
+
+
+def start_loop_lag_monitor() -> asyncio.Task:
+    return asyncio.create_task(monitor_event_loop_lag(), name="event-loop-lag")
+
+
+def mark_worker_dead(pid: Optional[int] = None) -> None:
+    """Drop this worker's live gauge samples from the shared directory."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def metrics_response() -> Response:
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Aggregate the samples written by all workers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
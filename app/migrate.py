@@ -0,0 +1,104 @@
+"""
+One-shot schema migration command, run once per deploy before the workers:
+
+    python -m app.migrate
+
+Workers only verify the revision on startup (see ensure_schema_current).
+"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Revision matching the tables the app used to build with create_all
+BASELINE_REVISION = "0001"
+
+logger = logging.getLogger("app.migrate")
+
+
+def alembic_config(url: Optional[str] = None) -> Config:
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "migrations"))
+    if url:
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+async def current_revision(engine: AsyncEngine) -> Optional[str]:
+    async with engine.connect() as conn:
+        return await conn.run_sync(
+            lambda sync_conn: MigrationContext.configure(sync_conn).get_current_revision()
+        )
+
+
+async def ensure_schema_current(engine: AsyncEngine) -> None:
+    """
+    Fail fast when the database is behind the code. A revision unknown to
+    this build means the schema is newer (rolling deploy); that is allowed.
+    """
+    current = await current_revision(engine)
+    script = ScriptDirectory.from_config(alembic_config())
+    head = script.get_current_head()
+
+    if current == head:
+        return
+
+    known = {rev.revision for rev in script.walk_revisions()}
+    if current is not None and current not in known:
+        logger.warning("Database schema revision %s is newer than this build (%s)", current, head)
+        return
+
+    raise RuntimeError(
+        f"Database schema is at revision {current or 'none'}, expected {head}. "
+        "Run `python -m app.migrate` first."
+    )
+
+
+async def _is_unversioned_legacy_schema(engine: AsyncEngine) -> bool:
+    # Databases created by the old create_all-on-boot have tables but no alembic_version
+    async with engine.connect() as conn:
+        tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+    return "alembic_version" not in tables and "users" in tables
+
+
+def upgrade(url: Optional[str] = None) -> None:
+    url = url or os.environ["DATABASE_URL"]
+    config = alembic_config(url)
+
+    async def needs_baseline() -> bool:
+        engine = create_async_engine(url, poolclass=NullPool)
+        try:
+            return await _is_unversioned_legacy_schema(engine)
+        finally:
+            await engine.dispose()
+
+    if asyncio.run(needs_baseline()):
+        logger.info("Existing schema without revision, stamping %s", BASELINE_REVISION)
+        command.stamp(config, BASELINE_REVISION)
+
+    command.upgrade(config, "head")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(name)s] %(message)s")
+    upgrade()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean, LargeBinary, UniqueConstraint
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 
 from app.database import Base  # ✅ use the same Base everywhere
 
+# Microsecond precision on MySQL: updated_at drives ETags / If-Match, and two
+# writes within the same second must still produce different versions.
+UpdatedAt = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+
+def updated_at_column():
+    return Column(UpdatedAt, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -13,6 +22,7 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = updated_at_column()
     sessions = relationship("TokenSession", back_populates="user")
 
 
@@ -33,6 +43,7 @@ class Material(Base):
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = updated_at_column()
     items = relationship("Item", back_populates="material")
 
 
@@ -42,6 +53,7 @@ class ProductType(Base):
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = updated_at_column()
     items = relationship("Item", back_populates="product_type")
 
 
@@ -54,6 +66,43 @@ class Item(Base):
     height = Column(Float, nullable=False)
     pdf_path = Column(String(255), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = updated_at_column()
+    # Set by CSV imports to find the rows of a multi-row INSERT again: MySQL
+    # cannot return the ids it generated
+    import_batch = Column(String(32), nullable=True, index=True)
 
     material = relationship("Material", back_populates="items")
     product_type = relationship("ProductType", back_populates="items")
+
+
+class IdempotencyKey(Base):
+    """Outcome of a POST sent with an Idempotency-Key header, for replays."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # sha256 of the request, so a key cannot be reused for a different payload
+    request_hash = Column(String(64), nullable=False)
+    # NULL while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    # Until then the running request owns the key; after it, a retry may take
+    # the key over (the first request's worker is presumed dead)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+
+class Change(Base):
+    """
+    One insert / update / delete of a catalog row, written in the same
+    transaction as the change itself. The id is the cursor of the change feed.
+    """
+    __tablename__ = "changes"
+    # SQLite only auto-increments INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    entity = Column(String(32), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(8), nullable=False)
+    changed_at = Column(UpdatedAt, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,29 @@
+"""
+One-shot source conversion command, run once per deploy before the workers,
+after `python -m app.migrate`:
+
+    python -m app.prepare_source
+
+Renders read sources of RENDER_BANDED_SOURCE_PIXELS or more band by band.
+JPEG, PNG and compressed TIFF cannot be read that way, so such a source is
+written once as an uncompressed TIFF copy, which decodes it whole. Workers
+refuse to render from a large source that has not been prepared.
+"""
+import logging
+
+from app.image_processor import STATIC_IMAGE_PATH, prepare_source
+
+logger = logging.getLogger("app.prepare_source")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(name)s] %(message)s")
+    copy = prepare_source()
+    if copy is None:
+        logger.info("%s is read directly, no copy needed", STATIC_IMAGE_PATH)
+    else:
+        logger.info("%s is read from %s", STATIC_IMAGE_PATH, copy)
+
+
+if __name__ == "__main__":
+    main()
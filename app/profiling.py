@@ -0,0 +1,175 @@
+import cProfile
+import logging
+import os
+import pstats
+import re
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import get_current_user
+from app.database import AsyncSessionLocal
+from app.metrics import match_route
+from app.models import User
+from app.rendering import render_profiles
+
+# ================= CONFIG =================
+
+# Read from the environment at import; the code looks the module attributes
+# up on every request, so tests flip them with monkeypatch.setattr
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_OPERATORS = {
+    name.strip() for name in os.getenv("PROFILING_OPERATORS", "").split(",") if name.strip()
+}
+PROFILING_MIN_INTERVAL = float(os.getenv("PROFILING_MIN_INTERVAL", "10"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "app/storage/profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+PROFILE_HEADER = "x-profile"
+PROFILE_NAME = re.compile(r"^[\w.-]+\.prof$")
+
+logger = logging.getLogger("app.profiling")
+
+
+def is_operator(user: Optional[User]) -> bool:
+    return user is not None and user.username in PROFILING_OPERATORS
+
+
+async def profiling_operator(headers: Headers) -> Optional[User]:
+    """The operator behind the request's bearer token, if it is one."""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    async with AsyncSessionLocal() as db:
+        try:
+            user = await get_current_user(token=token, db=db)
+        except HTTPException:
+            return None
+    return user if is_operator(user) else None
+
+
+async def require_profiling_operator(user: User = Depends(get_current_user)) -> User:
+    if not PROFILING_ENABLED:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Profiling is disabled")
+    if not is_operator(user):
+        raise HTTPException(status.HTTP_403_FORBIDDEN, "Not a profiling operator")
+    return user
+
+
+class ProfileGate:
+    """
+    Rate limit for profiled requests: one at a time per worker (cProfile
+    hooks the whole thread, so two profiles would record each other) and
+    at most one every `min_interval` seconds.
+    """
+
+    def __init__(self):
+        self._busy = False
+        self._last_started = float("-inf")
+
+    def try_acquire(self, min_interval: float) -> bool:
+        now = time.monotonic()
+        if self._busy or now - self._last_started < min_interval:
+            return False
+        self._busy = True
+        self._last_started = now
+        return True
+
+    def release(self) -> None:
+        self._busy = False
+
+
+profile_gate = ProfileGate()
+
+
+def profile_path(name: str) -> Optional[Path]:
+    # Names come from the client; never let them leave PROFILE_DIR
+    if not PROFILE_NAME.match(name):
+        return None
+    return Path(PROFILE_DIR) / name
+
+
+def list_profiles() -> list[str]:
+    directory = Path(PROFILE_DIR)
+    if not directory.is_dir():
+        return []
+    paths = sorted(directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [path.name for path in paths]
+
+
+def _prune_profiles() -> None:
+    for name in list_profiles()[PROFILE_MAX_FILES:]:
+        Path(PROFILE_DIR, name).unlink(missing_ok=True)
+
+
+def _profile_name(scope: Scope) -> str:
+    route = re.sub(r"[^\w]+", "_", match_route(scope)).strip("_") or "root"
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    return f"{stamp}-{scope['method']}-{route}-{uuid.uuid4().hex[:8]}.prof"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request with cProfile when an operator sends
+    `X-Profile: 1`. The stats are written to PROFILE_DIR and the response
+    carries `X-Profile-Location` pointing at the download endpoint.
+
+    Requests that ask for a profile but do not get one are served normally
+    with an `X-Profile-Status` header saying why.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER) != "1":
+            await self.app(scope, receive, send)
+            return
+
+        if await profiling_operator(headers) is None:
+            await self.app(scope, receive, _with_header(send, "X-Profile-Status", "forbidden"))
+            return
+
+        if not profile_gate.try_acquire(PROFILING_MIN_INTERVAL):
+            await self.app(scope, receive, _with_header(send, "X-Profile-Status", "rate-limited"))
+            return
+
+        name = _profile_name(scope)
+        location = f"/api/profiles/{name}"
+        renders = render_profiles.set([])
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, _with_header(send, "X-Profile-Location", location))
+        finally:
+            profiler.disable()
+            profile_gate.release()
+            # the request's renders ran in the render pool's threads
+            stats = pstats.Stats(profiler)
+            for render in render_profiles.get():
+                stats.add(render)
+            render_profiles.reset(renders)
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            stats.dump_stats(profile_path(name))
+            _prune_profiles()
+            logger.info("Profiled %s %s -> %s", scope["method"], scope["path"], name)
+
+
+def _with_header(send: Send, name: str, value: str) -> Send:
+    async def send_with_header(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            MutableHeaders(scope=message).append(name, value)
+        await send(message)
+
+    return send_with_header
@@ -0,0 +1,146 @@
+import asyncio
+import cProfile
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Optional, TypeVar
+
+from prometheus_client import Gauge, Histogram
+
+# ================= CONFIG =================
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+# How long shutdown waits for running and queued renders before giving up
+RENDER_DRAIN_TIMEOUT = float(os.getenv("RENDER_DRAIN_TIMEOUT", "20"))
+
+T = TypeVar("T")
+
+# Set by the profiling middleware while it profiles a request. cProfile only
+# hooks the thread that enables it, so the request's renders are profiled in
+# their render thread and the profiles collected here.
+render_profiles: ContextVar[Optional[list[cProfile.Profile]]] = ContextVar(
+    "render_profiles", default=None
+)
+
+RENDERS_IN_FLIGHT = Gauge(
+    "pdf_renders_in_flight",
+    "PDF renders submitted to the render pool and not finished (running or queued)",
+    multiprocess_mode="livesum",
+)
+RENDER_DURATION = Histogram(
+    "pdf_render_seconds",
+    "Time a PDF render spent running in the render pool",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+def _timed(
+    fn: Callable[[], T],
+    on_start: Optional[Callable[[], None]],
+    loop: asyncio.AbstractEventLoop,
+    profiles: Optional[list[cProfile.Profile]],
+) -> tuple[T, float]:
+    if on_start is not None:
+        # runs in the render thread; hand the notification to the loop
+        loop.call_soon_threadsafe(on_start)
+    started = time.perf_counter()
+    if profiles is None:
+        result = fn()
+    else:
+        profiler = cProfile.Profile()
+        try:
+            result = profiler.runcall(fn)
+        finally:
+            profiles.append(profiler)
+    return result, time.perf_counter() - started
+
+
+class RenderPoolDraining(RuntimeError):
+    """The worker is shutting down and takes no new renders."""
+
+
+class RenderPool:
+    """
+    Bounded thread pool for Pillow / reportlab work, so rendering never runs
+    on the event loop. Tracks how many renders are pending and how long one
+    takes on average, for admission control.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS):
+        self.workers = workers
+        self.pending = 0
+        self.avg_seconds: Optional[float] = None
+        self.draining = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.pending - self.workers)
+
+    async def run(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        on_start: Optional[Callable[[], None]] = None,
+        **kwargs: Any,
+    ) -> T:
+        """
+        Run fn(*args, **kwargs) in the pool. `on_start` is called on the
+        event loop when a thread picks the render up. Inside a profiled
+        request the render is profiled too (see render_profiles).
+        """
+        if self.draining:
+            raise RenderPoolDraining("Render pool is draining for shutdown")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="render")
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        RENDERS_IN_FLIGHT.inc()
+        try:
+            result, elapsed = await loop.run_in_executor(
+                self._executor,
+                _timed,
+                functools.partial(fn, *args, **kwargs),
+                on_start,
+                loop,
+                render_profiles.get(),
+            )
+        finally:
+            self.pending -= 1
+            RENDERS_IN_FLIGHT.dec()
+
+        RENDER_DURATION.observe(elapsed)
+        # exponentially weighted, so the estimate follows the current load
+        self.avg_seconds = (
+            elapsed if self.avg_seconds is None else 0.8 * self.avg_seconds + 0.2 * elapsed
+        )
+        return result
+
+    def begin_drain(self) -> None:
+        self.draining = True
+
+    async def drain(self, timeout: float) -> bool:
+        """Refuse new renders and wait up to `timeout` for pending ones; True once idle."""
+        self.begin_drain()
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return self.pending == 0
+
+    def shutdown(self) -> None:
+        """
+        Drop queued renders and return without waiting for running ones:
+        this is called on the event loop after drain() gave up, and
+        waiting would block the loop and make RENDER_DRAIN_TIMEOUT
+        meaningless. Running renders are not interrupted; the orchestrator's
+        kill ends them if they outlast its grace period.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = RenderPool()
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.compression import accepts_encoding
+from app.conditional import is_not_modified, not_modified, validator_headers
+from app.database import get_db
+from app.snapshot import catalog_snapshot
+
+router = APIRouter(tags=["Catalog"])
+
+
+@router.get("/snapshot")
+async def get_catalog_snapshot(
+        request: Request,
+        db: AsyncSession = Depends(get_db),
+):
+    """
+    All materials, all product types and the item count per
+    (material_id, product_type_id), as one precomputed document.
+    """
+    snapshot = await catalog_snapshot.current(db)
+    gzipped = accepts_encoding(request.headers.get("accept-encoding", ""), "gzip")
+
+    headers = {**validator_headers(snapshot.etag(gzipped), None), "Vary": "Accept-Encoding"}
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified(headers)
+
+    if gzipped:
+        # Already compressed; CompressionMiddleware leaves encoded bodies alone
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.gzipped, media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
@@ -0,0 +1,40 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import get_current_user
+from app.changes import CHANGES_PAGE_MAX, CHANGES_PAGE_SIZE, latest_cursor, read_changes
+from app.database import get_db
+from app.models import User
+
+router = APIRouter(tags=["Changes"])
+
+
+@router.get("/")
+async def list_changes(
+        since: int = Query(0, ge=0, description="next_cursor of the previous page; 0 for all"),
+        limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_PAGE_MAX),
+        entity: Optional[Literal["item", "material", "product_type"]] = Query(None),
+        db: AsyncSession = Depends(get_db),
+        _: User = Depends(get_current_user),
+):
+    """
+    Inserts, updates and deletes of items, materials and product types after
+    `since`, in commit order. Each entry names the row only: fetch it (or
+    drop it, for a delete) to apply the change. Keep `next_cursor` and call
+    again with it; `has_more` says whether to do so right away.
+    """
+    page = await read_changes(db, since, limit, entity)
+    if page is None:
+        # The history after `since` is partly purged: re-list the tables,
+        # then follow the feed from the cursor below
+        return ORJSONResponse(
+            {
+                "detail": "Cursor is older than the retained change history",
+                "cursor": await latest_cursor(db),
+            },
+            status_code=status.HTTP_410_GONE,
+        )
+    return page
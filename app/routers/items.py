@@ -1,25 +1,164 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
-from app.database import get_db
+from app.admission import render_slot
+from app.cache import Validated
+from app.conditional import (
+    if_match_criteria,
+    is_not_modified,
+    last_modified,
+    missing_or_precondition_failed,
+    not_modified,
+    resource_etag,
+    validator_headers,
+)
+from app.bulk_import import ImportJob, get_job, run_import
+from app.crud import update_by_id, delete_by_id
+from app.database import get_db, get_sessionmaker
+from app.events import (
+    RENDER_DONE,
+    RENDER_FAILED,
+    RENDER_QUEUED,
+    RENDER_RUNNING,
+    event_bus,
+    publish_render_state,
+)
+from app.export import (
+    EXPORT_FORMATS,
+    parquet_available,
+    stream_csv,
+    stream_parquet,
+    stream_pdf_zip,
+)
+from app.idempotency import request_fingerprint, run_idempotent
+from app.serialization import dumps, orm_to_dict
+from app.singleflight import item_writes, singleflight
+from app.snapshot import catalog_snapshot
 from app.image_processor import crop_and_create_pdf
-from app.models import Item
-from app.schemas import ItemCreate, ItemOut, ItemUpdate
+from app.rendering import render_pool
+from app.models import Item, Material, ProductType
+from app.schemas import ItemArchiveRequest, ItemCreate, ItemOut, ItemUpdate, ItemExpandedOut
 from app.auth import get_current_user
 from app.models import User
 
 router = APIRouter(tags=["Items"])
 
+# Relationships that may be embedded via ?expand=. Both are many-to-one,
+# so a joinedload keeps list and get at a single SELECT.
+ITEM_EXPANSIONS = {
+    "material": Item.material,
+    "product_type": Item.product_type,
+}
+
+
+def parse_expand(
+        expand: Optional[str] = Query(
+            None,
+            description="Comma separated relations to embed: material, product_type",
+        ),
+) -> set[str]:
+    if not expand:
+        return set()
+
+    requested = {part.strip() for part in expand.split(",") if part.strip()}
+    unknown = requested - ITEM_EXPANSIONS.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown expand value(s): {', '.join(sorted(unknown))}",
+        )
+    return requested
+
+
+@dataclass(frozen=True)
+class ItemFilters:
+    material_id: Optional[int] = None
+    product_type_id: Optional[int] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    def criteria(self) -> list:
+        criteria = []
+        if self.material_id is not None:
+            criteria.append(Item.material_id == self.material_id)
+        if self.product_type_id is not None:
+            criteria.append(Item.product_type_id == self.product_type_id)
+        if self.created_after is not None:
+            criteria.append(Item.created_at >= self.created_after)
+        if self.created_before is not None:
+            criteria.append(Item.created_at < self.created_before)
+        return criteria
 
 
-@router.post("/", response_model=ItemOut)
+def item_filters(
+        material_id: Optional[int] = Query(None),
+        product_type_id: Optional[int] = Query(None),
+        created_after: Optional[datetime] = Query(None, description="Inclusive"),
+        created_before: Optional[datetime] = Query(None, description="Exclusive"),
+) -> ItemFilters:
+    # Shared by the list and export endpoints
+    return ItemFilters(material_id, product_type_id, created_after, created_before)
+
+
+def _expand_options(expand: set[str]) -> list:
+    return [joinedload(ITEM_EXPANSIONS[name]) for name in sorted(expand)]
+
+
+def _item_dict(item: Item, expand: set[str]) -> dict:
+    # Relations that were not requested are not loaded; never touch them
+    return orm_to_dict(item, ItemExpandedOut, exclude=ITEM_EXPANSIONS.keys() - expand)
+
+
+async def admit_unkeyed_render(
+        idempotency_key: Optional[str] = Header(None),
+) -> AsyncIterator[None]:
+    # A request with an Idempotency-Key may be answered by a replay, or wait
+    # for the original, without rendering: it takes a render slot only once
+    # it creates the item (see create_item)
+    if idempotency_key is not None:
+        yield
+        return
+    async with render_slot():
+        yield
+
+
+# Runs first, so shedding a request without a key costs no DB work
+@router.post("/", response_model=ItemOut, dependencies=[Depends(admit_unkeyed_render)])
 async def create_item(
         data: ItemCreate,
         db: AsyncSession = Depends(get_db),
-        _: User = Depends(get_current_user),
+        user: User = Depends(get_current_user),
+        idempotency_key: Optional[str] = Header(
+            None,
+            description="Retries with the same key return the first response instead of creating another item",
+        ),
 ):
+    if idempotency_key is None:
+        return await _create_item(data, db)
+
+    async def create() -> dict:
+        # shed here releases the key, so the retry can run
+        async with render_slot():
+            return orm_to_dict(await _create_item(data, db), ItemOut)
+
+    return await run_idempotent(
+        db,
+        user.id,
+        idempotency_key,
+        request_fingerprint("POST /api/items/", data.dict()),
+        create,
+    )
+
+
+async def _create_item(data: ItemCreate, db: AsyncSession) -> Item:
     item = Item(**data.dict())
     db.add(item)
 
@@ -33,15 +172,22 @@ async def create_item(
         )
 
     await db.refresh(item)
+    item_writes.bump()
+    catalog_snapshot.items_added([item])
 
     # 🔹 Generate PDF after item exists
+    item_id = item.id
+    publish_render_state(item_id, RENDER_QUEUED)
     try:
-        pdf_path = crop_and_create_pdf(
+        pdf_path = await render_pool.run(
+            crop_and_create_pdf,
             width=item.width,
             height=item.height,
-            item_id=item.id,
+            item_id=item_id,
+            on_start=lambda: publish_render_state(item_id, RENDER_RUNNING),
         )
     except Exception as e:
+        publish_render_state(item_id, RENDER_FAILED, detail=str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"PDF generation failed: {str(e)}",
@@ -50,52 +196,258 @@ async def create_item(
     # 🔹 Save PDF path
     item.pdf_path = pdf_path
     await db.commit()
+    item_writes.bump()
     await db.refresh(item)
+    publish_render_state(item_id, RENDER_DONE, pdf_path=pdf_path)
 
     return item
 
 
-@router.get("/", response_model=list[ItemOut])
+@router.get("/", response_model=list[ItemExpandedOut])
 async def list_items(
+        expand: set[str] = Depends(parse_expand),
+        filters: ItemFilters = Depends(item_filters),
+        db: AsyncSession = Depends(get_db),
+):
+    async def load() -> bytes:
+        result = await db.execute(
+            select(Item).where(*filters.criteria()).options(*_expand_options(expand))
+        )
+        return dumps([_item_dict(item, expand) for item in result.scalars().all()])
+
+    # Identical concurrent reads share one query and one serialization
+    body = await singleflight.do(
+        ("items:list", item_writes.value, tuple(sorted(expand)), filters), load
+    )
+    return Response(content=body, media_type="application/json")
+
+
+# ================= EXPORT =================
+
+EXPORT_COLUMNS = [
+    Item.id,
+    Item.material_id,
+    Item.product_type_id,
+    Item.width,
+    Item.height,
+    Item.pdf_path,
+    Item.created_at,
+    Item.updated_at,
+]
+# ?expand= adds the related names as flat columns
+EXPORT_NAME_COLUMNS = {
+    "material": (Material, Item.material_id == Material.id, Material.name.label("material_name")),
+    "product_type": (
+        ProductType,
+        Item.product_type_id == ProductType.id,
+        ProductType.name.label("product_type_name"),
+    ),
+}
+
+
+def _export_statement(expand: set[str], filters: ItemFilters):
+    statement = select(*EXPORT_COLUMNS)
+    for name in sorted(expand):
+        model, on, column = EXPORT_NAME_COLUMNS[name]
+        statement = statement.join(model, on).add_columns(column)
+    return statement.where(*filters.criteria()).order_by(Item.id)
+
+
+def _parquet_schema(columns: list[str]):
+    import pyarrow as pa
+
+    types = {
+        "id": pa.int64(),
+        "material_id": pa.int64(),
+        "product_type_id": pa.int64(),
+        "width": pa.float64(),
+        "height": pa.float64(),
+        "pdf_path": pa.string(),
+        "created_at": pa.timestamp("us"),
+        "updated_at": pa.timestamp("us"),
+        "material_name": pa.string(),
+        "product_type_name": pa.string(),
+    }
+    return pa.schema([(name, types[name]) for name in columns])
+
+
+# Declared before /{item_id}, which would otherwise match "export"
+@router.get("/export", response_class=StreamingResponse)
+async def export_items(
+        format: Literal["csv", "parquet"] = "csv",
+        expand: set[str] = Depends(parse_expand),
+        filters: ItemFilters = Depends(item_filters),
+        sessions: async_sessionmaker = Depends(get_sessionmaker),
+        _: User = Depends(get_current_user),
+):
+    """
+    Stream all matching items as CSV or Parquet, read through a server-side
+    cursor in batches, so memory use does not grow with the table.
+    """
+    statement = _export_statement(expand, filters)
+    columns = list(statement.selected_columns.keys())
+
+    if format == "parquet":
+        if not parquet_available():
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Parquet export requires pyarrow on the server",
+            )
+        body = stream_parquet(sessions, statement, _parquet_schema(columns))
+    else:
+        body = stream_csv(sessions, statement, columns)
+
+    filename = f"items-{datetime.utcnow():%Y%m%dT%H%M%S}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/archive", response_class=StreamingResponse)
+async def archive_item_pdfs(
+        request: Optional[ItemArchiveRequest] = None,
+        filters: ItemFilters = Depends(item_filters),
+        sessions: async_sessionmaker = Depends(get_sessionmaker),
+        _: User = Depends(get_current_user),
+):
+    """
+    Stream a ZIP of the PDFs of the given item ids and/or the matching items,
+    built while it is sent: no archive is assembled on disk or in memory.
+    Items without a PDF are listed in missing.txt.
+    """
+    statement = select(Item.id, Item.pdf_path).where(*filters.criteria()).order_by(Item.id)
+    if request is not None and request.ids is not None:
+        statement = statement.where(Item.id.in_(request.ids))
+
+    filename = f"items-{datetime.utcnow():%Y%m%dT%H%M%S}.zip"
+    return StreamingResponse(
+        stream_pdf_zip(sessions, statement),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# ================= IMPORT =================
+
+@router.post(
+    "/import",
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"text/csv": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def import_items(
+        request: Request,
         db: AsyncSession = Depends(get_db),
+        sessions: async_sessionmaker = Depends(get_sessionmaker),
+        user: User = Depends(get_current_user),
+):
+    """
+    Create items from a CSV upload (header: material_id, product_type_id,
+    width, height), sent as the raw request body. Rows are validated and
+    inserted in batches while the upload is still arriving; their PDFs are
+    rendered in the background. Poll GET /import/{job_id} for progress.
+    """
+    if request.headers.get("content-type", "").startswith("multipart/"):
+        # A multipart upload would be spooled in full before parsing could start
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the CSV file as the request body (Content-Type: text/csv)",
+        )
+
+    job = ImportJob(user.id)
+    await run_import(job, request.stream(), db, sessions)
+    return job.as_dict()
+
+
+@router.get("/import/{job_id}")
+async def import_status(job_id: str, user: User = Depends(get_current_user)):
+    job = get_job(job_id, user.id)
+    if job is None:
+        raise HTTPException(404, "Import job not found")
+    return job.as_dict()
+
+
+# Declared before /{item_id}, which would otherwise match "events"
+@router.get("/events", response_class=StreamingResponse)
+async def item_events(
+        item_id: Optional[int] = Query(None, description="Only events of this item"),
+        last_event_id: Optional[str] = Header(None),
 ):
-    result = await db.execute(select(Item))
-    return result.scalars().all()
+    """
+    Server-Sent Events stream of render state changes
+    (queued / running / done / failed). Browsers resume with Last-Event-ID
+    automatically after a reconnect.
+    """
+    return StreamingResponse(
+        event_bus.stream(last_event_id, item_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-@router.get("/{item_id}", response_model=ItemOut)
+@router.get("/{item_id}", response_model=ItemExpandedOut)
 async def get_item(
         item_id: int,
+        request: Request,
+        expand: set[str] = Depends(parse_expand),
         db: AsyncSession = Depends(get_db),
 ):
-    item = await db.get(Item, item_id)
-    if not item:
-        raise HTTPException(404, "Item not found")
-    return item
+    async def load() -> Validated:
+        item = await db.get(Item, item_id, options=_expand_options(expand))
+        if not item:
+            raise HTTPException(404, "Item not found")
+
+        # Embedded relations are part of the representation, so part of the version
+        parts = [item, *(getattr(item, name) for name in sorted(expand))]
+        return Validated(
+            dumps(_item_dict(item, expand)), resource_etag(*parts), last_modified(*parts)
+        )
+
+    loaded = await singleflight.do(
+        ("items:get", item_writes.value, item_id, tuple(sorted(expand))), load
+    )
+    headers = validator_headers(loaded.etag, loaded.last_modified)
+    if is_not_modified(request, loaded.etag, loaded.last_modified):
+        return not_modified(headers)
+
+    return Response(content=loaded.content, media_type="application/json", headers=headers)
 
 
 @router.put("/{item_id}", response_model=ItemOut)
 async def update_item(
         item_id: int,
         data: ItemUpdate,
+        request: Request,
+        response: Response,
         db: AsyncSession = Depends(get_db),
         _: User = Depends(get_current_user),
 ):
-    item = await db.get(Item, item_id)
-    if not item:
-        raise HTTPException(404, "Item not found")
+    criteria = if_match_criteria(request, Item, item_id)
+    try:
+        item = await update_by_id(
+            db, Item, item_id, data.dict(exclude_none=True), *criteria
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid material_id or product_type_id (foreign key constraint).",
+        )
 
-    if data.material_id is not None:
-        item.material_id = data.material_id
-    if data.product_type_id is not None:
-        item.product_type_id = data.product_type_id
-    if data.width is not None:
-        item.width = data.width
-    if data.height is not None:
-        item.height = data.height
+    if not item:
+        raise await missing_or_precondition_failed(db, Item, item_id, criteria, "Item not found")
 
-    await db.commit()
-    await db.refresh(item)
+    item_writes.bump()
+    if data.material_id is not None or data.product_type_id is not None:
+        # the previous combination is gone; its count cannot be adjusted
+        catalog_snapshot.invalidate()
+    response.headers.update(validator_headers(resource_etag(item), last_modified(item)))
     return item
 
 
@@ -105,11 +457,9 @@ async def delete_item(
         db: AsyncSession = Depends(get_db),
         _: User = Depends(get_current_user),
 ):
-    item = await db.get(Item, item_id)
-    if not item:
+    if not await delete_by_id(db, Item, item_id):
         raise HTTPException(404, "Item not found")
 
-    await db.delete(item)
-    await db.commit()
-
+    item_writes.bump()
+    catalog_snapshot.invalidate()
     return {"detail": "Item deleted successfully"}
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException ,status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 
+from app.cache import Validated, catalog_cache
+from app.conditional import (
+    if_match_criteria,
+    last_modified,
+    missing_or_precondition_failed,
+    resource_etag,
+    validator_headers,
+)
+from app.crud import update_by_id, delete_by_id, bulk_upsert_by_name
 from app.database import get_db
+from app.snapshot import catalog_snapshot
+from app.serialization import orm_to_dict
 from app.models import Material
-from app.schemas import MaterialCreate, MaterialOut, MaterialUpdate
+from app.schemas import BulkUpsertResult, MaterialCreate, MaterialOut, MaterialUpdate
 from app.auth import get_current_user
 from app.models import User
 
@@ -31,45 +42,82 @@ async def create_material(
         )
 
     await db.refresh(material)
+    catalog_cache.bump()
+    catalog_snapshot.upsert("materials", material)
     return material
 
+
+@router.post("/bulk", response_model=BulkUpsertResult)
+async def bulk_upsert_materials(
+        data: list[MaterialCreate],
+        db: AsyncSession = Depends(get_db),
+        _: User = Depends(get_current_user),
+):
+    # Rows with an existing name update that row instead of failing the batch
+    outcomes = await bulk_upsert_by_name(db, Material, [row.dict() for row in data])
+    catalog_cache.bump()
+    catalog_snapshot.invalidate()
+    return BulkUpsertResult.from_outcomes(outcomes)
+
+
 @router.get("/", response_model=list[MaterialOut])
 async def list_materials(
+        request: Request,
         db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(Material))
-    return result.scalars().all()
+    async def load():
+        result = await db.execute(select(Material))
+        return [orm_to_dict(row, MaterialOut) for row in result.scalars().all()]
+
+    return await catalog_cache.respond(request, "materials:list", load)
 
 
 @router.get("/{material_id}", response_model=MaterialOut)
 async def get_material(
         material_id: int,
+        request: Request,
         db: AsyncSession = Depends(get_db),
 ):
-    material = await db.get(Material, material_id)
-    if not material:
-        raise HTTPException(404, "Material not found")
-    return material
+    async def load():
+        material = await db.get(Material, material_id)
+        if not material:
+            raise HTTPException(404, "Material not found")
+        return Validated(
+            orm_to_dict(material, MaterialOut),
+            resource_etag(material),
+            last_modified(material),
+        )
+
+    return await catalog_cache.respond(request, f"materials:{material_id}", load)
 
 
 @router.put("/{material_id}", response_model=MaterialOut)
 async def update_material(
         material_id: int,
         data: MaterialUpdate,
+        request: Request,
+        response: Response,
         db: AsyncSession = Depends(get_db),
         _: User = Depends(get_current_user),
 ):
-    material = await db.get(Material, material_id)
-    if not material:
-        raise HTTPException(404, "Material not found")
+    criteria = if_match_criteria(request, Material, material_id)
+    try:
+        material = await update_by_id(
+            db, Material, material_id, data.dict(exclude_none=True), *criteria
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Material with this name already exists.",
+        )
 
-    if data.name is not None:
-        material.name = data.name
-    if data.description is not None:
-        material.description = data.description
+    if not material:
+        raise await missing_or_precondition_failed(db, Material, material_id, criteria, "Material not found")
 
-    await db.commit()
-    await db.refresh(material)
+    catalog_cache.bump()
+    catalog_snapshot.upsert("materials", material)
+    response.headers.update(validator_headers(resource_etag(material), last_modified(material)))
     return material
 
 
@@ -79,11 +127,19 @@ async def delete_material(
         db: AsyncSession = Depends(get_db),
         _: User = Depends(get_current_user),
 ):
-    material = await db.get(Material, material_id)
-    if not material:
+    try:
+        deleted = await delete_by_id(db, Material, material_id)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Material is still used by items.",
+        )
+
+    if not deleted:
         raise HTTPException(404, "Material not found")
 
-    await db.delete(material)
-    await db.commit()
+    catalog_cache.bump()
+    catalog_snapshot.remove("materials", material_id)
 
     return {"detail": "Material deleted successfully"}
@@ -1,18 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 
+from app.cache import Validated, catalog_cache
+from app.conditional import (
+    if_match_criteria,
+    last_modified,
+    missing_or_precondition_failed,
+    resource_etag,
+    validator_headers,
+)
+from app.crud import update_by_id, delete_by_id, bulk_upsert_by_name
 from app.database import get_db
+from app.snapshot import catalog_snapshot
+from app.serialization import orm_to_dict
 from app.models import ProductType
-from app.schemas import ProductTypeCreate, ProductTypeOut, ProductTypeUpdate
+from app.schemas import BulkUpsertResult, ProductTypeCreate, ProductTypeOut, ProductTypeUpdate
 from app.auth import get_current_user
 from app.models import User
 
 router = APIRouter(tags=["ProductTypes"])
 
 
-
 @router.post("/", response_model=ProductTypeOut)
 async def create_product_type(
     data: ProductTypeCreate,
@@ -33,59 +43,104 @@ async def create_product_type(
         )
 
     await db.refresh(pt)
+    catalog_cache.bump()
+    catalog_snapshot.upsert("product_types", pt)
     return pt
 
+
+@router.post("/bulk", response_model=BulkUpsertResult)
+async def bulk_upsert_product_types(
+    data: list[ProductTypeCreate],
+    db: AsyncSession = Depends(get_db),
+    _: User = Depends(get_current_user),
+):
+    # Rows with an existing name update that row instead of failing the batch
+    outcomes = await bulk_upsert_by_name(db, ProductType, [row.dict() for row in data])
+    catalog_cache.bump()
+    catalog_snapshot.invalidate()
+    return BulkUpsertResult.from_outcomes(outcomes)
+
+
 @router.get("/", response_model=list[ProductTypeOut])
 async def list_product_types(
+    request: Request,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(ProductType))
-    return result.scalars().all()
+    async def load():
+        result = await db.execute(select(ProductType))
+        return [orm_to_dict(row, ProductTypeOut) for row in result.scalars().all()]
+
+    return await catalog_cache.respond(request, "product_types:list", load)
 
 
 @router.get("/{product_type_id}", response_model=ProductTypeOut)
 async def get_product_type(
     product_type_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
 ):
-    pt = await db.get(ProductType, product_type_id)
-    if not pt:
-        raise HTTPException(404, "Product type not found")
-    return pt
+    async def load():
+        pt = await db.get(ProductType, product_type_id)
+        if not pt:
+            raise HTTPException(404, "Product type not found")
+        return Validated(
+            orm_to_dict(pt, ProductTypeOut),
+            resource_etag(pt),
+            last_modified(pt),
+        )
+
+    return await catalog_cache.respond(request, f"product_types:{product_type_id}", load)
+
 
 @router.put("/{product_type_id}", response_model=ProductTypeOut)
 async def update_product_type(
     product_type_id: int,
     data: ProductTypeUpdate,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     _: User = Depends(get_current_user),
 ):
-    pt = await db.get(ProductType, product_type_id)
-    if not pt:
-        raise HTTPException(404, "Product type not found")
+    criteria = if_match_criteria(request, ProductType, product_type_id)
+    try:
+        pt = await update_by_id(
+            db, ProductType, product_type_id, data.dict(exclude_none=True), *criteria
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Product type with this name already exists.",
+        )
 
-    if data.name is not None:
-        pt.name = data.name
-    if data.description is not None:
-        pt.description = data.description
+    if not pt:
+        raise await missing_or_precondition_failed(db, ProductType, product_type_id, criteria, "Product type not found")
 
-    await db.commit()
-    await db.refresh(pt)
+    catalog_cache.bump()
+    catalog_snapshot.upsert("product_types", pt)
+    response.headers.update(validator_headers(resource_etag(pt), last_modified(pt)))
     return pt
 
 
-
 @router.delete("/{product_type_id}")
 async def delete_product_type(
     product_type_id: int,
     db: AsyncSession = Depends(get_db),
     _: User = Depends(get_current_user),
 ):
-    pt = await db.get(ProductType, product_type_id)
-    if not pt:
+    try:
+        deleted = await delete_by_id(db, ProductType, product_type_id)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Product type is still used by items.",
+        )
+
+    if not deleted:
         raise HTTPException(404, "Product type not found")
 
-    await db.delete(pt)
-    await db.commit()
+    catalog_cache.bump()
+    catalog_snapshot.remove("product_types", product_type_id)
 
     return {"detail": "Product type deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app.models import User
+from app.profiling import list_profiles, profile_path, require_profiling_operator
+
+router = APIRouter(
+    tags=["Profiles"],
+)
+
+
+@router.get("/", response_model=list[str])
+async def get_profiles(
+    user: User = Depends(require_profiling_operator),
+):
+    # newest first
+    return list_profiles()
+
+
+@router.get("/{name}")
+async def download_profile(
+    name: str,
+    user: User = Depends(require_profiling_operator),
+):
+    path = profile_path(name)
+    if path is None or not path.is_file():
+        raise HTTPException(404, "Profile not found")
+
+    # pstats format: python -m pstats <file>, or snakeviz <file>
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
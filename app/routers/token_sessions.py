@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.crud import update_by_id, delete_by_id
 from app.database import get_db
+from app.serialization import orm_list_response
 from app.models import TokenSession, User
 from app.schemas import TokenSessionOut, TokenSessionUpdate
 from app.auth import get_current_user
@@ -21,7 +23,7 @@ async def list_token_sessions(
     result = await db.execute(
         select(TokenSession).where(TokenSession.user_id == user.id)
     )
-    return result.scalars().all()
+    return orm_list_response(result.scalars().all(), TokenSessionOut)
 
 
 @router.get("/{session_id}", response_model=TokenSessionOut)
@@ -43,17 +45,15 @@ async def update_token_session(
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    session = await db.get(TokenSession, session_id)
-    if not session or session.user_id != user.id:
+    session = await update_by_id(
+        db,
+        TokenSession,
+        session_id,
+        data.dict(exclude_none=True),
+        TokenSession.user_id == user.id,
+    )
+    if not session:
         raise HTTPException(status_code=404, detail="Token session not found")
-
-    if data.revoked is not None:
-        session.revoked = data.revoked
-    if data.expires_at is not None:
-        session.expires_at = data.expires_at
-
-    await db.commit()
-    await db.refresh(session)
     return session
 
 
@@ -63,10 +63,12 @@ async def delete_token_session(
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    session = await db.get(TokenSession, session_id)
-    if not session or session.user_id != user.id:
+    deleted = await delete_by_id(
+        db,
+        TokenSession,
+        session_id,
+        TokenSession.user_id == user.id,
+    )
+    if not deleted:
         raise HTTPException(status_code=404, detail="Token session not found")
-
-    await db.delete(session)
-    await db.commit()
     return {"detail": "Token session deleted"}
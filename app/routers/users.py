@@ -1,15 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, union
 from sqlalchemy.exc import IntegrityError
 
+from app.conditional import (
+    if_match_criteria,
+    is_not_modified,
+    last_modified,
+    missing_or_precondition_failed,
+    not_modified,
+    resource_etag,
+    validator_headers,
+)
+from app.crud import update_by_id, delete_by_id
 from app.database import get_db
+from app.serialization import orm_list_response
 from app.models import User
 from app.schemas import UserCreate, UserOut, UserUpdate
 from app.auth import hash_password, get_current_user
 
 router = APIRouter(tags=["Users"])
 
+USERS_PAGE_SIZE = 50
+USERS_PAGE_MAX = 200
 
 
 @router.post("/", response_model=UserOut)
@@ -36,24 +51,69 @@ async def create_user(
     await db.refresh(user)
     return user
 
+
+def _prefix_pattern(prefix: str) -> str:
+    # "%" and "_" typed by the user match themselves; the pattern has no
+    # leading wildcard, so it is a range scan on the unique index
+    escaped = prefix.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return escaped + "%"
+
+
 @router.get("/", response_model=list[UserOut])
 async def list_users(
+        request: Request,
+        q: Optional[str] = Query(
+            None, min_length=1, max_length=100, description="Username or email prefix"
+        ),
+        after_id: Optional[int] = Query(None, description="Last id of the previous page"),
+        limit: int = Query(USERS_PAGE_SIZE, ge=1, le=USERS_PAGE_MAX),
         db: AsyncSession = Depends(get_db),
         _: User = Depends(get_current_user),
 ):
-    result = await db.execute(select(User))
-    return result.scalars().all()
+    """
+    Users ordered by id, one page at a time. When there are more, the
+    `Link: <...>; rel="next"` header holds the URL of the next page.
+    """
+    # keyset: continues from the primary key, however deep the page
+    after = [User.id > after_id] if after_id is not None else []
+    statement = select(User).where(*after).order_by(User.id).limit(limit + 1)
+    if q:
+        # One range scan per unique index (each holds the id too), instead
+        # of an OR that the optimizer may answer with a full scan
+        pattern = _prefix_pattern(q)
+        matches = union(
+            select(User.id).where(User.username.like(pattern, escape="/"), *after),
+            select(User.id).where(User.email.like(pattern, escape="/"), *after),
+        ).subquery()
+        statement = statement.join(matches, User.id == matches.c.id)
+
+    result = await db.execute(statement)
+    users = result.scalars().all()
+
+    response = orm_list_response(users[:limit], UserOut)
+    if len(users) > limit:
+        next_url = request.url.include_query_params(after_id=users[limit - 1].id, limit=limit)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
 
 
 @router.get("/{user_id}", response_model=UserOut)
 async def get_user(
         user_id: int,
+        request: Request,
+        response: Response,
         db: AsyncSession = Depends(get_db),
         _: User = Depends(get_current_user),
 ):
     user = await db.get(User, user_id)
     if not user:
         raise HTTPException(404, "User not found")
+
+    headers = validator_headers(resource_etag(user), last_modified(user))
+    if is_not_modified(request, headers["ETag"], last_modified(user)):
+        return not_modified(headers)
+
+    response.headers.update(headers)
     return user
 
 
@@ -61,18 +121,27 @@ async def get_user(
 async def update_user(
         user_id: int,
         data: UserUpdate,
+        request: Request,
+        response: Response,
         db: AsyncSession = Depends(get_db),
         _: User = Depends(get_current_user),
 ):
-    user = await db.get(User, user_id)
-    if not user:
-        raise HTTPException(404, "User not found")
+    criteria = if_match_criteria(request, User, user_id)
+    try:
+        user = await update_by_id(
+            db, User, user_id, data.dict(exclude_none=True), *criteria
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Username or email already exists.",
+        )
 
-    if data.email is not None:
-        user.email = data.email
+    if not user:
+        raise await missing_or_precondition_failed(db, User, user_id, criteria, "User not found")
 
-    await db.commit()
-    await db.refresh(user)
+    response.headers.update(validator_headers(resource_etag(user), last_modified(user)))
     return user
 
 
@@ -82,11 +151,7 @@ async def delete_user(
         db: AsyncSession = Depends(get_db),
         _: User = Depends(get_current_user),
 ):
-    user = await db.get(User, user_id)
-    if not user:
+    if not await delete_by_id(db, User, user_id):
         raise HTTPException(404, "User not found")
 
-    await db.delete(user)
-    await db.commit()
-
     return {"detail": "User deleted successfully"}
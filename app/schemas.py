@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 
 
@@ -22,6 +22,7 @@ class UserOut(UserBase):
     id: int
     is_active: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -74,6 +75,7 @@ class MaterialCreate(MaterialBase):
 class MaterialOut(MaterialBase):
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -98,6 +100,7 @@ class ProductTypeCreate(ProductTypeBase):
 class ProductTypeOut(ProductTypeBase):
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -108,6 +111,33 @@ class ProductTypeUpdate(BaseModel):
     description: Optional[str] = None
 
 
+# ------------------- BULK -------------------
+
+class BulkRowResult(BaseModel):
+    index: int
+    name: str
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BulkUpsertResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: list[BulkRowResult]
+
+    @classmethod
+    def from_outcomes(cls, outcomes: list[dict]) -> "BulkUpsertResult":
+        statuses = [outcome["status"] for outcome in outcomes]
+        return cls(
+            created=statuses.count("created"),
+            updated=statuses.count("updated"),
+            failed=statuses.count("invalid"),
+            results=outcomes,
+        )
+
+
 # ------------------- ITEM -------------------
 
 class ItemBase(BaseModel):
@@ -132,6 +162,21 @@ class ItemOut(ItemBase):
     id: int
     pdf_path: Optional[str] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
+
+
+class ItemExpandedOut(ItemOut):
+    material: Optional[MaterialOut] = None
+    product_type: Optional[ProductTypeOut] = None
+
+
+# Ids one archive request may list; larger selections go through the filters
+ARCHIVE_MAX_IDS = 200
+
+
+class ItemArchiveRequest(BaseModel):
+    # Combined with the query filters; omit to archive every matching item
+    ids: Optional[list[int]] = Field(None, max_items=ARCHIVE_MAX_IDS)
@@ -0,0 +1,60 @@
+from functools import lru_cache
+from typing import Any, Iterable, Optional, Type
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_SINGLETON
+
+# ================= FAST PATH =================
+#
+# Response schemas are normally applied by FastAPI: every ORM row is
+# validated into a pydantic model, run through jsonable_encoder and then
+# dumped. For rows we loaded ourselves that work is redundant, so the list
+# endpoints read the schema's fields straight off the ORM object and hand
+# plain dicts to orjson.
+
+
+@lru_cache(maxsize=None)
+def _field_plan(schema: Type[BaseModel]) -> tuple[tuple[str, Optional[Type[BaseModel]]], ...]:
+    plan = []
+    for name, field in schema.__fields__.items():
+        nested = None
+        if (
+            field.shape == SHAPE_SINGLETON
+            and isinstance(field.type_, type)
+            and issubclass(field.type_, BaseModel)
+        ):
+            nested = field.type_
+        plan.append((name, nested))
+    return tuple(plan)
+
+
+def orm_to_dict(
+    obj: Any,
+    schema: Type[BaseModel],
+    exclude: Iterable[str] = (),
+) -> dict[str, Any]:
+    """
+    Read the fields of `schema` from a trusted ORM object, without validation.
+
+    Nested pydantic fields are converted recursively. Fields named in
+    `exclude` are left out entirely (used for relations that were not loaded).
+    """
+    data = {}
+    for name, nested in _field_plan(schema):
+        if name in exclude:
+            continue
+        value = getattr(obj, name)
+        if nested is not None and value is not None:
+            value = orm_to_dict(value, nested)
+        data[name] = value
+    return data
+
+
+def orm_list_response(rows: Iterable[Any], schema: Type[BaseModel]) -> ORJSONResponse:
+    return ORJSONResponse([orm_to_dict(row, schema) for row in rows])
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from prometheus_client import Counter
+
+T = TypeVar("T")
+
+SHARED_READS = Counter(
+    "singleflight_shared",
+    "Reads answered with the result of an identical read already in flight",
+    ["route"],
+)
+
+
+class _LeaderCancelled(Exception):
+    """The call being waited on was cancelled; its followers start over."""
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls.
+
+    While a call for `key` is running, later callers with the same key wait
+    for it and get the same result (or exception) instead of doing the work
+    again. Nothing is kept once the call finishes, so this is not a cache:
+    a caller never gets a result that started before it arrived and had
+    already finished.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: tuple, fn: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                break
+            SHARED_READS.labels(key[0]).inc()
+            try:
+                # shield: a cancelled follower must not cancel the leader
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._fail(future, _LeaderCancelled())
+            raise
+        except BaseException as exc:
+            self._fail(future, exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    @staticmethod
+    def _fail(future: asyncio.Future, exc: BaseException) -> None:
+        future.set_exception(exc)
+        # Mark it retrieved, so a call without followers logs nothing
+        future.exception()
+
+
+class WriteGeneration:
+    """
+    Counts committed writes to a table in this worker. Reads of the table
+    put it in their single-flight key, so a read arriving after a write
+    never joins one that started before it and return the old rows.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def bump(self) -> None:
+        self.value += 1
+
+
+singleflight = SingleFlight()
+# Bumped after every commit that inserts, changes or deletes items
+item_writes = WriteGeneration()
@@ -0,0 +1,148 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Item, Material, ProductType
+from app.schemas import MaterialOut, ProductTypeOut
+from app.serialization import dumps, orm_to_dict
+from app.singleflight import singleflight
+
+# ================= CONFIG =================
+
+# Writes made through other workers are only picked up by a full reload,
+# at the latest this many seconds after the previous one
+CATALOG_SNAPSHOT_TTL = float(os.getenv("CATALOG_SNAPSHOT_TTL", "60"))
+
+# Sections of the document, with the table and schema of their entries
+SECTIONS = {
+    "materials": (Material, MaterialOut),
+    "product_types": (ProductType, ProductTypeOut),
+}
+
+
+@dataclass(frozen=True)
+class SnapshotBody:
+    body: bytes
+    gzipped: bytes
+    digest: str
+    version: int
+
+    def etag(self, gzipped: bool) -> str:
+        # The two encodings are different representations
+        return f'"{self.digest}-gzip"' if gzipped else f'"{self.digest}"'
+
+
+@dataclass
+class _State:
+    sections: dict[str, dict[int, dict[str, Any]]]
+    counts: Counter
+    expires_at: float
+
+
+class CatalogSnapshot:
+    """
+    The storefront's first-paint document: all materials, all product types
+    and the number of items per (material, product type).
+
+    The state is loaded from the database once and then kept current by the
+    write endpoints (upsert / remove / items_added) without querying again.
+    The document is serialized and gzip-compressed once per change, on the
+    next read, and served as-is until the following change. Writes that
+    cannot be applied as a delta call invalidate(), which forces a reload.
+    """
+
+    def __init__(self, ttl: float = CATALOG_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._version = 0
+        self._state: Optional[_State] = None
+        self._rendered: Optional[SnapshotBody] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _changed(self) -> None:
+        self._version += 1
+        self._rendered = None
+
+    # ---- deltas, called after the write is committed ----
+
+    def invalidate(self) -> None:
+        self._state = None
+        self._changed()
+
+    def upsert(self, section: str, obj: Any) -> None:
+        _, schema = SECTIONS[section]
+        if self._state is not None:
+            self._state.sections[section][obj.id] = orm_to_dict(obj, schema)
+        self._changed()
+
+    def remove(self, section: str, obj_id: int) -> None:
+        if self._state is not None:
+            self._state.sections[section].pop(obj_id, None)
+        self._changed()
+
+    def items_added(self, items: Iterable[Item]) -> None:
+        if self._state is not None:
+            self._state.counts.update((item.material_id, item.product_type_id) for item in items)
+        self._changed()
+
+    # ---- reads ----
+
+    async def _load(self, db: AsyncSession) -> _State:
+        sections = {}
+        for name, (model, schema) in SECTIONS.items():
+            result = await db.execute(select(model))
+            sections[name] = {row.id: orm_to_dict(row, schema) for row in result.scalars()}
+
+        result = await db.execute(
+            select(Item.material_id, Item.product_type_id, func.count())
+            .group_by(Item.material_id, Item.product_type_id)
+        )
+        counts = Counter({
+            (material_id, product_type_id): count
+            for material_id, product_type_id, count in result
+        })
+        return _State(sections, counts, time.monotonic() + self.ttl)
+
+    async def _build(self, db: AsyncSession) -> SnapshotBody:
+        version = self._version
+        state = self._state
+        if state is None or state.expires_at <= time.monotonic():
+            state = await self._load(db)
+            # A delta applied while loading may or may not be in the result;
+            # use it for this response only and reload on the next one
+            if version == self._version:
+                self._state = state
+
+        body = dumps({
+            **{name: [rows[key] for key in sorted(rows)] for name, rows in state.sections.items()},
+            "item_counts": [
+                {"material_id": material_id, "product_type_id": product_type_id, "count": count}
+                for (material_id, product_type_id), count in sorted(state.counts.items())
+            ],
+        })
+        # Compressed once per change and sent many times: worth the best level
+        gzipped = await asyncio.to_thread(gzip.compress, body, 9, mtime=0)
+        rendered = SnapshotBody(body, gzipped, hashlib.sha1(body).hexdigest(), version)
+        if version == self._version and self._state is state:
+            self._rendered = rendered
+        return rendered
+
+    async def current(self, db: AsyncSession) -> SnapshotBody:
+        rendered = self._rendered
+        state = self._state
+        if rendered is not None and state is not None and state.expires_at > time.monotonic():
+            return rendered
+        return await singleflight.do(("catalog:snapshot", self._version), lambda: self._build(db))
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -47,3 +47,82 @@ def override_db():
     app.dependency_overrides[get_db] = fake_db
     yield
     app.dependency_overrides.pop(get_db, None)
+
+
+# 🔥 Start every test with an empty catalog cache
+from app.cache import catalog_cache
+from app.snapshot import catalog_snapshot
+
+@pytest.fixture(autouse=True)
+def clear_catalog_cache():
+    catalog_cache.clear()
+    catalog_snapshot.invalidate()
+    yield
+    catalog_cache.clear()
+    catalog_snapshot.invalidate()
+
+
+# 🔥 Real (SQLite) database for tests that need actual SQL, e.g. query budgets
+import asyncio
+import re
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import instrumentation
+from app.database import Base, get_sessionmaker
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    # NullPool: every TestClient request runs on its own event loop
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+        poolclass=NullPool,
+    )
+    instrumentation.instrument_engine(engine)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+
+    async def real_db():
+        async with session_factory() as session:
+            yield session
+
+    def seed(*objects):
+        async def add_all():
+            async with session_factory() as session:
+                session.add_all(objects)
+                await session.commit()
+
+        asyncio.run(add_all())
+
+    app.dependency_overrides[get_db] = real_db
+    app.dependency_overrides[get_sessionmaker] = lambda: session_factory
+    yield seed
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_sessionmaker, None)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def max_queries(monkeypatch):
+    """Assert a response was produced with at most `limit` SQL statements."""
+    monkeypatch.setattr(instrumentation, "SERVER_TIMING", True)
+
+    def check(response, limit: int):
+        timing = response.headers.get("server-timing", "")
+        match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing)
+        assert match, f"no query count in Server-Timing: {timing!r}"
+
+        count = int(match.group(1))
+        request = response.request
+        assert count <= limit, (
+            f"{request.method} {request.url.path} ran {count} queries (max {limit})"
+        )
+
+    return check
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import status
+
+from app import admission, metrics
+from app.models import Material
+from app.rendering import RenderPool, RenderPoolDraining, render_pool
+
+ITEM = {"material_id": 1, "product_type_id": 1, "width": 100.0, "height": 100.0}
+
+
+@pytest.fixture
+def loop_lag(monkeypatch):
+    def set_lag(seconds):
+        monkeypatch.setattr(metrics, "_last_loop_lag", seconds)
+
+    return set_lag
+
+
+def test_create_item_shed_when_render_queue_full(monkeypatch, client):
+    monkeypatch.setattr(admission, "RENDER_QUEUE_LIMIT", 0)
+
+    response = client.post("/api/items/", json=ITEM)
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert int(response.headers["retry-after"]) >= 1
+    assert "render_queue" in response.json()["detail"]
+
+
+def test_reads_keep_working_while_shedding(sqlite_db, loop_lag, client):
+    sqlite_db(Material(id=1, name="Wood"))
+    loop_lag(1.0)
+
+    assert client.post("/api/items/", json=ITEM).status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    response = client.get("/api/materials/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["name"] == "Wood"
+
+
+def test_readiness_reports_saturation(loop_lag, client):
+    response = client.get("/health/ready")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "ready"
+    assert response.json()["renders_admitted"] == 0
+
+    loop_lag(0.5)
+    response = client.get("/health/ready")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["status"] == "saturated"
+    assert response.json()["reasons"] == ["loop_lag"]
+    assert response.json()["loop_lag_ms"] == 500.0
+    # liveness is unaffected
+    assert client.get("/health").status_code == status.HTTP_200_OK
+
+
+def test_db_pool_saturation_sheds(monkeypatch, client):
+    monkeypatch.setattr(admission, "_db_pool_usage", lambda: (15, 15))
+
+    response = client.post("/api/items/", json=ITEM)
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "db_pool" in response.json()["detail"]
+
+
+def test_draining_worker_refuses_renders(monkeypatch, client):
+    monkeypatch.setattr(render_pool, "draining", True)
+
+    response = client.post("/api/items/", json=ITEM)
+    ready = client.get("/health/ready")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "1"
+    assert ready.json()["reasons"] == ["draining"]
+
+
+def test_render_pool_drain_waits_for_pending():
+    pool = RenderPool(workers=1)
+    release = threading.Event()
+
+    async def run():
+        render = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        timed_out = await pool.drain(timeout=0.1)
+        release.set()
+        drained = await pool.drain(timeout=5)
+        await render
+        with pytest.raises(RenderPoolDraining):
+            await pool.run(release.wait)
+        return timed_out, drained
+
+    assert asyncio.run(run()) == (False, True)
+    pool.shutdown()
+
+
+def test_render_pool_shutdown_does_not_wait_for_running_renders():
+    pool = RenderPool(workers=1)
+    release = threading.Event()
+
+    async def run():
+        running = asyncio.ensure_future(pool.run(release.wait))
+        queued = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        pool.shutdown()
+        elapsed = time.monotonic() - started
+        release.set()
+        await running
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        return elapsed
+
+    assert asyncio.run(run()) < 1
+
+
+def test_render_pool_runs_off_the_event_loop():
+    pool = RenderPool(workers=1)
+
+    def render(width, height):
+        return threading.current_thread().name, width * height
+
+    async def run():
+        return await asyncio.gather(pool.run(render, 2, 3), pool.run(render, width=4, height=5))
+
+    results = asyncio.run(run())
+    pool.shutdown()
+
+    assert [area for _, area in results] == [6, 20]
+    assert all(name.startswith("render") for name, _ in results)
+    assert pool.pending == 0
+    assert pool.avg_seconds is not None
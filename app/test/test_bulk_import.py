@@ -0,0 +1,189 @@
+import asyncio
+from unittest.mock import patch
+
+from fastapi import status
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.bulk_import import JOB_DONE, JOB_RENDERING, ImportJob, csv_records, run_import
+from app.database import Base
+from app.events import event_bus
+from app.models import Change, Item, Material, ProductType
+
+CSV = (
+    "material_id,product_type_id,width,height\n"
+    "1,1,100,50\n"
+    "1,1,wide,50\n"
+    "\n"
+    "7,1,20,20\n"
+    "1,1,30.5,40\n"
+)
+
+
+async def _chunked(data: bytes, size: int, delay: float = 0):
+    for start in range(0, len(data), size):
+        await asyncio.sleep(delay)
+        yield data[start:start + size]
+
+
+def test_records_split_across_chunks():
+    data = '\ufeffa,b\n"multi\nline",ü\r\n1,"x,""y"""'.encode()
+
+    async def run():
+        return [record async for record in csv_records(_chunked(data, 3))]
+
+    assert asyncio.run(run()) == [["a", "b"], ["multi\nline", "ü"], ["1", 'x,"y"']]
+
+
+@patch("app.bulk_import.crop_and_create_pdf")
+def test_import_reports_row_errors(mock_render, sqlite_db, client):
+    sqlite_db(Material(id=1, name="Wood"), ProductType(id=1, name="Poster"))
+    mock_render.return_value = "/path/to/item.pdf"
+
+    response = client.post(
+        "/api/items/import", content=CSV, headers={"Content-Type": "text/csv"}
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job = response.json()
+    assert (job["rows"], job["created"], job["failed"]) == (4, 2, 2)
+    assert job["errors"] == [
+        {"row": 2, "errors": [{"field": "width", "message": "value is not a valid float"}]},
+        {"row": 3, "errors": [{"field": "material_id", "message": "unknown material"}]},
+    ]
+    assert [item["width"] for item in client.get("/api/items/").json()] == [100.0, 30.5]
+
+    status_response = client.get(f"/api/items/import/{job['job_id']}")
+    assert status_response.json()["job_id"] == job["job_id"]
+    assert client.get("/api/items/import/unknown").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_import_requires_header_columns(sqlite_db, client):
+    response = client.post(
+        "/api/items/import", content="width,height\n1,2\n", headers={"Content-Type": "text/csv"}
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "material_id, product_type_id" in response.json()["detail"]
+
+
+def test_import_rejects_multipart(client):
+    response = client.post("/api/items/import", files={"file": ("items.csv", CSV)})
+
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+@patch("app.bulk_import.crop_and_create_pdf")
+def test_batches_are_rendered_while_parsing(mock_render, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    rows = "".join(f"1,1,{n},10\n" for n in range(1, 8))
+    data = f"material_id,product_type_id,width,height\n{rows}".encode()
+    job = ImportJob(user_id=1)
+    states_at_render = []
+
+    def render(width, height, item_id):
+        states_at_render.append(job.state)
+        return f"/pdfs/{item_id}.pdf"
+
+    mock_render.side_effect = render
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add_all([Material(id=1, name="Wood"), ProductType(id=1, name="Poster")])
+            await db.commit()
+            await run_import(job, _chunked(data, 16, delay=0.01), db, sessions, batch_size=3)
+            assert job.state == JOB_RENDERING
+            await job.wait()
+            paths = (await db.execute(select(Item.pdf_path).order_by(Item.id))).scalars().all()
+        await engine.dispose()
+        return paths
+
+    paths = asyncio.run(run())
+
+    assert paths == [f"/pdfs/{n}.pdf" for n in range(1, 8)]
+    assert (job.state, job.created, job.rendered) == (JOB_DONE, 7, 7)
+    # the first batches were rendered before the upload was fully parsed
+    assert states_at_render[0] == "importing"
+
+
+@patch("app.bulk_import.crop_and_create_pdf")
+def test_imported_items_publish_render_events(mock_render, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    data = b"material_id,product_type_id,width,height\n1,1,10,10\n1,1,20,10\n"
+    job = ImportJob(user_id=1)
+    cursor = event_bus.last_seq
+
+    def render(width, height, item_id):
+        if item_id == 2:
+            raise OSError("disk full")
+        return f"/pdfs/{item_id}.pdf"
+
+    mock_render.side_effect = render
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add_all([Material(id=1, name="Wood"), ProductType(id=1, name="Poster")])
+            await db.commit()
+            await run_import(job, _chunked(data, 64), db, sessions)
+            await job.wait()
+        await engine.dispose()
+
+    asyncio.run(run())
+
+    events, _ = event_bus._since(cursor)
+    states = {}
+    for event in events:
+        states.setdefault(event.data["item_id"], []).append(event.data)
+    assert [data["state"] for data in states[1]] == ["queued", "running", "done"]
+    assert states[1][-1]["pdf_path"] == "/pdfs/1.pdf"
+    assert [data["state"] for data in states[2]] == ["queued", "running", "failed"]
+    assert states[2][-1]["detail"] == "disk full"
+
+
+@patch("app.bulk_import.crop_and_create_pdf")
+def test_each_batch_is_one_multi_row_insert(mock_render, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    rows = "".join(f"1,1,{n},10\n" for n in range(1, 8))
+    data = f"material_id,product_type_id,width,height\n{rows}".encode()
+    job = ImportJob(user_id=1)
+    # a failed render writes nothing: only the import's own statements count
+    mock_render.side_effect = OSError("disk full")
+    inserts = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO items") or statement.startswith("INSERT INTO changes"):
+            inserts.append(statement.split()[2])
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add_all([Material(id=1, name="Wood"), ProductType(id=1, name="Poster")])
+            await db.commit()
+            inserts.clear()
+            await run_import(job, _chunked(data, 64), db, sessions, batch_size=3)
+            await job.wait()
+            items = (await db.execute(select(Item.id, Item.width).order_by(Item.id))).all()
+            changes = (await db.execute(
+                select(Change.entity_id, Change.changed_at)
+                .where(Change.entity == "item", Change.op == "insert")
+            )).all()
+        await engine.dispose()
+        return items, changes
+
+    items, changes = asyncio.run(run())
+
+    # batches of 3 + 3 + 1 rows, each with its change feed rows
+    assert inserts == ["items", "changes"] * 3
+    assert items == [(n, float(n)) for n in range(1, 8)]
+    assert sorted(entity_id for entity_id, _ in changes) == list(range(1, 8))
+    assert all(changed_at is not None for _, changed_at in changes)
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+from fastapi import status
+
+from app.models import Item, Material, ProductType
+
+
+def _seed(seed):
+    seed(
+        Material(id=1, name="Wood"),
+        Material(id=2, name="Metal"),
+        ProductType(id=1, name="Poster"),
+        Item(id=1, material_id=1, product_type_id=1, width=10.0, height=5.0),
+        Item(id=2, material_id=1, product_type_id=1, width=20.0, height=5.0),
+        Item(id=3, material_id=2, product_type_id=1, width=30.0, height=5.0),
+    )
+
+
+def test_snapshot_document_and_etag(sqlite_db, client):
+    _seed(sqlite_db)
+
+    response = client.get("/api/catalog/snapshot", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    snapshot = response.json()
+    assert [m["name"] for m in snapshot["materials"]] == ["Wood", "Metal"]
+    assert [p["name"] for p in snapshot["product_types"]] == ["Poster"]
+    assert snapshot["item_counts"] == [
+        {"material_id": 1, "product_type_id": 1, "count": 2},
+        {"material_id": 2, "product_type_id": 1, "count": 1},
+    ]
+
+    etag = response.headers["etag"]
+    cached = client.get(
+        "/api/catalog/snapshot", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    plain = client.get("/api/catalog/snapshot", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == snapshot
+    assert plain.headers["etag"] != etag
+
+
+@patch("app.routers.items.crop_and_create_pdf")
+def test_snapshot_follows_writes_without_reloading(mock_render, sqlite_db, client, max_queries):
+    _seed(sqlite_db)
+    mock_render.return_value = "/path/to/item.pdf"
+    first = client.get("/api/catalog/snapshot")
+
+    client.post("/api/materials/", json={"name": "Glass"})
+    client.post(
+        "/api/items/",
+        json={"material_id": 2, "product_type_id": 1, "width": 1.0, "height": 1.0},
+    )
+    response = client.get("/api/catalog/snapshot")
+
+    max_queries(response, 0)
+    assert response.headers["etag"] != first.headers["etag"]
+    snapshot = response.json()
+    assert [m["name"] for m in snapshot["materials"]] == ["Wood", "Metal", "Glass"]
+    assert snapshot["item_counts"][1] == {"material_id": 2, "product_type_id": 1, "count": 2}
+
+    client.delete("/api/items/3")
+    assert client.get("/api/catalog/snapshot").json()["item_counts"][1]["count"] == 1
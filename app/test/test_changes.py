@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import status
+
+from app.crud import bulk_upsert_by_name
+from app.models import Change, Material, ProductType
+
+
+@pytest.fixture(autouse=True)
+def no_settle_delay(monkeypatch):
+    monkeypatch.setattr("app.changes.CHANGES_SETTLE_SECONDS", 0)
+
+
+def _feed(client, **params):
+    response = client.get("/api/changes/", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+@patch("app.routers.items.crop_and_create_pdf")
+def test_feed_lists_writes_in_order(mock_render, sqlite_db, client):
+    sqlite_db(ProductType(id=1, name="Poster"))
+    mock_render.return_value = "/path/to/item.pdf"
+    start = _feed(client)["next_cursor"]
+
+    client.post("/api/materials/", json={"name": "Wood"})
+    client.post(
+        "/api/items/",
+        json={"material_id": 1, "product_type_id": 1, "width": 10.0, "height": 5.0},
+    )
+    client.put("/api/materials/1", json={"description": "Oak"})
+    client.delete("/api/items/1")
+
+    page = _feed(client, since=start)
+    entries = [(c["entity"], c["id"], c["op"]) for c in page["changes"]]
+    # the item's pdf_path is set by a second write after the insert
+    assert entries == [
+        ("material", 1, "insert"),
+        ("item", 1, "insert"),
+        ("item", 1, "update"),
+        ("material", 1, "update"),
+        ("item", 1, "delete"),
+    ]
+    assert page["has_more"] is False
+
+    assert _feed(client, since=start, entity="material")["changes"][1]["op"] == "update"
+    # nothing new: the cursor stays put
+    again = _feed(client, since=page["next_cursor"])
+    assert again == {"changes": [], "next_cursor": page["next_cursor"], "has_more": False}
+
+
+def test_feed_pages_by_cursor(sqlite_db, client):
+    sqlite_db(*(Material(id=i, name=f"M{i}") for i in range(1, 6)))
+
+    first = _feed(client, limit=2)
+    assert [c["id"] for c in first["changes"]] == [1, 2]
+    assert first["has_more"] is True
+    second = _feed(client, since=first["next_cursor"], limit=2)
+    assert [c["id"] for c in second["changes"]] == [3, 4]
+    last = _feed(client, since=second["next_cursor"], limit=2)
+    assert [c["id"] for c in last["changes"]] == [5]
+    assert last["has_more"] is False
+
+
+def test_feed_holds_back_unsettled_changes(sqlite_db, client, monkeypatch):
+    monkeypatch.setattr("app.changes.CHANGES_SETTLE_SECONDS", 60)
+    sqlite_db(
+        Change(id=1, entity="material", entity_id=1, op="insert",
+               changed_at=datetime.utcnow() - timedelta(minutes=5)),
+        Change(id=2, entity="material", entity_id=2, op="insert"),
+    )
+
+    page = _feed(client)
+    assert [c["cursor"] for c in page["changes"]] == [1]
+    assert page["next_cursor"] == 1
+
+
+def test_expired_cursor_is_gone(sqlite_db, client):
+    sqlite_db(
+        Change(id=10, entity="material", entity_id=1, op="insert"),
+        Change(id=11, entity="material", entity_id=1, op="update"),
+    )
+
+    response = client.get("/api/changes/", params={"since": 5})
+
+    assert response.status_code == status.HTTP_410_GONE
+    assert response.json()["cursor"] == 11
+    # the cursor just before the oldest retained change is still complete
+    assert len(_feed(client, since=9)["changes"]) == 2
+
+
+def test_bulk_upsert_records_only_matched_names():
+    # the database matched "Cafe" to an existing "Café", which Python does not
+    existing = MagicMock()
+    existing.scalars.return_value.all.return_value = ["Café"]
+    ids = MagicMock()
+    ids.tuples.return_value.all.return_value = [("Café", 1)]
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[existing, MagicMock(), ids])
+    db.commit = AsyncMock()
+
+    outcomes = asyncio.run(bulk_upsert_by_name(db, Material, [{"name": "Cafe"}]))
+
+    assert outcomes[0]["id"] is None
+    db.add_all.assert_not_called()
+    db.commit.assert_awaited_once()
@@ -0,0 +1,128 @@
+import asyncio
+import gzip
+import zlib
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import status
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.compression import CompressionMiddleware, choose_encoding
+
+
+def _fake_item(item_id: int):
+    item = MagicMock()
+    item.id = item_id
+    item.material_id = 1
+    item.product_type_id = 1
+    item.width = 100.0
+    item.height = 200.0
+    item.pdf_path = f"app/storage/pdfs/item_{item_id}.pdf"
+    item.created_at = datetime(2024, 1, 1)
+    item.updated_at = datetime(2024, 1, 1)
+    return item
+
+
+def test_list_items_gzip_compressed(client):
+    from app.database import get_db
+
+    async def fake_db():
+        db = MagicMock()
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = [_fake_item(i) for i in range(100)]
+        db.execute = AsyncMock(return_value=result)
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    response = client.get("/api/items/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content) / 5
+    assert len(response.json()) == 100
+
+    client.app.dependency_overrides = {}
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+
+
+def _app():
+    async def pdf(request):
+        return Response(b"%PDF-1.4" + b"0" * 5000, media_type="application/pdf")
+
+    async def tagged(request):
+        return JSONResponse(["x"] * 1000, headers={"ETag": '"abc"'})
+
+    app = Starlette(routes=[
+        Route("/pdf", pdf),
+        Route("/tagged", tagged),
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+    return TestClient(app)
+
+
+def test_already_compressed_content_types_are_skipped():
+    response = _app().get("/pdf", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.content.startswith(b"%PDF")
+
+
+def test_streaming_response_is_compressed_chunk_by_chunk():
+    async def rows():
+        for i in range(50):
+            yield f"{i},row {i}\n".encode() * 20
+
+    middleware = CompressionMiddleware(
+        StreamingResponse(rows(), media_type="text/csv"), minimum_size=500
+    )
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+
+    start, *bodies = messages
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    # every chunk is flushed, so each one decompresses as soon as it arrives
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(bodies[0]["body"]) == b"0,row 0\n" * 20
+    assert len(bodies) > 50
+
+    body = gzip.decompress(b"".join(message["body"] for message in bodies))
+    assert body.count(b"\n") == 50 * 20
+
+
+def test_strong_etag_becomes_weak_when_compressed():
+    response = _app().get("/tagged", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["etag"] == 'W/"abc"'
+
+
+def test_choose_encoding_honours_quality_values():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") is not None
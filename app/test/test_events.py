@@ -0,0 +1,142 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+from fastapi import status
+
+from app.events import BOOT_ID, HEARTBEAT, EventBus, event_bus
+from app.main import app
+from app.models import Material, ProductType
+
+
+async def _take(stream, count):
+    return [await stream.__anext__() for _ in range(count)]
+
+
+def _parse(chunk: bytes) -> dict:
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines())
+    fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+def test_stream_resumes_after_last_event_id():
+    bus = EventBus()
+
+    async def run():
+        for n in range(1, 4):
+            bus.publish("render", {"item_id": n, "state": "done"})
+        stream = bus.stream(last_event_id=f"{BOOT_ID}-1")
+        retry, second, third = await _take(stream, 3)
+        live = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        bus.publish("render", {"item_id": 4, "state": "queued"})
+        fourth = await live
+        await stream.aclose()
+        return retry, second, third, fourth
+
+    retry, *events = asyncio.run(run())
+
+    assert retry == b"retry: 3000\n\n"
+    assert [_parse(e)["id"] for e in events] == [f"{BOOT_ID}-{n}" for n in (2, 3, 4)]
+    assert _parse(events[2])["data"] == {"item_id": 4, "state": "queued"}
+
+
+def test_unknown_or_dropped_ids_get_a_reset():
+    bus = EventBus(buffer_size=2)
+
+    async def run():
+        for n in range(1, 6):
+            bus.publish("render", {"item_id": n, "state": "done"})
+        other_process = bus.stream(last_event_id="deadbeef-3")
+        _, unknown = await _take(other_process, 2)
+        too_old = bus.stream(last_event_id=f"{BOOT_ID}-1")
+        _, dropped, *replayed = await _take(too_old, 4)
+        await other_process.aclose()
+        await too_old.aclose()
+        return unknown, dropped, replayed
+
+    unknown, dropped, replayed = asyncio.run(run())
+
+    assert _parse(unknown)["event"] == "reset"
+    assert _parse(unknown)["id"] == f"{BOOT_ID}-5"
+    assert _parse(dropped)["event"] == "reset"
+    assert [_parse(e)["data"]["item_id"] for e in replayed] == [4, 5]
+
+
+def test_heartbeat_on_idle_stream():
+    bus = EventBus()
+
+    async def run():
+        stream = bus.stream(heartbeat=0.01)
+        chunks = await _take(stream, 3)
+        await stream.aclose()
+        return chunks
+
+    assert asyncio.run(run())[1:] == [HEARTBEAT, HEARTBEAT]
+
+
+def _read_events(query_string: bytes, headers: list, until: bytes) -> bytes:
+    """Drive the SSE endpoint over ASGI until `until` shows up, then disconnect."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/items/events",
+        "raw_path": b"/api/items/events",
+        "query_string": query_string,
+        "headers": headers,
+        "server": ("test", 80),
+        "client": ("test", 1234),
+        "root_path": "",
+    }
+    received = []
+
+    async def run():
+        done = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                assert message["status"] == status.HTTP_200_OK
+            elif message["type"] == "http.response.body":
+                received.append(message.get("body", b""))
+                if until in b"".join(received):
+                    done.set()
+
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+
+    asyncio.run(run())
+    return b"".join(received)
+
+
+@patch("app.routers.items.crop_and_create_pdf")
+def test_create_item_publishes_render_states(mock_render, sqlite_db, client):
+    sqlite_db(Material(id=1, name="Wood"), ProductType(id=1, name="Poster"))
+    mock_render.return_value = "/path/to/item.pdf"
+    resume_from = f"{BOOT_ID}-{event_bus.last_seq}"
+
+    item = client.post(
+        "/api/items/",
+        json={"material_id": 1, "product_type_id": 1, "width": 100.0, "height": 50.0},
+    ).json()
+
+    body = _read_events(
+        f"item_id={item['id']}".encode(),
+        [(b"last-event-id", resume_from.encode())],
+        until=b'"done"',
+    )
+    events = [_parse(chunk) for chunk in body.split(b"\n\n") if chunk.startswith(b"id:")]
+
+    assert [e["data"]["state"] for e in events] == ["queued", "running", "done"]
+    assert events[-1]["data"]["pdf_path"] == "/path/to/item.pdf"
+    assert {e["event"] for e in events} == {"render"}
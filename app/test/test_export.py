@@ -0,0 +1,192 @@
+import asyncio
+import contextlib
+import csv
+import io
+import zipfile
+
+import pytest
+from fastapi import status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import export
+from app.database import Base
+from app.export import stream_csv, stream_parquet, stream_pdf_zip
+from app.models import Item, Material, ProductType
+from app.routers.items import ItemFilters, _export_statement, _parquet_schema
+
+
+def _catalog_with_items(count=5):
+    return [
+        Material(id=1, name="Wood"),
+        Material(id=2, name="Metal"),
+        ProductType(id=1, name="Poster"),
+        *[
+            Item(id=i, material_id=i % 2 + 1, product_type_id=1, width=10.0 * i, height=5.0)
+            for i in range(1, count + 1)
+        ],
+    ]
+
+
+def test_export_csv_with_names_and_filters(sqlite_db, client):
+    sqlite_db(*_catalog_with_items())
+
+    response = client.get("/api/items/export?format=csv&expand=material&material_id=1")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"].startswith('attachment; filename="items-')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["id"] for row in rows] == ["2", "4"]
+    assert {row["material_name"] for row in rows} == {"Wood"}
+    assert rows[0]["width"] == "20.0"
+    assert rows[0]["pdf_path"] == ""
+
+
+def test_list_items_uses_same_filters(sqlite_db, client):
+    sqlite_db(*_catalog_with_items())
+
+    response = client.get("/api/items/?material_id=2&product_type_id=1")
+
+    assert [item["id"] for item in response.json()] == [1, 3, 5]
+
+
+def test_export_rejects_unknown_format(client):
+    response = client.get("/api/items/export?format=xlsx")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def _export(tmp_path, consume, items=None):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'export.db'}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add_all(items or _catalog_with_items(count=7))
+            await db.commit()
+        chunks = [chunk async for chunk in consume(sessions)]
+        await engine.dispose()
+        return chunks
+
+    return asyncio.run(run())
+
+
+def test_csv_is_written_batch_by_batch(tmp_path):
+    statement = _export_statement(set(), ItemFilters())
+    columns = list(statement.selected_columns.keys())
+
+    chunks = _export(tmp_path, lambda s: stream_csv(s, statement, columns, batch_size=3))
+
+    # header, then batches of 3 + 3 + 1 rows
+    assert [chunk.count(b"\n") for chunk in chunks] == [1, 3, 3, 1]
+
+
+def test_parquet_row_group_per_batch(tmp_path):
+    import pyarrow.parquet as pq
+    statement = _export_statement({"material", "product_type"}, ItemFilters())
+    schema = _parquet_schema(list(statement.selected_columns.keys()))
+
+    chunks = _export(tmp_path, lambda s: stream_parquet(s, statement, schema, batch_size=3))
+
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column("id").to_pylist() == list(range(1, 8))
+    assert table.column("material_name").to_pylist()[:2] == ["Metal", "Wood"]
+    assert table.column("product_type_name").to_pylist()[0] == "Poster"
+
+
+def _pdf(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"%PDF-1.4 " + bytes(range(256)) * (size // 256))
+    return str(path)
+
+
+def test_archive_streams_stored_pdfs(sqlite_db, client, tmp_path):
+    first, second = _pdf(tmp_path, "1.pdf", 2048), _pdf(tmp_path, "2.pdf", 512)
+    items = _catalog_with_items(count=3)
+    items[3].pdf_path, items[4].pdf_path = first, second
+    sqlite_db(*items)
+
+    response = client.post("/api/items/archive", json={"ids": [1, 3]})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/zip"
+    assert "content-length" not in response.headers
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["item-1.pdf", "missing.txt"]
+    assert archive.getinfo("item-1.pdf").compress_type == zipfile.ZIP_STORED
+    assert archive.read("item-1.pdf") == open(first, "rb").read()
+    assert archive.read("missing.txt").decode().splitlines()[1:] == ["3"]
+
+    filtered = client.post("/api/items/archive?material_id=1")
+    assert zipfile.ZipFile(io.BytesIO(filtered.content)).namelist() == ["item-2.pdf"]
+
+
+def test_archive_caps_listed_ids(sqlite_db, client):
+    sqlite_db(*_catalog_with_items(count=1))
+
+    response = client.post("/api/items/archive", json={"ids": list(range(1, 202))})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["body", "ids"]
+    capped = client.post("/api/items/archive", json={"ids": list(range(1, 201))})
+    assert capped.status_code == status.HTTP_200_OK
+
+
+def test_archive_memory_is_bounded_by_read_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "ZIP_READ_SIZE", 1024)
+    items = _catalog_with_items(count=7)
+    for item in items[3:]:
+        item.pdf_path = _pdf(tmp_path, f"{item.id}.pdf", 64 * 1024)
+    statement = select(Item.id, Item.pdf_path).order_by(Item.id)
+
+    chunks = _export(tmp_path, lambda s: stream_pdf_zip(s, statement), items)
+
+    # one read per chunk, plus at most an entry header or data descriptor
+    assert max(len(chunk) for chunk in chunks[:-1]) < 1024 + 100
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    assert len(archive.namelist()) == 7
+
+
+def test_archive_reads_items_in_short_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "ZIP_PAGE_SIZE", 3)
+    items = _catalog_with_items(count=7)
+    for item in items[3:]:
+        item.pdf_path = _pdf(tmp_path, f"{item.id}.pdf", 512)
+    items[7].pdf_path = None
+    statement = select(Item.id, Item.pdf_path).order_by(Item.id)
+    queries = []
+    open_while_streaming = []
+
+    async def consume(sessions):
+        open_sessions = []
+
+        @contextlib.asynccontextmanager
+        async def tracked():
+            async with sessions() as db:
+                open_sessions.append(db)
+                queries.append(db)
+                try:
+                    yield db
+                finally:
+                    open_sessions.remove(db)
+
+        async for chunk in stream_pdf_zip(tracked, statement):
+            open_while_streaming.append(bool(open_sessions))
+            yield chunk
+
+    chunks = _export(tmp_path, consume, items)
+
+    # pages of 3 + 3 + 1 ids, none of them read while the client downloads
+    assert len(queries) == 3
+    assert not any(open_while_streaming)
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.namelist() == [f"item-{i}.pdf" for i in (1, 2, 3, 4, 6, 7)] + ["missing.txt"]
+    assert archive.read("missing.txt") == b"Items without a PDF:\n5\n"
@@ -0,0 +1,150 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import admission
+from app.database import Base
+from app.idempotency import run_idempotent
+from app.models import IdempotencyKey, Material, ProductType
+
+ITEM = {"material_id": 1, "product_type_id": 1, "width": 100.0, "height": 50.0}
+
+
+def _seed_catalog(seed):
+    seed(Material(id=1, name="Wood"), ProductType(id=1, name="Poster"))
+
+
+@patch("app.routers.items.crop_and_create_pdf")
+def test_retry_replays_first_response(mock_render, sqlite_db, client):
+    _seed_catalog(sqlite_db)
+    mock_render.return_value = "/path/to/item.pdf"
+
+    first = client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "abc"})
+    retry = client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "abc"})
+
+    assert first.status_code == retry.status_code == status.HTTP_200_OK
+    assert retry.content == first.content
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert mock_render.call_count == 1
+    assert len(client.get("/api/items/").json()) == 1
+
+
+@patch("app.routers.items.crop_and_create_pdf")
+def test_key_reused_for_other_payload(mock_render, sqlite_db, client):
+    _seed_catalog(sqlite_db)
+    mock_render.return_value = "/path/to/item.pdf"
+
+    client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "abc"})
+    response = client.post(
+        "/api/items/", json={**ITEM, "width": 999.0}, headers={"Idempotency-Key": "abc"}
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert mock_render.call_count == 1
+
+
+@patch("app.routers.items.crop_and_create_pdf")
+def test_failed_request_releases_key(mock_render, sqlite_db, client):
+    _seed_catalog(sqlite_db)
+    mock_render.side_effect = [RuntimeError("disk full"), "/path/to/item.pdf"]
+
+    failed = client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "abc"})
+    retry = client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "abc"})
+
+    assert failed.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert retry.status_code == status.HTTP_200_OK
+    assert "idempotent-replayed" not in retry.headers
+    assert retry.json()["pdf_path"] == "/path/to/item.pdf"
+
+
+def test_concurrent_duplicate_waits_for_first(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    calls = []
+
+    async def slow_create():
+        calls.append(1)
+        await asyncio.sleep(0.3)
+        return {"id": 7}
+
+    async def request():
+        async with sessions() as db:
+            return await run_idempotent(db, 1, "abc", "hash", slow_create)
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        first = asyncio.create_task(request())
+        await asyncio.sleep(0.05)
+        duplicate = await request()
+        result = await first, duplicate
+        await engine.dispose()
+        return result
+
+    first, duplicate = asyncio.run(run())
+
+    assert calls == [1]
+    assert first.body == duplicate.body == b'{"id":7}'
+    assert duplicate.headers["idempotent-replayed"] == "true"
+
+
+def test_retry_takes_over_key_of_dead_request(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def create():
+        return {"id": 7}
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            # claimed by a worker that was killed before it finished
+            db.add(IdempotencyKey(
+                user_id=1,
+                key="abc",
+                request_hash="hash",
+                expires_at=datetime.utcnow() + timedelta(hours=1),
+                lease_expires_at=datetime.utcnow() - timedelta(seconds=1),
+            ))
+            await db.commit()
+        async with sessions() as db:
+            retry = await run_idempotent(db, 1, "abc", "hash", create)
+        async with sessions() as db:
+            replay = await run_idempotent(db, 1, "abc", "hash", create)
+        await engine.dispose()
+        return retry, replay
+
+    retry, replay = asyncio.run(run())
+
+    assert retry.body == b'{"id":7}'
+    assert "idempotent-replayed" not in retry.headers
+    assert replay.headers["idempotent-replayed"] == "true"
+
+
+@patch("app.routers.items.crop_and_create_pdf")
+def test_saturation_sheds_new_creations_but_not_replays(mock_render, sqlite_db, client, monkeypatch):
+    _seed_catalog(sqlite_db)
+    mock_render.return_value = "/path/to/item.pdf"
+    first = client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "abc"})
+    monkeypatch.setattr(admission, "RENDER_QUEUE_LIMIT", 0)
+
+    retry = client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "abc"})
+    new = client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "def"})
+
+    assert retry.status_code == status.HTTP_200_OK
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.content == first.content
+    assert new.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "render_queue" in new.json()["detail"]
+    # the shed request released its key: once there is room, its retry runs
+    monkeypatch.setattr(admission, "RENDER_QUEUE_LIMIT", 4)
+    again = client.post("/api/items/", json=ITEM, headers={"Idempotency-Key": "def"})
+    assert again.status_code == status.HTTP_200_OK
+    assert "idempotent-replayed" not in again.headers
+    assert mock_render.call_count == 2
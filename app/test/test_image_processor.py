@@ -0,0 +1,178 @@
+import os
+import random
+import re
+import zlib
+
+import pytest
+from PIL import Image, TiffImagePlugin
+
+from app import image_processor
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_processor, "OUTPUT_DIR", str(tmp_path / "pdfs"))
+    monkeypatch.setattr(image_processor, "STREAMABLE_SOURCE_DIR", str(tmp_path / "sources"))
+    monkeypatch.setattr(image_processor, "RENDER_BANDED_SOURCE_PIXELS", 0)
+    monkeypatch.setattr(image_processor, "RENDER_STRIPWISE_MIN_PIXELS", 0)
+    # 10 rows of the 301 pixel wide source per strip
+    monkeypatch.setattr(image_processor, "RENDER_STRIP_BYTES", 301 * 3 * 10)
+    rng = random.Random(0)
+    image = Image.frombytes("RGB", (301, 203), bytes(rng.randrange(256) for _ in range(301 * 203 * 3)))
+
+    def save(name, **params):
+        path = str(tmp_path / name)
+        image.save(path, **params)
+        monkeypatch.setattr(image_processor, "STATIC_IMAGE_PATH", path)
+        return Image.open(path).convert("RGB").crop((0, 0, 250, 150)).tobytes()
+
+    return save
+
+
+def _image_pixels(pdf_path):
+    data = open(pdf_path, "rb").read()
+    # every xref entry points at its object
+    xref = int(data.rsplit(b"startxref\n", 1)[1].split()[0])
+    lines = data[xref:].split(b"\n")
+    count = int(lines[1].split()[1])
+    offsets = [int(line[:10]) for line in lines[3:count + 2]]
+    assert [data[offset:].split(b"\n", 1)[0] for offset in offsets] == [
+        b"%d 0 obj" % number for number in range(1, len(offsets) + 1)
+    ]
+    stream = re.search(rb"/Width 250 /Height 150 .*?/FlateDecode /Length 7 0 R >>\nstream\n", data)
+    length = int(re.search(rb"7 0 obj\n(\d+)", data).group(1))
+    return zlib.decompress(data[stream.end():stream.end() + length])
+
+
+def test_single_strip_tiff_is_read_in_bands(source):
+    expected = source("source.tif")
+    with Image.open(image_processor.STATIC_IMAGE_PATH) as image:
+        assert image_processor._streamable(image)
+        bands = image_processor._row_bands(image, 10)
+    assert [extents[3] - extents[1] for _, extents, _, _ in bands] == [10] * 20 + [3]
+
+    pdf_path = image_processor.crop_and_create_pdf(width=250, height=150, item_id=1)
+
+    assert _image_pixels(pdf_path) == expected
+
+
+@pytest.fixture
+def jpeg_encoded(monkeypatch):
+    """The crops handed to the JPEG encoder, as raw RGB bytes."""
+    encoded = []
+    save = Image.Image.save
+
+    def record_jpeg(image, fp, format=None, **params):
+        if format == "JPEG":
+            encoded.append(image.tobytes())
+        return save(image, fp, format, **params)
+
+    monkeypatch.setattr(Image.Image, "save", record_jpeg)
+    return encoded
+
+
+@pytest.fixture
+def row_reads(monkeypatch):
+    reads = []
+    read_rows = image_processor._read_rows
+    monkeypatch.setattr(
+        image_processor, "_read_rows", lambda *args: reads.append(args) or read_rows(*args)
+    )
+    return reads
+
+
+def test_stripwise_tiff_matches_the_whole_image_path(source, monkeypatch, jpeg_encoded, row_reads):
+    # Band reading relies on Pillow internals (tile, _size): this catches an
+    # upgrade that changes them
+    source("source.tif")
+    monkeypatch.setattr(image_processor, "RENDER_BANDED_SOURCE_PIXELS", 301 * 203 + 1)
+    image_processor.crop_and_create_pdf(width=250, height=150, item_id=1)
+    assert row_reads == []
+    monkeypatch.setattr(image_processor, "RENDER_BANDED_SOURCE_PIXELS", 0)
+    pdf_path = image_processor.crop_and_create_pdf(width=250, height=150, item_id=2)
+
+    assert len(row_reads) == 15
+    assert _image_pixels(pdf_path) == jpeg_encoded[0]
+
+
+def test_small_crops_of_large_sources_are_read_in_bands(source, monkeypatch, jpeg_encoded, row_reads):
+    monkeypatch.setattr(image_processor, "RENDER_STRIPWISE_MIN_PIXELS", 250 * 150 + 1)
+    source("source.tif")
+    monkeypatch.setattr(image_processor, "RENDER_BANDED_SOURCE_PIXELS", 301 * 203 + 1)
+    image_processor.crop_and_create_pdf(width=250, height=150, item_id=1)
+    monkeypatch.setattr(image_processor, "RENDER_BANDED_SOURCE_PIXELS", 301 * 203)
+
+    pdf_path = image_processor.crop_and_create_pdf(width=250, height=150, item_id=2)
+
+    # still JPEG-encoded, but cropped from bands instead of the decoded source
+    assert b"/DCTDecode" in open(pdf_path, "rb").read()
+    assert len(row_reads) == 15
+    assert jpeg_encoded[1] == jpeg_encoded[0]
+
+
+def test_multi_strip_tiff(source, monkeypatch):
+    monkeypatch.setattr(TiffImagePlugin, "WRITE_LIBTIFF", True)
+    expected = source("source.tif", tiffinfo={TiffImagePlugin.ROWSPERSTRIP: 7})
+
+    pdf_path = image_processor.crop_and_create_pdf(width=250, height=150, item_id=1)
+
+    assert _image_pixels(pdf_path) == expected
+
+
+@pytest.mark.parametrize(
+    "name, params",
+    [("source.jpg", {"quality": 95}), ("source.png", {}), ("source.tif", {"compression": "tiff_lzw"})],
+)
+def test_other_sources_are_prepared_before_rendering(source, tmp_path, name, params):
+    expected = source(name, **params)
+    with Image.open(image_processor.STATIC_IMAGE_PATH) as image:
+        assert not image_processor._streamable(image)
+    # never decoded whole by a render
+    with pytest.raises(RuntimeError, match="app.prepare_source"):
+        image_processor.crop_and_create_pdf(width=250, height=150, item_id=1)
+
+    copy = image_processor.prepare_source()
+    converted = os.stat(copy).st_mtime_ns
+    pdf_path = image_processor.crop_and_create_pdf(width=250, height=150, item_id=2)
+
+    assert _image_pixels(pdf_path) == expected
+    assert image_processor.prepare_source() == copy
+    assert [path.name for path in (tmp_path / "sources").glob("*.tif")] == [os.path.basename(copy)]
+    assert os.stat(copy).st_mtime_ns == converted
+
+
+def test_prepare_skips_sources_read_directly(source, monkeypatch):
+    source("source.tif")
+    assert image_processor.prepare_source() is None
+    source("source.jpg")
+    monkeypatch.setattr(image_processor, "RENDER_BANDED_SOURCE_PIXELS", 301 * 203 + 1)
+    assert image_processor.prepare_source() is None
+
+
+def test_small_crops_keep_the_jpeg_path(source, monkeypatch):
+    monkeypatch.setattr(image_processor, "RENDER_BANDED_SOURCE_PIXELS", 301 * 203 + 1)
+    source("source.jpg")
+
+    pdf_path = image_processor.crop_and_create_pdf(width=250, height=150, item_id=1)
+
+    assert b"/DCTDecode" in open(pdf_path, "rb").read()
+
+
+def test_bomb_limit_is_lifted_for_the_source_only(source, monkeypatch):
+    source("source.tif")
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 10000)
+    limits = []
+    read_rows = image_processor._read_rows
+    monkeypatch.setattr(
+        image_processor,
+        "_read_rows",
+        lambda *args: limits.append(Image.MAX_IMAGE_PIXELS) or read_rows(*args),
+    )
+
+    image_processor.crop_and_create_pdf(width=250, height=150, item_id=1)
+
+    # other threads never see a lifted limit, not even during the render
+    assert set(limits) == {10000}
+    assert Image.MAX_IMAGE_PIXELS == 10000
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(image_processor.STATIC_IMAGE_PATH)
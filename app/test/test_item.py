@@ -19,6 +19,7 @@ def test_create_item_success(mock_pdf, mock_user, client):
     fake_item.height = 200.0
     fake_item.pdf_path = None  # Initially None, then set to PDF path
     fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -102,6 +103,7 @@ def test_create_item_pdf_generation_fails(mock_pdf, mock_user, client):
     fake_item.height = 200.0
     fake_item.pdf_path = None
     fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -139,6 +141,7 @@ def test_list_items(client):
     fake_item1.height = 200.0
     fake_item1.pdf_path = "/path/to/item1.pdf"
     fake_item1.created_at = datetime.now()
+    fake_item1.updated_at = datetime.now()
 
     fake_item2 = MagicMock()
     fake_item2.id = 2
@@ -148,6 +151,7 @@ def test_list_items(client):
     fake_item2.height = 250.5
     fake_item2.pdf_path = "/path/to/item2.pdf"
     fake_item2.created_at = datetime.now()
+    fake_item2.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -179,6 +183,7 @@ def test_get_item_success(client):
     fake_item.height = 200.0
     fake_item.pdf_path = "/path/to/item.pdf"
     fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -229,19 +234,23 @@ def test_update_item_success(mock_user, client):
     fake_item.height = 200.0
     fake_item.pdf_path = "/path/to/item.pdf"
     fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
 
     from app.database import get_db
 
+    # Row as read back by UPDATE ... RETURNING
+    fake_item.material_id = 2
+    fake_item.width = 150.0
+    fake_item.height = 250.0
+
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = fake_item
+    execute = AsyncMock(return_value=result)
+
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_item)
+        db.execute = execute
         db.commit = AsyncMock()
-        # Update the fields when refresh is called
-        db.refresh = AsyncMock(side_effect=lambda x: (
-            setattr(x, 'material_id', 2),
-            setattr(x, 'width', 150.0),
-            setattr(x, 'height', 250.0)
-        ))
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -258,6 +267,8 @@ def test_update_item_success(mock_user, client):
     assert response.json()["material_id"] == 2
     assert response.json()["width"] == 150.0
     assert response.json()["height"] == 250.0
+    # One UPDATE ... RETURNING, no separate get/refresh
+    execute.assert_awaited_once()
 
     client.app.dependency_overrides = {}
 
@@ -274,15 +285,19 @@ def test_update_item_partial(mock_user, client):
     fake_item.height = 200.0
     fake_item.pdf_path = "/path/to/item.pdf"
     fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
 
     from app.database import get_db
 
+    # Only width changes
+    fake_item.width = 175.0
+
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_item)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = fake_item
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
-        # Only update width
-        db.refresh = AsyncMock(side_effect=lambda x: setattr(x, 'width', 175.0))
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -307,7 +322,10 @@ def test_update_item_not_found(mock_user, client):
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=None)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -328,14 +346,13 @@ def test_update_item_not_found(mock_user, client):
 def test_delete_item_success(mock_user, client):
     mock_user.return_value = {"id": 1}
 
-    fake_item = MagicMock()
-
     from app.database import get_db
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_item)
-        db.delete = AsyncMock()
+        result = MagicMock()
+        result.rowcount = 1
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
         yield db
 
@@ -357,7 +374,10 @@ def test_delete_item_not_found(mock_user, client):
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=None)
+        result = MagicMock()
+        result.rowcount = 0
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -367,4 +387,254 @@ def test_delete_item_not_found(mock_user, client):
     assert response.status_code == 404
     assert response.json()["detail"] == "Item not found"
 
-    client.app.dependency_overrides = {}
\ No newline at end of file
+    client.app.dependency_overrides = {}
+
+def _fake_related(related_id: int, name: str):
+    related = MagicMock()
+    related.id = related_id
+    related.name = name
+    related.description = f"{name} description"
+    related.created_at = datetime.now()
+    related.updated_at = datetime.now()
+    return related
+
+
+def test_list_items_expand(client):
+    fake_item = MagicMock()
+    fake_item.id = 1
+    fake_item.material_id = 1
+    fake_item.product_type_id = 2
+    fake_item.width = 100.5
+    fake_item.height = 200.0
+    fake_item.pdf_path = "/path/to/item1.pdf"
+    fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
+    fake_item.material = _fake_related(1, "Wood")
+    fake_item.product_type = _fake_related(2, "Table")
+
+    from app.database import get_db
+
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = [fake_item]
+    execute = AsyncMock(return_value=result)
+
+    async def fake_db():
+        db = MagicMock()
+        db.execute = execute
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    response = client.get("/api/items/?expand=material,product_type")
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body[0]["material"]["name"] == "Wood"
+    assert body[0]["product_type"]["name"] == "Table"
+    # Relations are loaded in the same statement, not per item
+    execute.assert_awaited_once()
+
+    client.app.dependency_overrides = {}
+
+
+def test_get_item_expand_material_only(client):
+    fake_item = MagicMock()
+    fake_item.id = 1
+    fake_item.material_id = 1
+    fake_item.product_type_id = 2
+    fake_item.width = 100.5
+    fake_item.height = 200.0
+    fake_item.pdf_path = None
+    fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
+    fake_item.material = _fake_related(1, "Wood")
+
+    from app.database import get_db
+
+    async def fake_db():
+        db = MagicMock()
+        db.get = AsyncMock(return_value=fake_item)
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    response = client.get("/api/items/1?expand=material")
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["material"]["name"] == "Wood"
+    assert "product_type" not in body
+    assert body["pdf_path"] is None
+
+    client.app.dependency_overrides = {}
+
+
+def test_get_item_without_expand_has_no_nested_objects(client):
+    fake_item = MagicMock()
+    fake_item.id = 1
+    fake_item.material_id = 1
+    fake_item.product_type_id = 1
+    fake_item.width = 100.5
+    fake_item.height = 200.0
+    fake_item.pdf_path = "/path/to/item.pdf"
+    fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
+
+    from app.database import get_db
+
+    async def fake_db():
+        db = MagicMock()
+        db.get = AsyncMock(return_value=fake_item)
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    response = client.get("/api/items/1")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "material" not in response.json()
+    assert "product_type" not in response.json()
+
+    client.app.dependency_overrides = {}
+
+
+def test_get_item_expand_unknown_relation(client):
+    response = client.get("/api/items/1?expand=owner")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "owner" in response.json()["detail"]
+
+
+@patch("app.routers.items.get_current_user")
+def test_update_item_without_update_returning(mock_user, client):
+    mock_user.return_value = {"id": 1}
+
+    fake_item = MagicMock()
+    fake_item.id = 1
+    fake_item.material_id = 1
+    fake_item.product_type_id = 1
+    fake_item.width = 175.0
+    fake_item.height = 200.0
+    fake_item.pdf_path = "/path/to/item.pdf"
+    fake_item.created_at = datetime.now()
+    fake_item.updated_at = datetime.now()
+
+    from app.database import get_db
+
+    # MySQL: UPDATE reports the matched rows, then one SELECT reads the row back
+    update_result = MagicMock()
+    update_result.rowcount = 1
+    select_result = MagicMock()
+    select_result.scalar_one_or_none.return_value = fake_item
+    execute = AsyncMock(side_effect=[update_result, select_result])
+
+    async def fake_db():
+        db = MagicMock()
+        db.get_bind.return_value.dialect.update_returning = False
+        db.execute = execute
+        db.commit = AsyncMock()
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    response = client.put("/api/items/1", json={"width": 175.0})
+
+    assert response.status_code == 200
+    assert response.json()["width"] == 175.0
+    assert execute.await_count == 2
+
+    client.app.dependency_overrides = {}
+
+
+def _versioned_item():
+    fake_item = MagicMock()
+    fake_item.id = 1
+    fake_item.material_id = 1
+    fake_item.product_type_id = 1
+    fake_item.width = 100.5
+    fake_item.height = 200.0
+    fake_item.pdf_path = "/path/to/item.pdf"
+    fake_item.created_at = datetime(2024, 1, 1, 12, 0, 0)
+    fake_item.updated_at = datetime(2024, 1, 2, 12, 0, 0, 250000)
+    return fake_item
+
+
+def test_get_item_validators_and_not_modified(client):
+    from app.database import get_db
+
+    async def fake_db():
+        db = MagicMock()
+        db.get = AsyncMock(return_value=_versioned_item())
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    response = client.get("/api/items/1")
+    etag = response.headers["etag"]
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["last-modified"] == "Tue, 02 Jan 2024 12:00:00 GMT"
+
+    response = client.get("/api/items/1", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    response = client.get(
+        "/api/items/1", headers={"If-Modified-Since": "Tue, 02 Jan 2024 12:00:00 GMT"}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = client.get(
+        "/api/items/1", headers={"If-Modified-Since": "Mon, 01 Jan 2024 12:00:00 GMT"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    client.app.dependency_overrides = {}
+
+
+@patch("app.routers.items.get_current_user")
+def test_update_item_if_match_stale(mock_user, client):
+    mock_user.return_value = {"id": 1}
+
+    from app.database import get_db
+
+    async def fake_db():
+        db = MagicMock()
+        # The conditional UPDATE matches nothing, but the item exists
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
+        db.get = AsyncMock(return_value=_versioned_item())
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    response = client.put(
+        "/api/items/1", json={"width": 150.0}, headers={"If-Match": '"1-1000"'}
+    )
+
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    client.app.dependency_overrides = {}
+
+
+def test_update_item_if_match_round_trip(sqlite_db, client):
+    from app.models import Item, Material, ProductType
+
+    sqlite_db(
+        Material(id=1, name="Wood"),
+        ProductType(id=1, name="Poster"),
+        Item(id=1, material_id=1, product_type_id=1, width=100, height=100),
+    )
+
+    etag = client.get("/api/items/1").headers["etag"]
+
+    response = client.put("/api/items/1", json={"width": 150.0}, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+
+    # A second writer still holding the old ETag loses
+    response = client.put("/api/items/1", json={"width": 175.0}, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert client.get("/api/items/1").json()["width"] == 150.0
@@ -2,6 +2,7 @@ from fastapi import status
 from unittest.mock import AsyncMock, patch, MagicMock
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+import sqlite3
 
 
 @patch("app.routers.materials.get_current_user")
@@ -14,6 +15,7 @@ def test_create_material_success(mock_user, client):
     fake_material.name = "Wood"
     fake_material.description = "Natural wood material"
     fake_material.created_at = datetime.now()
+    fake_material.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -78,12 +80,14 @@ def test_list_materials(client):
     fake_material1.name = "Wood"
     fake_material1.description = "Natural wood material"
     fake_material1.created_at = datetime.now()
+    fake_material1.updated_at = datetime.now()
 
     fake_material2 = MagicMock()
     fake_material2.id = 2
     fake_material2.name = "Metal"
     fake_material2.description = "Steel material"
     fake_material2.created_at = datetime.now()
+    fake_material2.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -112,6 +116,7 @@ def test_get_material_success(client):
     fake_material.name = "Wood"
     fake_material.description = "Natural wood material"
     fake_material.created_at = datetime.now()
+    fake_material.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -158,18 +163,20 @@ def test_update_material_success(mock_user, client):
     fake_material.name = "Wood"
     fake_material.description = "Old description"
     fake_material.created_at = datetime.now()
+    fake_material.updated_at = datetime.now()
 
     from app.database import get_db
 
+    # Row as read back by UPDATE ... RETURNING
+    fake_material.name = 'Oak Wood'
+    fake_material.description = 'Premium oak wood'
+
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_material)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = fake_material
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
-        # Update the fields when refresh is called
-        db.refresh = AsyncMock(side_effect=lambda x: (
-            setattr(x, 'name', 'Oak Wood'),
-            setattr(x, 'description', 'Premium oak wood')
-        ))
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -197,15 +204,19 @@ def test_update_material_partial(mock_user, client):
     fake_material.name = "Wood"
     fake_material.description = "Old description"
     fake_material.created_at = datetime.now()
+    fake_material.updated_at = datetime.now()
 
     from app.database import get_db
 
+    # Row as read back by UPDATE ... RETURNING
+    fake_material.description = 'New description'
+
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_material)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = fake_material
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
-        # Only update the description
-        db.refresh = AsyncMock(side_effect=lambda x: setattr(x, 'description', 'New description'))
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -230,7 +241,10 @@ def test_update_material_not_found(mock_user, client):
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=None)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -251,14 +265,13 @@ def test_update_material_not_found(mock_user, client):
 def test_delete_material_success(mock_user, client):
     mock_user.return_value = {"id": 1}
 
-    fake_material = MagicMock()
-
     from app.database import get_db
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_material)
-        db.delete = AsyncMock()
+        result = MagicMock()
+        result.rowcount = 1
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
         yield db
 
@@ -280,7 +293,10 @@ def test_delete_material_not_found(mock_user, client):
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=None)
+        result = MagicMock()
+        result.rowcount = 0
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -290,4 +306,224 @@ def test_delete_material_not_found(mock_user, client):
     assert response.status_code == 404
     assert response.json()["detail"] == "Material not found"
 
-    client.app.dependency_overrides = {}
\ No newline at end of file
+    client.app.dependency_overrides = {}
+
+def test_list_materials_served_from_cache(client):
+    fake_material = MagicMock()
+    fake_material.id = 1
+    fake_material.name = "Wood"
+    fake_material.description = "Natural wood material"
+    fake_material.created_at = datetime.now()
+    fake_material.updated_at = datetime.now()
+
+    from app.database import get_db
+
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = [fake_material]
+    execute = AsyncMock(return_value=result)
+
+    async def fake_db():
+        db = MagicMock()
+        db.execute = execute
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    first = client.get("/api/materials/")
+    second = client.get("/api/materials/")
+
+    assert first.status_code == status.HTTP_200_OK
+    assert second.json() == first.json()
+    assert second.headers["etag"] == first.headers["etag"]
+    execute.assert_awaited_once()
+
+    client.app.dependency_overrides = {}
+
+
+def test_get_material_not_modified(client):
+    fake_material = MagicMock()
+    fake_material.id = 1
+    fake_material.name = "Wood"
+    fake_material.description = "Natural wood material"
+    fake_material.created_at = datetime.now()
+    fake_material.updated_at = datetime.now()
+
+    from app.database import get_db
+
+    async def fake_db():
+        db = MagicMock()
+        db.get = AsyncMock(return_value=fake_material)
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    etag = client.get("/api/materials/1").headers["etag"]
+    response = client.get("/api/materials/1", headers={"If-None-Match": etag})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    client.app.dependency_overrides = {}
+
+
+@patch("app.routers.materials.get_current_user")
+def test_material_write_invalidates_cache(mock_user, client):
+    mock_user.return_value = {"id": 1}
+
+    fake_material = MagicMock()
+    fake_material.id = 1
+    fake_material.name = "Wood"
+    fake_material.description = "Natural wood material"
+    fake_material.created_at = datetime.now()
+    fake_material.updated_at = datetime.now()
+
+    from app.cache import catalog_cache
+    from app.database import get_db
+
+    get = AsyncMock(return_value=fake_material)
+
+    async def fake_db():
+        db = MagicMock()
+        db.get = get
+        result = MagicMock()
+        result.rowcount = 1
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    client.get("/api/materials/1")
+    version = catalog_cache.version
+    client.delete("/api/materials/1")
+    client.get("/api/materials/1")
+
+    assert catalog_cache.version == version + 1
+    # the read after the delete went back to the database
+    assert get.await_count == 2
+
+    client.app.dependency_overrides = {}
+
+
+@patch("app.routers.materials.get_current_user")
+def test_bulk_upsert_materials(mock_user, client):
+    mock_user.return_value = {"id": 1}
+
+    from app.database import get_db
+
+    existing = MagicMock()
+    existing.scalars.return_value.all.return_value = ["Wood"]
+    ids = MagicMock()
+    ids.tuples.return_value.all.return_value = [("Wood", 1), ("Metal", 2)]
+    execute = AsyncMock(side_effect=[existing, MagicMock(), ids])
+
+    async def fake_db():
+        db = MagicMock()
+        db.execute = execute
+        db.commit = AsyncMock()
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    payload = [
+        {"name": "Metal", "description": "Old steel"},
+        {"name": "Wood", "description": "Oak"},
+        {"name": "Metal", "description": "Steel"},
+        {"name": "x" * 101},
+    ]
+
+    response = client.post("/api/materials/bulk", json=payload)
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["created"] == 1
+    assert body["updated"] == 1
+    assert body["failed"] == 1
+    assert [row["status"] for row in body["results"]] == [
+        "duplicate", "updated", "created", "invalid",
+    ]
+    assert body["results"][2]["id"] == 2
+
+    # existing-name lookup, one multi-row upsert, id lookup
+    assert execute.await_count == 3
+    upsert = str(execute.await_args_list[1].args[0])
+    assert "ON DUPLICATE KEY UPDATE" in upsert
+
+    client.app.dependency_overrides = {}
+
+
+def _case_insensitive_names(tmp_path):
+    # Rebuild the table with a name index that compares like MySQL's
+    # utf8mb4 _ci collations do (case-insensitively)
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateTable
+    from app.models import Material
+
+    ddl = str(CreateTable(Material.__table__).compile(dialect=sqlite.dialect()))
+    with sqlite3.connect(tmp_path / "test.db") as conn:
+        conn.execute("DROP TABLE materials")
+        conn.execute(ddl.replace("name VARCHAR(100) NOT NULL", "name VARCHAR(100) COLLATE NOCASE NOT NULL"))
+
+
+def test_bulk_upsert_matches_names_like_the_unique_index(sqlite_db, client, tmp_path):
+    from app.models import Material
+
+    _case_insensitive_names(tmp_path)
+    sqlite_db(Material(id=1, name="Wood", description="Pine"))
+
+    response = client.post("/api/materials/bulk", json=[
+        {"name": "wood", "description": "Oak"},
+        {"name": "Metal", "description": "Old steel"},
+        {"name": "metal ", "description": "Steel"},
+    ])
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert [(row["status"], row["id"]) for row in body["results"]] == [
+        ("updated", 1), ("duplicate", None), ("created", 2),
+    ]
+    materials = client.get("/api/materials/").json()
+    assert [(m["name"], m["description"]) for m in materials] == [
+        ("Wood", "Oak"), ("metal ", "Steel"),
+    ]
+
+
+def test_bulk_upsert_changes_the_etag_of_updated_rows(sqlite_db, client):
+    from app.models import Material
+
+    sqlite_db(Material(id=1, name="Wood", description="Pine", updated_at=datetime(2024, 1, 1)))
+    before = client.get("/api/materials/1")
+
+    client.post("/api/materials/bulk", json=[{"name": "Wood", "description": "Oak"}])
+    after = client.get("/api/materials/1", headers={"If-None-Match": before.headers["etag"]})
+
+    assert after.status_code == status.HTTP_200_OK
+    assert after.json()["description"] == "Oak"
+    assert after.headers["etag"] != before.headers["etag"]
+    assert after.headers["last-modified"] != before.headers["last-modified"]
+
+
+def test_get_material_validators_from_updated_at(client):
+    fake_material = MagicMock()
+    fake_material.id = 7
+    fake_material.name = "Wood"
+    fake_material.description = None
+    fake_material.created_at = datetime(2024, 1, 1)
+    fake_material.updated_at = datetime(2024, 1, 1, 0, 0, 1)
+
+    from app.database import get_db
+
+    async def fake_db():
+        db = MagicMock()
+        db.get = AsyncMock(return_value=fake_material)
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    response = client.get("/api/materials/7")
+
+    assert response.headers["etag"] == '"7-1704067201000000"'
+    assert response.headers["last-modified"] == "Mon, 01 Jan 2024 00:00:01 GMT"
+
+    client.app.dependency_overrides = {}
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import status
+from prometheus_client import REGISTRY
+
+from app import metrics
+from app.database import get_db
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_record_route_template_and_status(client):
+    labels = {"method": "GET", "route": "/api/items/{item_id}"}
+    responses_before = _sample("http_responses_total", status="404", **labels)
+    latency_before = _sample("http_request_duration_seconds_count", **labels)
+
+    # The fake DB returns no item
+    async def fake_db():
+        db = MagicMock()
+        db.get = AsyncMock(return_value=None)
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+    assert client.get("/api/items/41").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/api/items/42").status_code == status.HTTP_404_NOT_FOUND
+    client.app.dependency_overrides = {}
+
+    assert _sample("http_responses_total", status="404", **labels) == responses_before + 2
+    assert _sample("http_request_duration_seconds_count", **labels) == latency_before + 2
+    assert _sample("http_requests_in_progress", **labels) == 0
+
+
+def test_unknown_paths_share_one_label(client):
+    labels = {"method": "GET", "route": metrics.UNMATCHED_ROUTE, "status": "404"}
+    before = _sample("http_responses_total", **labels)
+
+    client.get("/wp-login.php")
+    client.get("/.env")
+
+    assert _sample("http_responses_total", **labels) == before + 2
+
+
+def test_metrics_endpoint_prometheus_format(client):
+    client.get("/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_responses_total{method="GET",route="/health",status="200"}'
+        in response.text
+    )
+    assert "event_loop_lag_seconds_bucket" in response.text
+
+
+def test_loop_lag_monitor_sees_blocked_loop():
+    async def run():
+        monitor = asyncio.create_task(metrics.monitor_event_loop_lag(interval=0.01))
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)  # block the loop
+        await asyncio.sleep(0.02)
+        monitor.cancel()
+
+    count_before = _sample("event_loop_lag_seconds_count")
+    sum_before = _sample("event_loop_lag_seconds_sum")
+    asyncio.run(run())
+
+    assert _sample("event_loop_lag_seconds_count") > count_before
+    assert _sample("event_loop_lag_seconds_sum") - sum_before >= 0.05
+    assert metrics.current_loop_lag() >= 0
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+from alembic import command
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.migrate import (
+    BASELINE_REVISION,
+    alembic_config,
+    current_revision,
+    ensure_schema_current,
+    head_revision,
+    upgrade,
+)
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'migrate.db'}"
+
+
+def _run(url, check):
+    async def run():
+        engine = create_async_engine(url, poolclass=NullPool)
+        try:
+            return await check(engine)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_upgrade_brings_empty_database_to_head(database_url):
+    upgrade(database_url)
+
+    assert _run(database_url, current_revision) == head_revision()
+    _run(database_url, ensure_schema_current)
+
+
+def test_startup_check_rejects_unmigrated_database(database_url):
+    with pytest.raises(RuntimeError, match="python -m app.migrate"):
+        _run(database_url, ensure_schema_current)
+
+
+def test_upgrade_adopts_schema_created_by_create_all(database_url):
+    # What create_all-on-boot used to leave behind: the 0001 tables, no version table
+    command.upgrade(alembic_config(database_url), BASELINE_REVISION)
+
+    async def drop_version_table(engine):
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE alembic_version"))
+
+    _run(database_url, drop_version_table)
+
+    upgrade(database_url)
+
+    assert _run(database_url, current_revision) == head_revision()
@@ -14,6 +14,7 @@ def test_create_product_type_success(mock_user, client):
     fake_product_type.name = "Poster"
     fake_product_type.description = "Wall poster product"
     fake_product_type.created_at = datetime.now()
+    fake_product_type.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -78,12 +79,14 @@ def test_list_product_types(client):
     fake_product_type1.name = "Poster"
     fake_product_type1.description = "Wall poster product"
     fake_product_type1.created_at = datetime.now()
+    fake_product_type1.updated_at = datetime.now()
 
     fake_product_type2 = MagicMock()
     fake_product_type2.id = 2
     fake_product_type2.name = "Canvas"
     fake_product_type2.description = "Canvas print product"
     fake_product_type2.created_at = datetime.now()
+    fake_product_type2.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -112,6 +115,7 @@ def test_get_product_type_success(client):
     fake_product_type.name = "Poster"
     fake_product_type.description = "Wall poster product"
     fake_product_type.created_at = datetime.now()
+    fake_product_type.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -158,18 +162,20 @@ def test_update_product_type_success(mock_user, client):
     fake_product_type.name = "Poster"
     fake_product_type.description = "Old description"
     fake_product_type.created_at = datetime.now()
+    fake_product_type.updated_at = datetime.now()
 
     from app.database import get_db
 
+    # Row as read back by UPDATE ... RETURNING
+    fake_product_type.name = 'Premium Poster'
+    fake_product_type.description = 'High quality wall poster'
+
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_product_type)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = fake_product_type
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
-        # Update the fields when refresh is called
-        db.refresh = AsyncMock(side_effect=lambda x: (
-            setattr(x, 'name', 'Premium Poster'),
-            setattr(x, 'description', 'High quality wall poster')
-        ))
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -197,15 +203,19 @@ def test_update_product_type_partial(mock_user, client):
     fake_product_type.name = "Poster"
     fake_product_type.description = "Old description"
     fake_product_type.created_at = datetime.now()
+    fake_product_type.updated_at = datetime.now()
 
     from app.database import get_db
 
+    # Row as read back by UPDATE ... RETURNING
+    fake_product_type.description = 'Updated description'
+
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_product_type)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = fake_product_type
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
-        # Only update the description
-        db.refresh = AsyncMock(side_effect=lambda x: setattr(x, 'description', 'Updated description'))
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -230,7 +240,10 @@ def test_update_product_type_not_found(mock_user, client):
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=None)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -251,14 +264,13 @@ def test_update_product_type_not_found(mock_user, client):
 def test_delete_product_type_success(mock_user, client):
     mock_user.return_value = {"id": 1}
 
-    fake_product_type = MagicMock()
-
     from app.database import get_db
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_product_type)
-        db.delete = AsyncMock()
+        result = MagicMock()
+        result.rowcount = 1
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
         yield db
 
@@ -280,7 +292,10 @@ def test_delete_product_type_not_found(mock_user, client):
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=None)
+        result = MagicMock()
+        result.rowcount = 0
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -290,4 +305,39 @@ def test_delete_product_type_not_found(mock_user, client):
     assert response.status_code == 404
     assert response.json()["detail"] == "Product type not found"
 
-    client.app.dependency_overrides = {}
\ No newline at end of file
+    client.app.dependency_overrides = {}
+
+@patch("app.routers.product_types.get_current_user")
+def test_bulk_upsert_product_types(mock_user, client):
+    mock_user.return_value = {"id": 1}
+
+    from app.database import get_db
+
+    existing = MagicMock()
+    existing.scalars.return_value.all.return_value = []
+    ids = MagicMock()
+    ids.tuples.return_value.all.return_value = [("Poster", 1), ("Canvas", 2)]
+    execute = AsyncMock(side_effect=[existing, MagicMock(), ids])
+
+    async def fake_db():
+        db = MagicMock()
+        db.execute = execute
+        db.commit = AsyncMock()
+        yield db
+
+    client.app.dependency_overrides[get_db] = fake_db
+
+    payload = [
+        {"name": "Poster", "description": "Wall poster"},
+        {"name": "Canvas"},
+    ]
+
+    response = client.post("/api/product-types/bulk", json=payload)
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["created"] == 2
+    assert body["updated"] == 0
+    assert [row["id"] for row in body["results"]] == [1, 2]
+
+    client.app.dependency_overrides = {}
@@ -0,0 +1,109 @@
+import pstats
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import status
+
+from app import profiling
+from app.models import Material, ProductType, User
+
+OPERATOR = User(id=1, username="testuser", email="test@test.com", hashed_password="x")
+
+
+@pytest.fixture
+def profiling_enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILING_OPERATORS", {"testuser"})
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "profile_gate", profiling.ProfileGate())
+    return tmp_path
+
+
+def test_profile_header_ignored_by_default(client):
+    response = client.get("/health", headers={"X-Profile": "1"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "x-profile-location" not in response.headers
+    assert "x-profile-status" not in response.headers
+
+
+@patch("app.profiling.profiling_operator", new_callable=AsyncMock)
+def test_operator_request_is_profiled(mock_operator, profiling_enabled, client):
+    mock_operator.return_value = OPERATOR
+
+    response = client.get("/health", headers={"X-Profile": "1"})
+
+    assert response.status_code == status.HTTP_200_OK
+    location = response.headers["x-profile-location"]
+    name = location.rsplit("/", 1)[1]
+    assert location.startswith("/api/profiles/") and "-GET-health-" in name
+
+    stats = pstats.Stats(str(profiling_enabled / name))
+    assert any(func[2] == "health_check" for func in stats.stats)
+
+    download = client.get(location)
+    assert download.status_code == status.HTTP_200_OK
+    assert client.get("/api/profiles/").json() == [name]
+
+
+def render_in_thread(width, height, item_id):
+    return f"/pdfs/{item_id}.pdf"
+
+
+@patch("app.routers.items.crop_and_create_pdf", render_in_thread)
+@patch("app.profiling.profiling_operator", new_callable=AsyncMock)
+def test_profile_includes_renders(mock_operator, profiling_enabled, sqlite_db, client):
+    mock_operator.return_value = OPERATOR
+    sqlite_db(Material(id=1, name="Wood"), ProductType(id=1, name="Poster"))
+
+    response = client.post(
+        "/api/items/",
+        json={"material_id": 1, "product_type_id": 1, "width": 10.0, "height": 5.0},
+        headers={"X-Profile": "1"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    name = response.headers["x-profile-location"].rsplit("/", 1)[1]
+    stats = pstats.Stats(str(profiling_enabled / name))
+    # run by the render pool, not the thread the request was profiled in
+    assert any(func[2] == "render_in_thread" for func in stats.stats)
+    assert any(func[2] == "create_item" for func in stats.stats)
+
+
+@patch("app.profiling.profiling_operator", new_callable=AsyncMock)
+def test_profiling_is_rate_limited(mock_operator, profiling_enabled, client):
+    mock_operator.return_value = OPERATOR
+
+    first = client.get("/health", headers={"X-Profile": "1"})
+    second = client.get("/health", headers={"X-Profile": "1"})
+
+    assert "x-profile-location" in first.headers
+    assert second.status_code == status.HTTP_200_OK
+    assert second.headers["x-profile-status"] == "rate-limited"
+    assert len(list(profiling_enabled.iterdir())) == 1
+
+
+@patch("app.profiling.profiling_operator", new_callable=AsyncMock)
+def test_non_operator_not_profiled(mock_operator, profiling_enabled, client):
+    mock_operator.return_value = None
+
+    response = client.get("/health", headers={"X-Profile": "1"})
+
+    assert response.headers["x-profile-status"] == "forbidden"
+    assert list(profiling_enabled.iterdir()) == []
+
+
+def test_profile_download_rejects_other_paths(profiling_enabled, client):
+    (profiling_enabled.parent / "secret.prof").write_bytes(b"x")
+
+    response = client.get("/api/profiles/..%2Fsecret.prof")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_profile_download_requires_operator(profiling_enabled, monkeypatch, client):
+    monkeypatch.setattr(profiling, "PROFILING_OPERATORS", {"someone-else"})
+
+    response = client.get("/api/profiles/")
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,80 @@
+from fastapi import status
+
+from app.models import Item, Material, ProductType
+
+
+def _seed_catalog(seed, items: int = 5):
+    seed(
+        Material(id=1, name="Wood"),
+        Material(id=2, name="Metal"),
+        ProductType(id=1, name="Poster"),
+        ProductType(id=2, name="Canvas"),
+        *[
+            Item(
+                id=i,
+                material_id=i % 2 + 1,
+                product_type_id=(i + 1) % 2 + 1,
+                width=100,
+                height=100,
+            )
+            for i in range(1, items + 1)
+        ],
+    )
+
+
+def test_list_items_expand_single_query(sqlite_db, max_queries, client):
+    _seed_catalog(sqlite_db, items=20)
+
+    response = client.get("/api/items/?expand=material,product_type")
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert len(body) == 20
+    assert body[0]["material"]["name"] == "Metal"
+    assert body[0]["product_type"]["name"] == "Poster"
+    max_queries(response, 1)
+
+
+def test_get_item_expand_single_query(sqlite_db, max_queries, client):
+    _seed_catalog(sqlite_db)
+
+    response = client.get("/api/items/3?expand=material")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["material"]["name"] == "Metal"
+    max_queries(response, 1)
+
+
+def test_update_material_single_round_trip(sqlite_db, max_queries, client):
+    _seed_catalog(sqlite_db)
+
+    response = client.put("/api/materials/1", json={"description": "Oak"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["name"] == "Wood"
+    assert response.json()["description"] == "Oak"
+    # the UPDATE, plus its change feed row in the same transaction
+    max_queries(response, 2)
+
+
+def test_delete_item_single_round_trip(sqlite_db, max_queries, client):
+    _seed_catalog(sqlite_db)
+
+    response = client.delete("/api/items/1")
+    assert response.status_code == status.HTTP_200_OK
+    # the DELETE, plus its change feed row in the same transaction
+    max_queries(response, 2)
+
+    response = client.delete("/api/items/1")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_cached_catalog_read_runs_no_queries(sqlite_db, max_queries, client):
+    _seed_catalog(sqlite_db)
+
+    first = client.get("/api/materials/")
+    second = client.get("/api/materials/")
+
+    assert second.json() == first.json()
+    max_queries(first, 1)
+    max_queries(second, 0)
@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Item, Material
+from app.schemas import ItemExpandedOut, ItemOut, UserOut
+from app.models import User
+from app.serialization import dumps, orm_to_dict
+
+
+def _pydantic_json(obj, schema, **kwargs):
+    return json.loads(json.dumps(jsonable_encoder(schema.from_orm(obj), **kwargs)))
+
+
+def test_orm_to_dict_matches_pydantic_output():
+    item = Item(
+        id=1,
+        material_id=1,
+        product_type_id=2,
+        width=100.5,
+        height=200,
+        pdf_path=None,
+        created_at=datetime(2024, 1, 12, 14, 30, 45, 123456),
+    )
+
+    fast = json.loads(dumps(orm_to_dict(item, ItemOut)))
+
+    assert fast == _pydantic_json(item, ItemOut)
+
+
+def test_orm_to_dict_nested_and_excluded_relations():
+    material = Material(id=1, name="Wood", description=None, created_at=datetime(2024, 1, 1))
+    item = Item(
+        id=1,
+        material_id=1,
+        product_type_id=2,
+        width=1.0,
+        height=2.0,
+        created_at=datetime(2024, 1, 2),
+        material=material,
+    )
+
+    data = json.loads(dumps(orm_to_dict(item, ItemExpandedOut, exclude={"product_type"})))
+
+    assert data["material"] == {
+        "id": 1,
+        "name": "Wood",
+        "description": None,
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": None,
+    }
+    assert "product_type" not in data
+
+
+def test_orm_to_dict_only_exposes_schema_fields():
+    user = User(
+        id=1,
+        username="john",
+        email="john@test.com",
+        hashed_password="secret",
+        is_active=True,
+        created_at=datetime(2024, 1, 1),
+    )
+
+    data = orm_to_dict(user, UserOut)
+
+    assert "hashed_password" not in data
+    assert json.loads(dumps(data)) == _pydantic_json(user, UserOut)
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import bulk_import, image_processor
+from app.bulk_import import ImportJob, drain_import_jobs, get_job, resume_journaled_jobs
+from app.database import Base
+from app.models import Item, Material, ProductType
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+@pytest.fixture
+def pdf_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_processor, "OUTPUT_DIR", str(tmp_path / "pdfs"))
+    monkeypatch.setattr(
+        image_processor, "STATIC_IMAGE_PATH", os.path.abspath(image_processor.STATIC_IMAGE_PATH)
+    )
+    return tmp_path / "pdfs"
+
+
+def test_pdf_is_renamed_into_place(pdf_dir):
+    pdf_path = image_processor.crop_and_create_pdf(width=100, height=50, item_id=1)
+
+    assert os.listdir(pdf_dir) == [os.path.basename(pdf_path)]
+    assert open(pdf_path, "rb").read(5) == b"%PDF-"
+    # not mkstemp's 0600: readable by others (e.g. a static file server) as the umask allows
+    assert os.stat(pdf_path).st_mode & 0o777 == 0o666 & ~_umask()
+
+
+def test_failed_render_leaves_no_file(pdf_dir):
+    with patch("reportlab.pdfgen.canvas.Canvas.save", side_effect=RuntimeError("killed")):
+        with pytest.raises(RuntimeError):
+            image_processor.crop_and_create_pdf(width=100, height=50, item_id=1)
+
+    assert os.listdir(pdf_dir) == []
+
+
+def test_stale_partial_pdfs_are_removed(pdf_dir):
+    os.makedirs(pdf_dir)
+    stale = pdf_dir / f".a{image_processor.PARTIAL_SUFFIX}"
+    fresh = pdf_dir / f".b{image_processor.PARTIAL_SUFFIX}"
+    stale.write_bytes(b"%PDF")
+    fresh.write_bytes(b"%PDF")
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+    assert image_processor.remove_partial_pdfs(older_than=3600) == 1
+    assert os.listdir(pdf_dir) == [fresh.name]
+
+
+@patch("app.bulk_import.crop_and_create_pdf")
+def test_unfinished_renders_resume_after_restart(mock_render, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "RENDER_JOURNAL_DIR", str(tmp_path / "journal"))
+    monkeypatch.setattr(bulk_import, "IMPORT_RENDER_CONCURRENCY", 1)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'shutdown.db'}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    items = [Item(id=n, material_id=1, product_type_id=1, width=n, height=1.0) for n in range(1, 6)]
+
+    def slow_render(width, height, item_id):
+        time.sleep(0.05)
+        return f"/pdfs/{item_id}.pdf"
+
+    mock_render.side_effect = slow_render
+
+    async def shutdown():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add_all([Material(id=1, name="Wood"), ProductType(id=1, name="Poster"), *items])
+            await db.commit()
+
+        job = ImportJob(user_id=1, rows=5, created=5)
+        bulk_import.register_job(job)
+        job.start_rendering(sessions)
+        job.render(items)
+        job.finish_importing()
+        await asyncio.sleep(0.01)
+        # the render already running is finished; the queued ones are journaled
+        return job, await drain_import_jobs(timeout=5)
+
+    async def restart():
+        bulk_import._jobs.clear()
+        resumed = resume_journaled_jobs(sessions)
+        await asyncio.gather(*(job.wait() for job in resumed))
+        async with sessions() as db:
+            paths = (await db.execute(select(Item.pdf_path).order_by(Item.id))).scalars().all()
+        await engine.dispose()
+        return resumed, paths
+
+    job, journals = asyncio.run(shutdown())
+    assert job.rendered == 1
+    assert [os.path.basename(path) for path in journals] == [f"{job.id}.json"]
+
+    resumed, paths = asyncio.run(restart())
+
+    assert [j.id for j in resumed] == [job.id]
+    assert get_job(job.id, user_id=1).as_dict()["state"] == "done"
+    assert (resumed[0].rendered, resumed[0].created) == (5, 5)
+    assert paths == [f"/pdfs/{n}.pdf" for n in range(1, 6)]
+    assert os.listdir(tmp_path / "journal") == []
+
+
+def _dead_pid():
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    return child.pid
+
+
+@patch("app.bulk_import.crop_and_create_pdf")
+def test_journal_of_worker_that_died_resuming_is_reclaimed(mock_render, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "RENDER_JOURNAL_DIR", str(tmp_path / "journal"))
+    mock_render.return_value = "/pdfs/1.pdf"
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'shutdown.db'}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    def journal_claimed_by(pid):
+        job = ImportJob(user_id=1, rows=1, created=1)
+        job._renders = asyncio.Queue()
+        job._renders.put_nowait((1, 1.0, 1.0))
+        claimed = f"{job.write_journal()}.{pid}"
+        os.rename(claimed.rpartition(".")[0], claimed)
+        return job, claimed
+
+    dead, _ = journal_claimed_by(_dead_pid())
+    # still being resumed by a live worker
+    _, live_claim = journal_claimed_by(os.getppid())
+
+    async def restart():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add_all([
+                Material(id=1, name="Wood"),
+                ProductType(id=1, name="Poster"),
+                Item(id=1, material_id=1, product_type_id=1, width=1.0, height=1.0),
+            ])
+            await db.commit()
+        resumed = resume_journaled_jobs(sessions)
+        await asyncio.gather(*(job.wait() for job in resumed))
+        await engine.dispose()
+        return resumed
+
+    try:
+        resumed = asyncio.run(restart())
+    finally:
+        bulk_import._jobs.clear()
+
+    assert [job.id for job in resumed] == [dead.id]
+    assert resumed[0].rendered == 1
+    assert os.listdir(tmp_path / "journal") == [os.path.basename(live_claim)]
@@ -0,0 +1,197 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+from fastapi import HTTPException, status
+
+from app.cache import catalog_cache
+from app.database import get_db
+from app.main import app
+from app.singleflight import SingleFlight, item_writes
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def load(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return {"value": value}
+
+    async def run():
+        same = [flight.do(("test", 1), lambda: load(1)) for _ in range(50)]
+        other = flight.do(("test", 2), lambda: load(2))
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(run())
+
+    assert sorted(calls) == [1, 2]
+    assert all(result is results[0] for result in results[:50])
+    assert results[50] == {"value": 2}
+    assert flight.in_flight() == 0
+
+
+def test_exception_is_shared():
+    flight = SingleFlight()
+    calls = []
+
+    async def missing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise HTTPException(404, "Item not found")
+
+    async def run():
+        return await asyncio.gather(
+            *[flight.do(("test",), missing) for _ in range(5)], return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert calls == [1]
+    assert all(isinstance(r, HTTPException) and r.status_code == 404 for r in results)
+
+
+def test_followers_survive_cancelled_leader():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "loaded"
+
+    async def run():
+        leader = asyncio.create_task(flight.do(("test",), load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do(("test",), load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "loaded"
+    assert calls == [1, 1]
+
+
+def _gather_gets(path, n=20):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[client.get(path) for _ in range(n)])
+
+    return asyncio.run(run())
+
+
+def test_concurrent_get_item_runs_one_query():
+    fake_item = MagicMock()
+    fake_item.id = 1
+    fake_item.material_id = 1
+    fake_item.product_type_id = 1
+    fake_item.width = 100.0
+    fake_item.height = 100.0
+    fake_item.pdf_path = None
+    fake_item.created_at = datetime(2024, 1, 1)
+    fake_item.updated_at = datetime(2024, 1, 1)
+
+    async def slow_get(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return fake_item
+
+    db_get = AsyncMock(side_effect=slow_get)
+
+    async def fake_db():
+        db = MagicMock()
+        db.get = db_get
+        yield db
+
+    app.dependency_overrides[get_db] = fake_db
+
+    responses = _gather_gets("/api/items/1")
+
+    assert all(r.status_code == status.HTTP_200_OK for r in responses)
+    assert len({r.content for r in responses}) == 1
+    assert db_get.await_count == 1
+
+
+def test_get_item_after_a_write_does_not_join_an_older_read():
+    def item_version(width, updated_at):
+        item = MagicMock()
+        item.id = 1
+        item.material_id = 1
+        item.product_type_id = 1
+        item.width = width
+        item.height = 100.0
+        item.pdf_path = None
+        item.created_at = datetime(2024, 1, 1)
+        item.updated_at = updated_at
+        return item
+
+    versions = iter([
+        item_version(100.0, datetime(2024, 1, 1)),
+        item_version(200.0, datetime(2024, 1, 2)),
+    ])
+
+    async def slow_get(*args, **kwargs):
+        item = next(versions)
+        await asyncio.sleep(0.05)
+        return item
+
+    db_get = AsyncMock(side_effect=slow_get)
+
+    async def fake_db():
+        db = MagicMock()
+        db.get = db_get
+        yield db
+
+    app.dependency_overrides[get_db] = fake_db
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            before = asyncio.create_task(client.get("/api/items/1"))
+            await asyncio.sleep(0.01)
+            # a PUT committed while the first read is in flight
+            item_writes.bump()
+            return await asyncio.gather(before, client.get("/api/items/1"))
+
+    before, after = asyncio.run(run())
+
+    assert db_get.await_count == 2
+    assert after.json()["width"] == 200.0
+    assert after.headers["etag"] != before.headers["etag"]
+
+
+def test_concurrent_catalog_misses_share_one_query_without_cache(monkeypatch):
+    # TTL 0: nothing is ever served from the cache, only coalesced
+    monkeypatch.setattr(catalog_cache, "ttl", 0)
+    material = MagicMock()
+    material.id = 1
+    material.name = "Wood"
+    material.description = None
+    material.created_at = datetime(2024, 1, 1)
+    material.updated_at = datetime(2024, 1, 1)
+
+    async def slow_execute(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = [material]
+        return result
+
+    db_execute = AsyncMock(side_effect=slow_execute)
+
+    async def fake_db():
+        db = MagicMock()
+        db.execute = db_execute
+        yield db
+
+    app.dependency_overrides[get_db] = fake_db
+
+    responses = _gather_gets("/api/materials/")
+
+    assert all(r.json()[0]["name"] == "Wood" for r in responses)
+    assert db_execute.await_count == 1
+
+    # Once the flight is over, the next request loads again
+    _gather_gets("/api/materials/", n=1)
+    assert db_execute.await_count == 2
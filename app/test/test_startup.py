@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from benchmarks.startup import forbidden_imports, measure
+
+
+def test_import_app_main_defers_heavy_imports():
+    # The time budget is checked by `python -m benchmarks.startup`: a single
+    # wall-clock run is too noisy for the test suite
+    assert forbidden_imports(measure()) == []
+
+
+def test_render_loads_pillow_and_reportlab_on_demand(tmp_path):
+    # A fresh interpreter: the test session itself has loaded both long ago
+    script = textwrap.dedent(f"""
+        import sys
+
+        import app.main
+        from app import image_processor
+
+        assert "PIL" not in sys.modules and "reportlab" not in sys.modules
+
+        image_processor.OUTPUT_DIR = {str(tmp_path)!r}
+        pdf_path = image_processor.crop_and_create_pdf(width=50, height=40, item_id=1)
+
+        assert "PIL" in sys.modules and "reportlab" in sys.modules
+        with open(pdf_path, "rb") as pdf:
+            assert pdf.read(5) == b"%PDF-"
+    """)
+
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+
+    assert result.returncode == 0, result.stderr
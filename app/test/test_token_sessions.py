@@ -112,19 +112,16 @@ def test_get_token_session_not_found_when_other_user(client):
 def test_update_token_session_success(client):
     client.app.dependency_overrides[get_current_user] = lambda: _fake_user(1)
 
+    # Row as read back by UPDATE ... RETURNING
     s = _fake_session(1, user_id=1)
+    s.revoked = True
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=s)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = s
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
-
-        async def refresh_side_effect(obj):
-            # simulate values after update
-            # obj.revoked and obj.expires_at already mutated in endpoint
-            return None
-
-        db.refresh = AsyncMock(side_effect=refresh_side_effect)
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -149,11 +146,15 @@ def test_update_token_session_success(client):
 def test_update_token_session_not_found_when_other_user(client):
     client.app.dependency_overrides[get_current_user] = lambda: _fake_user(1)
 
-    s = _fake_session(1, user_id=2)
+    # session 1 belongs to user 2, so the owner-scoped UPDATE matches nothing
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = None
+    execute = AsyncMock(return_value=result)
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=s)
+        db.execute = execute
+        db.commit = AsyncMock()
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -162,6 +163,7 @@ def test_update_token_session_not_found_when_other_user(client):
 
     assert response.status_code == 404
     assert response.json()["detail"] == "Token session not found"
+    assert "token_sessions.user_id" in str(execute.await_args.args[0])
 
     client.app.dependency_overrides = {}
 
@@ -169,12 +171,11 @@ def test_update_token_session_not_found_when_other_user(client):
 def test_delete_token_session_success(client):
     client.app.dependency_overrides[get_current_user] = lambda: _fake_user(1)
 
-    s = _fake_session(1, user_id=1)
-
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=s)
-        db.delete = AsyncMock()
+        result = MagicMock()
+        result.rowcount = 1
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
         yield db
 
@@ -193,7 +194,10 @@ def test_delete_token_session_not_found(client):
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=None)
+        result = MagicMock()
+        result.rowcount = 0
+        db.execute = AsyncMock(return_value=result)
+        db.commit = AsyncMock()
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -15,6 +15,7 @@ def test_create_user_success(mock_hash, client):
     fake_user.email = "john@test.com"
     fake_user.is_active = True
     fake_user.created_at = datetime.now()
+    fake_user.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -85,6 +86,7 @@ def test_list_users(mock_user, client):
     fake_user.email = "john@test.com"
     fake_user.is_active = True
     fake_user.created_at = datetime.now()
+    fake_user.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -115,6 +117,7 @@ def test_get_user_success(mock_user, client):
     fake_user.email = "john@test.com"
     fake_user.is_active = True
     fake_user.created_at = datetime.now()
+    fake_user.updated_at = datetime.now()
 
     from app.database import get_db
 
@@ -163,15 +166,19 @@ def test_update_user_success(mock_user, client):
     fake_user.email = "old@test.com"
     fake_user.is_active = True
     fake_user.created_at = datetime.now()
+    fake_user.updated_at = datetime.now()
 
     from app.database import get_db
 
+    # Row as read back by UPDATE ... RETURNING
+    fake_user.email = 'new@test.com'
+
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_user)
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = fake_user
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
-        # Update the email when refresh is called
-        db.refresh = AsyncMock(side_effect=lambda x: setattr(x, 'email', 'new@test.com'))
         yield db
 
     client.app.dependency_overrides[get_db] = fake_db
@@ -190,14 +197,13 @@ def test_update_user_success(mock_user, client):
 def test_delete_user_success(mock_user, client):
     mock_user.return_value = {"id": 1}
 
-    fake_user = MagicMock()
-
     from app.database import get_db
 
     async def fake_db():
         db = MagicMock()
-        db.get = AsyncMock(return_value=fake_user)
-        db.delete = AsyncMock()
+        result = MagicMock()
+        result.rowcount = 1
+        db.execute = AsyncMock(return_value=result)
         db.commit = AsyncMock()
         yield db
 
@@ -208,4 +214,38 @@ def test_delete_user_success(mock_user, client):
     assert response.status_code == 200
     assert response.json()["detail"] == "User deleted successfully"
 
-    client.app.dependency_overrides = {}
\ No newline at end of file
+    client.app.dependency_overrides = {}
+
+def _users(*names):
+    from app.models import User
+
+    return [
+        User(id=n, username=name, email=f"{name}@test.com", hashed_password="hashed")
+        for n, name in enumerate(names, start=1)
+    ]
+
+
+def test_list_users_prefix_search(sqlite_db, client):
+    sqlite_db(*_users("john", "joanna", "a_b", "axb", "mary"))
+
+    def usernames(q):
+        return [user["username"] for user in client.get("/api/users/", params={"q": q}).json()]
+
+    assert usernames("jo") == ["john", "joanna"]
+    assert usernames("mary@") == ["mary"]
+    # LIKE wildcards typed by the user are matched literally
+    assert usernames("a_") == ["a_b"]
+    assert usernames("%") == []
+
+
+def test_list_users_keyset_pages(sqlite_db, client):
+    sqlite_db(*_users("ann", "bob", "cid", "dan", "eve"))
+
+    pages, url = [], "/api/users/?limit=2"
+    while url:
+        response = client.get(url)
+        pages.append([user["id"] for user in response.json()])
+        url = response.links.get("next", {}).get("url")
+
+    assert pages == [[1, 2], [3, 4], [5]]
+    assert client.get("/api/users/?limit=1000").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+
+import httpx
+from prometheus_client import REGISTRY
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.metrics import MetricsMiddleware
+from app.watchdog import LoopWatchdog
+
+
+async def blocking_handler(request):
+    time.sleep(0.3)  # e.g. bcrypt or Pillow called straight from async code
+    return PlainTextResponse("done")
+
+
+async def polite_handler(request):
+    await asyncio.sleep(0.3)
+    return PlainTextResponse("done")
+
+
+blocking_app = Starlette(
+    routes=[
+        Route("/slow/{item_id}", blocking_handler),
+        Route("/polite", polite_handler),
+    ],
+    middleware=[Middleware(MetricsMiddleware)],
+)
+
+
+def _stalls(route):
+    return REGISTRY.get_sample_value("event_loop_stalls_total", {"route": route}) or 0.0
+
+
+def _run_with_watchdog(path):
+    async def run():
+        watchdog = LoopWatchdog(threshold=0.1, interval=0.02)
+        watchdog.start()
+        transport = httpx.ASGITransport(app=blocking_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get(path)
+        await asyncio.sleep(0.1)  # let the watchdog see the loop recover
+        watchdog.stop()
+        return response
+
+    return asyncio.run(run())
+
+
+def test_watchdog_reports_blocking_handler(caplog):
+    before = _stalls("/slow/{item_id}")
+
+    with caplog.at_level(logging.ERROR, logger="app.watchdog"):
+        response = _run_with_watchdog("/slow/1")
+
+    assert response.text == "done"
+    assert _stalls("/slow/{item_id}") == before + 1
+    [record] = [r for r in caplog.records if r.levelno == logging.ERROR]
+    assert "in /slow/{item_id}" in record.getMessage()
+    assert "blocking_handler" in record.getMessage()
+    assert "time.sleep(0.3)" in record.getMessage()
+
+
+def test_watchdog_ignores_awaiting_handler(caplog):
+    before = _stalls("/polite")
+
+    with caplog.at_level(logging.WARNING, logger="app.watchdog"):
+        _run_with_watchdog("/polite")
+
+    assert _stalls("/polite") == before
+    assert caplog.records == []
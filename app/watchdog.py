@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from prometheus_client import Counter, Histogram
+
+from app.metrics import task_route
+
+# ================= CONFIG =================
+
+# A stall is the event loop not getting back to its own callbacks for this
+# long, i.e. some coroutine ran this long without awaiting. 0 disables.
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "250"))
+STALL_STACK_LIMIT = 40
+
+logger = logging.getLogger("app.watchdog")
+
+LOOP_STALLS = Counter(
+    "event_loop_stalls",
+    "Event-loop stalls longer than LOOP_STALL_THRESHOLD_MS, by route",
+    ["route"],
+)
+LOOP_STALL_DURATION = Histogram(
+    "event_loop_stall_seconds",
+    "Duration of detected event-loop stalls",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+class LoopWatchdog:
+    """
+    Detects coroutines that block the event loop.
+
+    The loop bumps a heartbeat every `interval` seconds from a plain
+    call_later callback; a daemon thread checks it at the same rate. When
+    the heartbeat is older than `threshold`, the thread grabs the loop
+    thread's current stack (which is the blocking code itself), logs it
+    with the route of the running task and counts the stall. Both sides
+    only touch a float per tick, so it is cheap enough to stay on.
+    """
+
+    def __init__(self, threshold: float, interval: Optional[float] = None):
+        self.threshold = threshold
+        self.interval = interval or min(threshold / 4, 0.1)
+        self._heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start watching the running loop; call from the loop's thread."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _beat(self) -> None:
+        self._heartbeat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self) -> None:
+        stalled_since = None
+        while not self._stop.wait(self.interval):
+            heartbeat = self._heartbeat
+            if stalled_since is not None and heartbeat != stalled_since:
+                # the loop came back
+                duration = heartbeat - stalled_since - self.interval
+                LOOP_STALL_DURATION.observe(duration)
+                logger.warning("Event loop unblocked after %.0f ms", duration * 1000)
+                stalled_since = None
+
+            late = time.monotonic() - heartbeat - self.interval
+            if stalled_since is None and late >= self.threshold:
+                stalled_since = heartbeat
+                self._report(late)
+
+    def _report(self, late: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = (
+            "".join(traceback.format_stack(frame, limit=STALL_STACK_LIMIT))
+            if frame is not None
+            else "<unavailable>\n"
+        )
+        # Reading the loop's current task from here is a plain dict lookup
+        route = task_route(asyncio.current_task(self._loop)) or "<no request>"
+
+        LOOP_STALLS.labels(route).inc()
+        logger.error(
+            "Event loop blocked for %.0f ms+ in %s; blocking stack:\n%s",
+            late * 1000,
+            route,
+            stack,
+        )
+
+
+def start_watchdog() -> Optional[LoopWatchdog]:
+    if LOOP_STALL_THRESHOLD_MS <= 0:
+        return None
+    watchdog = LoopWatchdog(LOOP_STALL_THRESHOLD_MS / 1000)
+    watchdog.start()
+    return watchdog
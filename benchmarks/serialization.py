@@ -0,0 +1,75 @@
+"""
+Compare the two ways a list endpoint can serialize ORM rows:
+
+  pydantic  ItemOut.from_orm per row -> jsonable_encoder -> json.dumps
+            (what FastAPI does for a response_model with JSONResponse)
+  fast      orm_to_dict per row -> orjson.dumps (app.serialization)
+
+Run from the project root:
+
+    DATABASE_URL=sqlite+aiosqlite:// python -m benchmarks.serialization [rows]
+"""
+import json
+import sys
+import time
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Item
+from app.schemas import ItemOut
+from app.serialization import dumps, orm_to_dict
+
+
+def make_items(count: int) -> list[Item]:
+    now = datetime.utcnow()
+    return [
+        Item(
+            id=i,
+            material_id=i % 7 + 1,
+            product_type_id=i % 5 + 1,
+            width=100.0 + i,
+            height=200.5,
+            pdf_path=f"app/storage/pdfs/item_{i}_2024-01-12_14-30-45.pdf",
+            created_at=now,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def pydantic_path(items: list[Item]) -> bytes:
+    content = jsonable_encoder([ItemOut.from_orm(item) for item in items])
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fast_path(items: list[Item]) -> bytes:
+    return dumps([orm_to_dict(item, ItemOut) for item in items])
+
+
+def best_of(fn, items, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(items)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    items = make_items(count)
+
+    assert json.loads(pydantic_path(items)) == json.loads(fast_path(items))
+
+    slow = best_of(pydantic_path, items)
+    fast = best_of(fast_path, items)
+    print(f"{count} ItemOut rows")
+    print(f"  pydantic + json      : {slow * 1000:8.1f} ms")
+    print(f"  orm_to_dict + orjson : {fast * 1000:8.1f} ms")
+    print(f"  speedup              : {slow / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
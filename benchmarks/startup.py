@@ -0,0 +1,91 @@
+"""
+Measure how long `import app.main` takes in a fresh interpreter, using
+`python -X importtime`, and fail when it exceeds a budget.
+
+  - the median cumulative import time of app.main over several runs
+    is compared to the budget (STARTUP_BUDGET_MS, default 1500 ms)
+  - modules that must never load at startup (Pillow, reportlab) fail the
+    run regardless of time
+  - the modules with the largest self time are listed, to see what grew
+
+Run from the project root:
+
+    DATABASE_URL=sqlite+aiosqlite:// python -m benchmarks.startup [runs]
+
+Exits with status 1 when over budget, so it can gate CI.
+"""
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+TARGET = "app.main"
+# Loaded on the first render only (app.image_processor)
+FORBIDDEN_AT_STARTUP = ("PIL", "reportlab")
+
+
+@dataclass(frozen=True)
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(stderr: str) -> list[ImportTime]:
+    # "import time:   self [us] | cumulative | imported package"
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        entries.append(ImportTime(module.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure(target: str = TARGET) -> list[ImportTime]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    return parse_importtime(result.stderr)
+
+
+def cumulative_ms(entries: list[ImportTime], module: str = TARGET) -> float:
+    return next(e.cumulative_us for e in entries if e.module == module) / 1000
+
+
+def forbidden_imports(entries: list[ImportTime]) -> list[str]:
+    return sorted(e.module for e in entries if e.module in FORBIDDEN_AT_STARTUP)
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    samples = [measure() for _ in range(runs)]
+    timings = [cumulative_ms(entries) for entries in samples]
+    median = statistics.median(timings)
+
+    last = samples[-1]
+    print(f"import {TARGET}: median {median:.0f} ms over {runs} runs "
+          f"(min {min(timings):.0f}, max {max(timings):.0f}), budget {STARTUP_BUDGET_MS:.0f} ms")
+    print("largest self times:")
+    for entry in sorted(last, key=lambda e: e.self_us, reverse=True)[:10]:
+        print(f"  {entry.self_us / 1000:7.1f} ms  {entry.module}")
+
+    failed = False
+    forbidden = forbidden_imports(last)
+    if forbidden:
+        print(f"FAIL: imported at startup: {', '.join(forbidden)}")
+        failed = True
+    if median > STARTUP_BUDGET_MS:
+        print(f"FAIL: over budget by {median - STARTUP_BUDGET_MS:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""add updated_at
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('users', 'materials', 'product_types', 'items')
+
+
+def upgrade() -> None:
+    updated_at = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', updated_at, nullable=True))
+        # Existing rows have not changed since they were created
+        op.execute(f'UPDATE {table} SET updated_at = created_at')
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
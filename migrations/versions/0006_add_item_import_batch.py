@@ -0,0 +1,28 @@
+"""add items.import_batch
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('items', sa.Column('import_batch', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_items_import_batch'), 'items', ['import_batch'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_items_import_batch'), table_name='items')
+    op.drop_column('items', 'import_batch')